@@ -1,7 +1,14 @@
 import sys
+import time
+
+# Startup timing begins before the Qt import (see --startup-report)
+_IMPORT_START = time.perf_counter()
+
+import argparse
 import os
-import pandas as pd
-from collections import OrderedDict
+import glob
+import html
+import threading
 
 from PyQt6.QtWidgets import (
     QApplication,
@@ -25,48 +32,51 @@ from PyQt6.QtWidgets import (
     QGroupBox,
     QDoubleSpinBox,
     QLineEdit,  # <--- 修正：添加了 QLineEdit
+    QSpinBox,
+    QProgressBar,
+    QSplitter,
+    QTableView,
+    QComboBox,
+    QHeaderView,
+)
+from PyQt6.QtCore import (
+    QAbstractTableModel,
+    QModelIndex,
+    QObject,
+    QThread,
+    QTimer,
+    Qt,
+    pyqtSignal,
 )
-from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QFont, QColor
+from PyQt6.QtGui import QFont, QColor, QDoubleValidator
+
+# The pandas-based batch modules (batch_engine, parallel_batch, table_io) are
+# imported inside the batch methods so that they do not slow down startup.
+from composition_parser import parse_composition
+from conversion_memo import cached_conversion
+from elements import ATOMIC_MASSES, at_to_wt, wt_to_at
+from instrumentation import StageStats, stage
+
+# Modules needed by the batch tab, preloaded in the background after startup
+BATCH_MODULES = ("batch_engine", "parallel_batch", "species", "table_io", "validation")
+
+# First entry of the designation column selector: use the element columns
+NO_DESIGNATION = "(none)"
+
+# Output compression choice that keeps the compression of the input file
+SAME_COMPRESSION = "same as input"
+
+# Delay between the last edit in the single point tab and the live recalculation
+LIVE_RECALC_DELAY_MS = 120
+
+# Applied once to the periodic table container instead of to each button
+PERIODIC_TABLE_STYLE = """
+QPushButton:checked { background-color: #6495ED; color: white; }
+QPushButton:disabled { background-color: #E0E0E0; color: #A0A0A0; }
+"""
 
 # --- 1. CORE LOGIC (Unchanged) ---
-# Element Configuration Area - ADD/REMOVE elements here
-ATOMIC_MASSES = OrderedDict(
-    [
-        ("Al", 26.9815385),
-        ("Li", 6.94),
-        ("Cu", 63.546),
-        ("Mg", 24.305),
-        ("Zr", 91.224),
-        ("Mn", 54.938044),
-        # For a richer periodic table, you can add more, e.g.:
-        ("H", 1.008),
-        ("He", 4.0026),
-        ("Be", 9.0122),
-        ("B", 10.81),
-        ("C", 12.011),
-        ("N", 14.007),
-        ("O", 15.999),
-        ("F", 18.998),
-        ("Ne", 20.180),
-        ("Na", 22.990),
-        ("Si", 28.085),
-        ("P", 32.06),
-        ("S", 32.06),
-        ("Cl", 35.45),
-        ("Ar", 39.948),
-        ("K", 39.098),
-        ("Ca", 40.078),
-        ("Sc", 44.956),
-        ("Ti", 47.867),
-        ("V", 50.942),
-        ("Cr", 51.996),
-        ("Fe", 55.845),
-        ("Co", 58.933),
-        ("Ni", 58.693),
-        ("Zn", 65.38),
-    ]
-)
+# Atomic masses come from the shared element registry (elements.py)
 
 # Data for periodic table layout: {Symbol: (row, column)}
 PERIODIC_TABLE_LAYOUT = {
@@ -160,38 +170,154 @@ PERIODIC_TABLE_LAYOUT = {
     "Lv": (6, 15),
     "Ts": (6, 16),
     "Og": (6, 17),
+    # Lanthanides and actinides, shown below the main table
+    "Ce": (7, 3),
+    "Pr": (7, 4),
+    "Nd": (7, 5),
+    "Pm": (7, 6),
+    "Sm": (7, 7),
+    "Eu": (7, 8),
+    "Gd": (7, 9),
+    "Tb": (7, 10),
+    "Dy": (7, 11),
+    "Ho": (7, 12),
+    "Er": (7, 13),
+    "Tm": (7, 14),
+    "Yb": (7, 15),
+    "Lu": (7, 16),
+    "Th": (8, 3),
+    "Pa": (8, 4),
+    "U": (8, 5),
+    "Np": (8, 6),
+    "Pu": (8, 7),
+    "Am": (8, 8),
+    "Cm": (8, 9),
+    "Bk": (8, 10),
+    "Cf": (8, 11),
+    "Es": (8, 12),
+    "Fm": (8, 13),
+    "Md": (8, 14),
+    "No": (8, 15),
+    "Lr": (8, 16),
 }
 
 
-def wt_to_at(wt_percents: dict) -> dict:
-    moles = {
-        el: wt / ATOMIC_MASSES[el]
-        for el, wt in wt_percents.items()
-        if el in ATOMIC_MASSES and wt > 0
-    }
-    total_moles = sum(moles.values())
-    if total_moles == 0:
-        return {el: 0 for el in wt_percents.keys()}
-    return {el: (mol / total_moles) * 100 for el, mol in moles.items()}
+# Memoized versions used by the single point tab
+cached_wt_to_at = cached_conversion(wt_to_at)
+cached_at_to_wt = cached_conversion(at_to_wt)
+
+
+# --- 2. BACKGROUND BATCH WORKER ---
+
+
+class BatchWorker(QObject):
+    """
+    Runs one batch job off the GUI thread.
+    The job is a callable taking the worker; it reports progress through
+    report_progress(), which raises ConversionCancelled once cancel() was called.
+    """
+
+    progress = pyqtSignal(int, int)
+    message = pyqtSignal(str)
+    succeeded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+    done = pyqtSignal()
+
+    def __init__(self, job):
+        super().__init__()
+        self._job = job
+        self._cancel_requested = threading.Event()
+
+    def cancel(self):
+        """Ask the job to stop at the next progress report (thread-safe)."""
+        self._cancel_requested.set()
+
+    def report_progress(self, done, total):
+        if self._cancel_requested.is_set():
+            from batch_engine import ConversionCancelled
+
+            raise ConversionCancelled()
+        self.progress.emit(done, total)
+
+    def run(self):
+        from batch_engine import ConversionCancelled
+
+        try:
+            result = self._job(self)
+        except ConversionCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.succeeded.emit(result)
+        finally:
+            self.done.emit()
+
+
+class ResultsTableModel(QAbstractTableModel):
+    """
+    Lazy table model over a result_preview.PreviewView.
+    Only the rows the view asks for are read from the file, a page at a time,
+    so even multi-million-row outputs scroll smoothly with little memory.
+    """
+
+    def __init__(self, view, parent=None):
+        super().__init__(parent)
+        self.view = view
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.view.row_count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.view.columns)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        row = self.view.row(index.row())
+        return row[index.column()] if index.column() < len(row) else ""
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.view.columns[section]
+        # Row numbers refer to the file, so they stay meaningful after sorting
+        return str(self.view.source_row(section) + 1)
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        name = (
+            self.view.columns[column] if 0 <= column < len(self.view.columns) else None
+        )
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            self.beginResetModel()
+            self.view.sort(name, descending=order == Qt.SortOrder.DescendingOrder)
+            self.endResetModel()
+        finally:
+            QApplication.restoreOverrideCursor()
+
+    def apply_filter(self, name, low=None, high=None):
+        self.beginResetModel()
+        self.view.filter(name, low, high)
+        self.endResetModel()
 
 
-def at_to_wt(at_percents: dict) -> dict:
-    mass_contributions = {
-        el: at * ATOMIC_MASSES[el]
-        for el, at in at_percents.items()
-        if el in ATOMIC_MASSES and at > 0
-    }
-    total_mass = sum(mass_contributions.values())
-    if total_mass == 0:
-        return {el: 0 for el in at_percents.keys()}
-    return {el: (mass / total_mass) * 100 for el, mass in mass_contributions.items()}
+# --- 3. GUI APPLICATION CLASS ---
 
 
-# --- 2. GUI APPLICATION CLASS ---
+def _preload_batch_modules():
+    for name in BATCH_MODULES:
+        __import__(name)
 
 
 class ConverterApp(QMainWindow):
-    def __init__(self):
+    def __init__(self, startup_stats=None):
+        """
+        :param startup_stats: optional StageStats that records how long each
+            construction step takes (see --startup-report)
+        """
         super().__init__()
         self.setWindowTitle("Weight% <-> Atomic% Converter")
         self.setGeometry(100, 100, 800, 750)
@@ -200,9 +326,16 @@ class ConverterApp(QMainWindow):
         self.setCentralWidget(self.central_widget)
         self.main_layout = QVBoxLayout(self.central_widget)
 
-        self._create_widgets()
-        self._create_layout()
-        self._connect_signals()
+        with stage(startup_stats, "widgets"):
+            self._create_widgets()
+        with stage(startup_stats, "layout"):
+            self._create_layout()
+        with stage(startup_stats, "signals"):
+            self._connect_signals()
+
+    def preload_batch_modules(self):
+        """Import pandas and the batch engine on a background thread after first paint."""
+        threading.Thread(target=_preload_batch_modules, daemon=True).start()
 
     def _create_widgets(self):
         # Conversion direction
@@ -215,52 +348,161 @@ class ConverterApp(QMainWindow):
         self.single_point_tab = QWidget()
         self.batch_tab = QWidget()
         self.tabs.addTab(self.single_point_tab, "Single Point Calculation")
-        self.tabs.addTab(self.batch_tab, "Batch Calculation (CSV)")
+        self.tabs.addTab(self.batch_tab, "Batch Calculation (CSV / Parquet / Feather)")
 
         # --- New Single Point Tab Widgets ---
         self._create_single_point_tab_widgets()
 
-        # --- Batch Tab Widgets (Unchanged) ---
+        # --- Batch Tab (built on first visit, see _ensure_batch_tab) ---
+        self.batch_tab_built = False
+        self.batch_thread = None
+        self.batch_worker = None
+
+    def _ensure_batch_tab(self):
+        """Build the batch tab the first time it is needed."""
+        if self.batch_tab_built:
+            return
+        self.batch_tab_built = True
+        self._create_batch_tab_widgets()
+        self._layout_batch_tab()
+        self._connect_batch_signals()
+
+    def _on_tab_changed(self, index):
+        if self.tabs.widget(index) is self.batch_tab:
+            self._ensure_batch_tab()
+
+    def _create_batch_tab_widgets(self):
+        from batch_engine import DEFAULT_CHUNK_ROWS
+        from table_io import COMPRESSIONS, NO_COMPRESSION
+        from validation import DEFAULT_SUM_TOLERANCE
+
         self.file_path_le = QLineEdit()
         self.btn_browse = QPushButton("Browse...")
+        self.btn_browse_folder = QPushButton("Browse Folder...")
         self.scroll_area = QScrollArea()
         self.scroll_area.setWidgetResizable(True)
         self.columns_widget = QWidget()
         self.columns_layout = QVBoxLayout(self.columns_widget)
         self.scroll_area.setWidget(self.columns_widget)
         self.column_checkboxes = []
+        self.designation_cb = QComboBox()
+        self.designation_cb.addItem(NO_DESIGNATION)
+        self.designation_cb.setToolTip(
+            "Column holding compositions as strings such as Al-4.5Cu-1.5Mg or "
+            "Al90Cu10; it is expanded into element columns before converting"
+        )
+        self.cb_species = QCheckBox("Columns are compounds (e.g. Al2O3, MgO)")
+        self.cb_species.setToolTip(
+            "The selected columns hold compound wt% and are named by their formula; "
+            "the result gives the at% / wt% of each element they contain"
+        )
+        self.cb_streaming = QCheckBox("Stream in chunks (for files larger than memory)")
+        self.chunk_rows_sb = QSpinBox()
+        self.chunk_rows_sb.setRange(1, 10_000_000)
+        self.chunk_rows_sb.setSingleStep(10_000)
+        self.chunk_rows_sb.setValue(DEFAULT_CHUNK_ROWS)
+        self.chunk_rows_sb.setSuffix(" rows")
+        self.chunk_rows_sb.setEnabled(False)
+        self.compression_cb = QComboBox()
+        self.compression_cb.addItems(
+            [SAME_COMPRESSION, NO_COMPRESSION] + list(COMPRESSIONS)
+        )
+        self.compression_cb.setToolTip(
+            "Compression of the CSV results; compressed inputs (.csv.gz, .csv.zst, ...) "
+            "are decompressed while streaming, without temporary files"
+        )
+        self.cb_dedupe = QCheckBox("Deduplicate repeated compositions")
+        self.cb_dedupe.setToolTip(
+            "Convert each distinct composition once and reuse it for repeated rows"
+        )
+        self.workers_sb = QSpinBox()
+        self.workers_sb.setRange(1, 256)
+        self.workers_sb.setValue(os.cpu_count() or 1)
+        self.workers_sb.setToolTip("Worker processes used when converting a folder")
+        self.cb_validate = QCheckBox("Validate rows")
+        self.cb_validate.setToolTip(
+            "Write non-numeric, negative, empty and out-of-tolerance rows to a "
+            "separate quarantine file with reason codes, and convert the rest"
+        )
+        self.sum_tolerance_sb = QDoubleSpinBox()
+        self.sum_tolerance_sb.setRange(0.0, 100.0)
+        self.sum_tolerance_sb.setDecimals(3)
+        self.sum_tolerance_sb.setSingleStep(0.1)
+        self.sum_tolerance_sb.setValue(DEFAULT_SUM_TOLERANCE)
+        self.sum_tolerance_sb.setPrefix("100 \u00b1 ")
+        self.sum_tolerance_sb.setEnabled(False)
+        self.cb_allow_missing = QCheckBox("Empty cells count as 0")
+        self.cb_allow_missing.setEnabled(False)
+        self.cb_renormalise = QCheckBox("Renormalise valid rows to 100%")
+        self.cb_renormalise.setEnabled(False)
         self.btn_process_batch = QPushButton("Process File")
+        self.btn_cancel_batch = QPushButton("Cancel")
+        self.btn_cancel_batch.setEnabled(False)
+        self.batch_progress = QProgressBar()
+        self.batch_progress.setFormat("%v / %m rows")
+        self.btn_export_stats = QPushButton("Export Stats (JSON)...")
+        self.btn_export_stats.setEnabled(False)
+        self.last_stats = None
         self.log_area = QTextEdit()
         self.log_area.setReadOnly(True)
 
+        # Results preview (filled after a successful single-file run)
+        self.preview_table = QTableView()
+        self.preview_table.setSortingEnabled(False)
+        self.preview_table.horizontalHeader().setSortIndicatorShown(True)
+        self.preview_table.horizontalHeader().setSortIndicator(
+            -1, Qt.SortOrder.AscendingOrder
+        )
+        self.preview_table.verticalHeader().setSectionResizeMode(
+            QHeaderView.ResizeMode.Fixed
+        )
+        self.preview_model = None
+        self.preview_filter_column = QComboBox()
+        self.preview_filter_min = QLineEdit()
+        self.preview_filter_min.setPlaceholderText("min")
+        self.preview_filter_min.setValidator(QDoubleValidator())
+        self.preview_filter_max = QLineEdit()
+        self.preview_filter_max.setPlaceholderText("max")
+        self.preview_filter_max.setValidator(QDoubleValidator())
+        self.btn_apply_filter = QPushButton("Filter")
+        self.btn_clear_filter = QPushButton("Clear")
+        self.preview_status = QLabel("No results loaded.")
+
     def _create_single_point_tab_widgets(self):
         """Create all widgets for the redesigned single point tab."""
         self.pt_buttons = {}
-        self.pt_layout = QGridLayout()
+        # Buttons are created directly inside the styled container so that they
+        # are polished once, with the shared style sheet
+        self.pt_group = QGroupBox("1. Select Elements from Periodic Table")
+        self.pt_group.setStyleSheet(PERIODIC_TABLE_STYLE)
+        self.pt_layout = QGridLayout(self.pt_group)
         self.pt_layout.setSpacing(2)
 
         for symbol, (row, col) in PERIODIC_TABLE_LAYOUT.items():
-            btn = QPushButton(symbol)
+            btn = QPushButton(symbol, self.pt_group)
             btn.setCheckable(True)
             btn.setFixedSize(35, 35)
             if symbol in ATOMIC_MASSES:
-                # Style for enabled elements
-                btn.setStyleSheet(
-                    "QPushButton:checked { background-color: #6495ED; color: white; }"
+                btn.toggled.connect(
+                    lambda checked, symbol=symbol: self._toggle_element_input(
+                        symbol, checked
+                    )
                 )
-                btn.toggled.connect(self._update_input_fields)
             else:
-                # Style for disabled elements
                 btn.setEnabled(False)
-                btn.setStyleSheet(
-                    "QPushButton { background-color: #E0E0E0; color: #A0A0A0; }"
-                )
 
             self.pt_buttons[symbol] = btn
             self.pt_layout.addWidget(btn, row, col)
 
         self.active_element_inputs = {}  # Will store QDoubleSpinBox widgets
+        self.element_input_labels = {}
+        self.removed_element_values = {}  # Restored when an element is re-selected
         self.dynamic_inputs_layout = QGridLayout()
+        self.composition_le = QLineEdit()
+        self.composition_le.setPlaceholderText(
+            "Or paste a composition, e.g. Al-4.5Cu-1.5Mg-0.6Mn or Al90Cu10"
+        )
+        self.btn_apply_composition = QPushButton("Apply")
 
         self.sum_label = QLabel("Sum: 0.00 %")
         font = self.sum_label.font()
@@ -268,6 +510,10 @@ class ConverterApp(QMainWindow):
         self.sum_label.setFont(font)
 
         self.btn_calculate_single = QPushButton("Calculate")
+        self.recalc_timer = QTimer(self)
+        self.recalc_timer.setSingleShot(True)
+        self.recalc_timer.setInterval(LIVE_RECALC_DELAY_MS)
+        self.result_headers = []
         self.results_table = QTableWidget()
         self.results_table.setRowCount(1)
         self.results_table.setVerticalHeaderLabels(["Value"])
@@ -281,9 +527,6 @@ class ConverterApp(QMainWindow):
         # --- Single Point Tab Layout ---
         self._layout_single_point_tab()
 
-        # --- Batch Tab Layout (Unchanged) ---
-        self._layout_batch_tab()
-
         # --- Main Layout ---
         self.main_layout.addLayout(conversion_layout)
         self.main_layout.addWidget(self.tabs)
@@ -292,11 +535,12 @@ class ConverterApp(QMainWindow):
         """Assemble the redesigned single point tab layout."""
         layout = QVBoxLayout(self.single_point_tab)
 
-        pt_group = QGroupBox("1. Select Elements from Periodic Table")
-        pt_group.setLayout(self.pt_layout)
-
         inputs_group = QGroupBox("2. Enter Composition")
         inputs_layout = QVBoxLayout(inputs_group)
+        composition_layout = QHBoxLayout()
+        composition_layout.addWidget(self.composition_le)
+        composition_layout.addWidget(self.btn_apply_composition)
+        inputs_layout.addLayout(composition_layout)
         inputs_layout.addLayout(self.dynamic_inputs_layout)
         inputs_layout.addWidget(self.sum_label, alignment=Qt.AlignmentFlag.AlignRight)
 
@@ -304,7 +548,7 @@ class ConverterApp(QMainWindow):
         results_layout = QVBoxLayout(results_group)
         results_layout.addWidget(self.results_table)
 
-        layout.addWidget(pt_group)
+        layout.addWidget(self.pt_group)
         layout.addWidget(inputs_group)
         layout.addWidget(self.btn_calculate_single)
         layout.addWidget(results_group)
@@ -313,9 +557,10 @@ class ConverterApp(QMainWindow):
         """Assemble the batch calculation tab layout."""
         batch_tab_layout = QVBoxLayout(self.batch_tab)
         file_select_layout = QHBoxLayout()
-        file_select_layout.addWidget(QLabel("CSV File:"))
+        file_select_layout.addWidget(QLabel("Data File / Folder:"))
         file_select_layout.addWidget(self.file_path_le)
         file_select_layout.addWidget(self.btn_browse)
+        file_select_layout.addWidget(self.btn_browse_folder)
 
         columns_label = QLabel(
             "Please select the columns containing elemental compositions:"
@@ -323,49 +568,144 @@ class ConverterApp(QMainWindow):
         batch_tab_layout.addLayout(file_select_layout)
         batch_tab_layout.addWidget(columns_label)
         batch_tab_layout.addWidget(self.scroll_area)
-        batch_tab_layout.addWidget(self.btn_process_batch)
-        batch_tab_layout.addWidget(QLabel("Log:"))
-        batch_tab_layout.addWidget(self.log_area)
+        designation_layout = QHBoxLayout()
+        designation_layout.addWidget(QLabel("Or parse compositions from column:"))
+        designation_layout.addWidget(self.designation_cb)
+        designation_layout.addWidget(self.cb_species)
+        designation_layout.addStretch()
+        batch_tab_layout.addLayout(designation_layout)
+        streaming_layout = QHBoxLayout()
+        streaming_layout.addWidget(self.cb_streaming)
+        streaming_layout.addWidget(QLabel("Chunk size:"))
+        streaming_layout.addWidget(self.chunk_rows_sb)
+        streaming_layout.addWidget(self.cb_dedupe)
+        streaming_layout.addWidget(QLabel("Workers:"))
+        streaming_layout.addWidget(self.workers_sb)
+        streaming_layout.addWidget(QLabel("Compress output:"))
+        streaming_layout.addWidget(self.compression_cb)
+        streaming_layout.addStretch()
+        batch_tab_layout.addLayout(streaming_layout)
+        validation_layout = QHBoxLayout()
+        validation_layout.addWidget(self.cb_validate)
+        validation_layout.addWidget(QLabel("Sum:"))
+        validation_layout.addWidget(self.sum_tolerance_sb)
+        validation_layout.addWidget(self.cb_allow_missing)
+        validation_layout.addWidget(self.cb_renormalise)
+        validation_layout.addStretch()
+        batch_tab_layout.addLayout(validation_layout)
+        process_layout = QHBoxLayout()
+        process_layout.addWidget(self.btn_process_batch)
+        process_layout.addWidget(self.btn_cancel_batch)
+        batch_tab_layout.addLayout(process_layout)
+        batch_tab_layout.addWidget(self.batch_progress)
+        log_header_layout = QHBoxLayout()
+        log_header_layout.addWidget(QLabel("Log:"))
+        log_header_layout.addStretch()
+        log_header_layout.addWidget(self.btn_export_stats)
+        batch_tab_layout.addLayout(log_header_layout)
+        preview_group = QGroupBox("Results Preview")
+        preview_layout = QVBoxLayout(preview_group)
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel("Filter column:"))
+        filter_layout.addWidget(self.preview_filter_column)
+        filter_layout.addWidget(self.preview_filter_min)
+        filter_layout.addWidget(self.preview_filter_max)
+        filter_layout.addWidget(self.btn_apply_filter)
+        filter_layout.addWidget(self.btn_clear_filter)
+        filter_layout.addStretch()
+        filter_layout.addWidget(self.preview_status)
+        preview_layout.addLayout(filter_layout)
+        preview_layout.addWidget(self.preview_table)
+
+        splitter = QSplitter(Qt.Orientation.Vertical)
+        splitter.addWidget(self.log_area)
+        splitter.addWidget(preview_group)
+        batch_tab_layout.addWidget(splitter)
 
     def _connect_signals(self):
         self.btn_calculate_single.clicked.connect(self._perform_single_calculation)
+        self.btn_apply_composition.clicked.connect(self._apply_composition_string)
+        self.composition_le.returnPressed.connect(self._apply_composition_string)
+        self.recalc_timer.timeout.connect(self._recalculate_live)
+        self.rb_wt_to_at.toggled.connect(self._schedule_recalculation)
+        self.tabs.currentChanged.connect(self._on_tab_changed)
+
+    def _connect_batch_signals(self):
         self.btn_browse.clicked.connect(self._browse_file)
+        self.btn_browse_folder.clicked.connect(self._browse_folder)
         self.btn_process_batch.clicked.connect(self._perform_batch_calculation)
+        self.btn_export_stats.clicked.connect(self._export_stats)
+        self.btn_cancel_batch.clicked.connect(self._cancel_batch)
+        self.cb_streaming.toggled.connect(self.chunk_rows_sb.setEnabled)
+        self.cb_species.toggled.connect(self._check_default_columns)
+        for widget in self._validation_option_widgets():
+            self.cb_validate.toggled.connect(widget.setEnabled)
+        self.btn_apply_filter.clicked.connect(self._apply_preview_filter)
+        self.btn_clear_filter.clicked.connect(self._clear_preview_filter)
 
     # --- Helper & Slot Methods ---
 
-    def _clear_layout(self, layout):
-        """Removes all widgets from a layout."""
-        while layout.count():
-            child = layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
-
-    def _update_input_fields(self):
-        """Dynamically create input fields based on selected elements."""
-        self._clear_layout(self.dynamic_inputs_layout)
-        self.active_element_inputs.clear()
-
-        selected_elements = sorted(
-            [symbol for symbol, btn in self.pt_buttons.items() if btn.isChecked()]
-        )
-
-        for i, symbol in enumerate(selected_elements):
+    def _toggle_element_input(self, symbol, checked):
+        """Add or remove the input of one element, keeping the other values."""
+        if checked:
             label = QLabel(f"{symbol} (%):")
             spin_box = QDoubleSpinBox()
             spin_box.setRange(0.0, 100.0)
             spin_box.setDecimals(3)
             spin_box.setSingleStep(0.1)
-            spin_box.valueChanged.connect(self._update_sum_label)
-
+            spin_box.setValue(self.removed_element_values.pop(symbol, 0.0))
+            spin_box.valueChanged.connect(self._on_element_value_changed)
+            self.element_input_labels[symbol] = label
             self.active_element_inputs[symbol] = spin_box
+        else:
+            spin_box = self.active_element_inputs.pop(symbol, None)
+            label = self.element_input_labels.pop(symbol, None)
+            if spin_box is None:
+                return
+            self.removed_element_values[symbol] = spin_box.value()
+            for widget in (label, spin_box):
+                self.dynamic_inputs_layout.removeWidget(widget)
+                widget.deleteLater()
+        self._arrange_element_inputs()
+        self._on_element_value_changed()
 
-            # Add to grid layout (2 columns)
+    def _apply_composition_string(self):
+        """Select the elements of a designation / formula string and fill in their values."""
+        text = self.composition_le.text()
+        if not text.strip():
+            return
+        try:
+            composition = parse_composition(text)
+        except ValueError as e:
+            QMessageBox.warning(self, "Input Error", str(e))
+            return
+        for symbol, btn in self.pt_buttons.items():
+            if btn.isEnabled():
+                btn.setChecked(symbol in composition)
+        for symbol, value in composition.items():
+            self.active_element_inputs[symbol].setValue(value)
+
+    def _arrange_element_inputs(self):
+        """Place the existing inputs in alphabetical order, two per row."""
+        for symbol in self.active_element_inputs:
+            self.dynamic_inputs_layout.removeWidget(self.element_input_labels[symbol])
+            self.dynamic_inputs_layout.removeWidget(self.active_element_inputs[symbol])
+        for i, symbol in enumerate(sorted(self.active_element_inputs)):
             row, col = divmod(i, 2)
-            self.dynamic_inputs_layout.addWidget(label, row, col * 2)
-            self.dynamic_inputs_layout.addWidget(spin_box, row, col * 2 + 1)
+            self.dynamic_inputs_layout.addWidget(
+                self.element_input_labels[symbol], row, col * 2
+            )
+            self.dynamic_inputs_layout.addWidget(
+                self.active_element_inputs[symbol], row, col * 2 + 1
+            )
 
+    def _on_element_value_changed(self):
         self._update_sum_label()
+        self._schedule_recalculation()
+
+    def _schedule_recalculation(self):
+        """Restart the debounce timer; the results follow once typing pauses."""
+        self.recalc_timer.start()
 
     def _update_sum_label(self):
         """Calculate and display the sum of current inputs."""
@@ -386,103 +726,593 @@ class ConverterApp(QMainWindow):
                 self, "Input Error", "Please select at least one element."
             )
             return
+        self._recalculate_live()
 
+    def _recalculate_live(self):
+        """Recompute the results from the current inputs (debounced)."""
+        self.recalc_timer.stop()
         input_percents = {
             el: sb.value() for el, sb in self.active_element_inputs.items()
         }
 
         if self.rb_wt_to_at.isChecked():
-            result = wt_to_at(input_percents)
-            to_unit = "at"
+            conv_func, to_unit = cached_wt_to_at, "at"
         else:
-            result = at_to_wt(input_percents)
-            to_unit = "wt"
+            conv_func, to_unit = cached_at_to_wt, "wt"
+        result = conv_func(input_percents)
 
-        self._display_single_results(result, to_unit)
+        self._display_single_results(result, to_unit, sorted(input_percents))
+        info = conv_func.cache_info()
+        self.statusBar().showMessage(
+            f"Conversion cache: {info.hits} hits, {info.misses} misses"
+        )
 
-    def _display_single_results(self, results, unit):
-        """Populates the results table with calculation output."""
-        sorted_elements = sorted(results.keys())
+    def _display_single_results(self, results, unit, elements=None):
+        """
+        Populates the results table with calculation output.
+        Existing cells are updated in place while the columns stay the same.
+        :param elements: columns to show (default: the elements in results);
+            elements missing from results are shown as 0
+        """
+        sorted_elements = sorted(results.keys()) if elements is None else elements
         headers = [f"{el} ({unit}%)" for el in sorted_elements]
-        self.results_table.setColumnCount(len(headers))
-        self.results_table.setHorizontalHeaderLabels(headers)
+        rebuild = headers != self.result_headers
+        if rebuild:
+            self.result_headers = headers
+            self.results_table.setColumnCount(len(headers))
+            self.results_table.setHorizontalHeaderLabels(headers)
 
         for i, element in enumerate(sorted_elements):
-            value = results.get(element, 0)
-            item = QTableWidgetItem(f"{value:.4f}")
-            self.results_table.setItem(0, i, item)
-        self.results_table.resizeColumnsToContents()
+            text = f"{results.get(element, 0):.4f}"
+            item = self.results_table.item(0, i)
+            if item is None:
+                self.results_table.setItem(0, i, QTableWidgetItem(text))
+            elif item.text() != text:
+                item.setText(text)
+        if rebuild:
+            self.results_table.resizeColumnsToContents()
 
     # --- Batch Calculation Methods (Unchanged) ---
     def _browse_file(self):
+        from table_io import DATA_FILE_PATTERNS
+
         file_name, _ = QFileDialog.getOpenFileName(
-            self, "Open CSV File", "", "CSV Files (*.csv)"
+            self,
+            "Open Data File",
+            "",
+            f"Data Files ({DATA_FILE_PATTERNS});;CSV Files (*.csv);;All Files (*)",
         )
         if file_name:
             self.file_path_le.setText(file_name)
             self._load_csv_columns(file_name)
 
+    def _browse_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Open Folder of Data Files")
+        if folder:
+            self.file_path_le.setText(folder)
+            self._load_csv_columns(folder)
+
+    def _conversion_units(self):
+        """Return (from_unit, to_unit) for the selected conversion direction."""
+        if self.rb_wt_to_at.isChecked():
+            return "wt", "at"
+        return "at", "wt"
+
+    def _is_multi_file_path(self, path):
+        """A folder or a wildcard pattern selects several files at once."""
+        return os.path.isdir(path) or glob.has_magic(path)
+
     def _load_csv_columns(self, file_path):
+        from parallel_batch import expand_input_paths
+        from table_io import read_column_names
+
         for checkbox in self.column_checkboxes:
             checkbox.deleteLater()
         self.column_checkboxes.clear()
+        self.designation_cb.clear()
+        self.designation_cb.addItem(NO_DESIGNATION)
         try:
-            df = pd.read_csv(file_path, nrows=0)
-            columns = [col for col in df.columns if not col.startswith("Unnamed:")]
+            if self._is_multi_file_path(file_path):
+                # Offer the columns of the first file; all files should share them
+                paths = expand_input_paths([file_path], *self._conversion_units())
+                if not paths:
+                    raise ValueError("no data files found")
+                file_path = paths[0]
+            columns = [
+                col
+                for col in read_column_names(file_path)
+                if not col.startswith("Unnamed:")
+            ]
             for col in columns:
                 checkbox = QCheckBox(col)
-                if col in ATOMIC_MASSES:
-                    checkbox.setChecked(True)
                 self.columns_layout.addWidget(checkbox)
                 self.column_checkboxes.append(checkbox)
+            self._check_default_columns()
+            self.designation_cb.addItems(
+                [col for col in columns if col not in ATOMIC_MASSES]
+            )
         except Exception as e:
             QMessageBox.critical(
                 self, "File Error", f"Could not read columns from file: {e}"
             )
 
+    def _check_default_columns(self):
+        """Check the element columns, or the known compound columns in compound mode."""
+        from species import SPECIES_COMPOSITIONS
+
+        known = SPECIES_COMPOSITIONS if self.cb_species.isChecked() else ATOMIC_MASSES
+        for checkbox in self.column_checkboxes:
+            checkbox.setChecked(checkbox.text() in known)
+
+    def _validation_option_widgets(self):
+        return (self.sum_tolerance_sb, self.cb_allow_missing, self.cb_renormalise)
+
+    def _validation_options(self):
+        """RowValidator arguments for the batch tab, or None when validation is off."""
+        if not self.cb_validate.isChecked():
+            return None
+        return dict(
+            tolerance=self.sum_tolerance_sb.value(),
+            allow_missing=self.cb_allow_missing.isChecked(),
+            renormalise=self.cb_renormalise.isChecked(),
+        )
+
+    def _output_compression(self):
+        """Compression chosen for the results, or None to follow the input file."""
+        choice = self.compression_cb.currentText()
+        return None if choice == SAME_COMPRESSION else choice
+
     def _perform_batch_calculation(self):
+        from batch_engine import (
+            ConversionCache,
+            ConversionCancelled,
+            convert_file,
+            output_path_for,
+        )
+        from species import is_species
+        from validation import RowValidator, quarantine_path_for
+
+        if self.batch_thread is not None:
+            return
         self.log_area.clear()
         csv_path = self.file_path_le.text()
         if not csv_path:
-            self.log_area.append("Error: No CSV file selected.")
+            self.log_area.append("Error: No data file selected.")
             return
+        designation = None
+        if self.designation_cb.currentIndex() > 0:
+            designation = self.designation_cb.currentText()
         selected_cols = [cb.text() for cb in self.column_checkboxes if cb.isChecked()]
-        if not selected_cols:
+        if designation is None and not selected_cols:
             self.log_area.append("Error: No component columns selected.")
             return
+        species = self.cb_species.isChecked()
+        if species and (designation is not None or self.cb_dedupe.isChecked()):
+            self.log_area.append(
+                "Error: Compound columns cannot be combined with a composition "
+                "string column or deduplication."
+            )
+            return
+        is_component = is_species if species else ATOMIC_MASSES.__contains__
 
         self.log_area.append(f"Starting batch processing for: {csv_path}")
-        element_cols = [col for col in selected_cols if col in ATOMIC_MASSES]
-        if self.rb_wt_to_at.isChecked():
-            conv_func, to_unit = wt_to_at, "at"
+        if designation is not None:
+            # The element columns come from the parsed strings
+            element_cols = None
+            self.log_area.append(f"Parsing compositions from column: {designation}")
         else:
-            conv_func, to_unit = at_to_wt, "wt"
+            kind = "compound formulas" if species else "element symbols"
+            element_cols = [col for col in selected_cols if is_component(col)]
+            skipped = [col for col in selected_cols if not is_component(col)]
+            if skipped:
+                # Unknown columns are kept in the output but not converted
+                self.log_area.append(
+                    f"Skipping columns that are not {kind}: " + ", ".join(skipped)
+                )
+            if not element_cols:
+                self.log_area.append(f"Error: None of the selected columns are {kind}.")
+                return
+        from_unit, to_unit = self._conversion_units()
+        if self._is_multi_file_path(csv_path):
+            self._perform_multi_file_calculation(
+                csv_path, element_cols, from_unit, to_unit, designation, species
+            )
+            return
+
+        cache = ConversionCache() if self.cb_dedupe.isChecked() else None
+        stats = StageStats(csv_path)
+        try:
+            output_path = output_path_for(
+                csv_path, from_unit, to_unit, compression=self._output_compression()
+            )
+        except ValueError as e:
+            self.log_area.append(str(e))
+            return
+        options = self._validation_options()
+        validator = None if options is None else RowValidator(**options)
+        chunksize = None
+        if self.cb_streaming.isChecked():
+            chunksize = self.chunk_rows_sb.value()
+            self.log_area.append(f"Streaming in chunks of {chunksize} rows...")
+
+        def job(worker):
+            try:
+                total_rows, _ = convert_file(
+                    csv_path,
+                    output_path,
+                    to_unit,
+                    ATOMIC_MASSES,
+                    names=element_cols,
+                    chunksize=chunksize,
+                    cache=cache,
+                    designation=designation,
+                    species=species,
+                    stats=stats,
+                    progress=worker.report_progress,
+                    validator=validator,
+                )
+            except ConversionCancelled:
+                # Do not leave a half-written result behind
+                for path in (output_path, quarantine_path_for(output_path)):
+                    if os.path.exists(path):
+                        os.remove(path)
+                raise
+            return {
+                "rows": total_rows,
+                "output_path": output_path,
+                "cache": cache,
+                "stats": stats,
+                "validator": validator,
+            }
+
+        self.batch_progress.setFormat("%v / %m rows")
+        self._start_batch_worker(job, self._single_file_finished)
+
+    # --- Results preview ---
+
+    def _load_preview(self, path):
+        """Show a lazily loaded preview of a result file."""
+        from result_preview import PreviewView, open_preview_source
+
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
         try:
-            df = pd.read_csv(csv_path)
+            view = PreviewView(open_preview_source(path))
+        except Exception as e:
+            self.log_area.append(f"Could not load the results preview: {e}")
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
 
-            def calculate_row(row):
-                return pd.Series(conv_func(row[element_cols].astype(float).to_dict()))
+        self.preview_model = ResultsTableModel(view, self)
+        self.preview_table.setModel(self.preview_model)
+        self.preview_table.horizontalHeader().setSortIndicator(
+            -1, Qt.SortOrder.AscendingOrder
+        )
+        self.preview_table.setSortingEnabled(True)
+        self.preview_filter_column.clear()
+        # Converted element columns first, they are the usual filter targets
+        result_columns = [col for col in view.columns if col.endswith("%)")]
+        other_columns = [col for col in view.columns if col not in result_columns]
+        self.preview_filter_column.addItems(result_columns + other_columns)
+        self._update_preview_status()
 
-            result_df = df.apply(calculate_row, axis=1).rename(
-                columns=lambda el: f"{el}({to_unit}%)"
+    def _update_preview_status(self):
+        view = self.preview_model.view
+        text = f"Showing {view.row_count:,} of {view.source.row_count:,} rows"
+        if view.source.truncated:
+            # Compressed CSV results cannot be read at random offsets
+            text += " (compressed file: only the first rows are previewed)"
+        self.preview_status.setText(text)
+
+    def _preview_bound(self, line_edit):
+        text = line_edit.text().strip()
+        return float(text) if text else None
+
+    def _apply_preview_filter(self):
+        if self.preview_model is None:
+            return
+        try:
+            low = self._preview_bound(self.preview_filter_min)
+            high = self._preview_bound(self.preview_filter_max)
+        except ValueError:
+            QMessageBox.warning(self, "Filter", "Please enter numeric bounds.")
+            return
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            self.preview_model.apply_filter(
+                self.preview_filter_column.currentText(), low, high
             )
-            final_df = pd.concat([df, result_df], axis=1)
-            output_path = f"{os.path.splitext(csv_path)[0]}-{to_unit}.csv"
-            final_df.to_csv(output_path, index=False)
-            self.log_area.append(f"\nSuccess! Results saved to: {output_path}")
-            QMessageBox.information(
+        finally:
+            QApplication.restoreOverrideCursor()
+        self._update_preview_status()
+
+    def _clear_preview_filter(self):
+        if self.preview_model is None:
+            return
+        self.preview_filter_min.clear()
+        self.preview_filter_max.clear()
+        self.preview_model.apply_filter(None)
+        self._update_preview_status()
+
+    def _single_file_finished(self, result):
+        self.log_area.append(f"Processed {result['rows']} rows.")
+        self._log_stats(result["stats"])
+        cache = result["cache"]
+        if cache is not None:
+            summary = cache.summary()
+            self.log_area.append(
+                f"Deduplication: {summary['unique_rows']} distinct compositions "
+                f"in {summary['rows']} rows, cache {summary['hits']} hits / "
+                f"{summary['misses']} misses."
+            )
+        validator = result["validator"]
+        if validator is not None:
+            self._log_validation(validator)
+        self.log_area.append(f"\nSuccess! Results saved to: {result['output_path']}")
+        self._load_preview(result["output_path"])
+        QMessageBox.information(
+            self,
+            "Success",
+            f"Processing complete. Results saved to:\n{result['output_path']}",
+        )
+
+    def _log_validation(self, validator):
+        summary = validator.summary()
+        self.log_area.append(
+            f"Validation: {summary['valid']} of {summary['rows']} rows passed, "
+            f"{summary['quarantined']} quarantined."
+        )
+        if summary["quarantined"]:
+            reasons = ", ".join(
+                f"{name}: {count}"
+                for name, count in summary["reasons"].items()
+                if count
+            )
+            self.log_area.append(f"  Reasons: {reasons}")
+            self.log_area.append(f"  Quarantine file: {validator.quarantine_path}")
+
+    # --- Background worker plumbing ---
+
+    def _start_batch_worker(self, job, on_success):
+        """Run a batch job on a QThread; on_success is called on the GUI thread."""
+        self.batch_thread = QThread(self)
+        self.batch_worker = BatchWorker(job)
+        self.batch_worker.moveToThread(self.batch_thread)
+        self.batch_thread.started.connect(self.batch_worker.run)
+        self.batch_worker.progress.connect(self._update_batch_progress)
+        self.batch_worker.message.connect(self.log_area.append)
+        self.batch_worker.succeeded.connect(on_success)
+        self.batch_worker.failed.connect(self._batch_failed)
+        self.batch_worker.cancelled.connect(self._batch_cancelled)
+        self.batch_worker.done.connect(self.batch_thread.quit)
+        self.batch_thread.finished.connect(self._batch_thread_finished)
+        self.batch_progress.setRange(0, 0)  # busy until the first report
+        self._set_batch_running(True)
+        self.batch_thread.start()
+
+    def _set_batch_running(self, running):
+        self.btn_process_batch.setEnabled(not running)
+        self.btn_cancel_batch.setEnabled(running)
+        for widget in (
+            self.file_path_le,
+            self.btn_browse,
+            self.btn_browse_folder,
+            self.designation_cb,
+            self.cb_species,
+            self.cb_streaming,
+            self.cb_dedupe,
+            self.workers_sb,
+            self.compression_cb,
+            self.cb_validate,
+            self.rb_wt_to_at,
+            self.rb_at_to_wt,
+        ):
+            widget.setEnabled(not running)
+        self.chunk_rows_sb.setEnabled(not running and self.cb_streaming.isChecked())
+        for widget in self._validation_option_widgets():
+            widget.setEnabled(not running and self.cb_validate.isChecked())
+
+    def _update_batch_progress(self, done, total):
+        self.batch_progress.setRange(0, max(total, 1))
+        self.batch_progress.setValue(done if total else 1)
+
+    def _cancel_batch(self):
+        if self.batch_worker is not None:
+            self.batch_worker.cancel()
+            self.btn_cancel_batch.setEnabled(False)
+            self.log_area.append("Cancelling...")
+
+    def _batch_failed(self, error):
+        self.log_area.append(f"\n--- AN ERROR OCCURRED ---\n{error}")
+        QMessageBox.critical(self, "Processing Error", f"An error occurred:\n{error}")
+
+    def _batch_cancelled(self):
+        self.log_area.append("\nProcessing cancelled.")
+
+    def _batch_thread_finished(self):
+        self.batch_thread.deleteLater()
+        self.batch_worker.deleteLater()
+        self.batch_thread = None
+        self.batch_worker = None
+        if self.batch_progress.maximum() == 0:
+            # Leave busy mode if the job ended before reporting any progress
+            self.batch_progress.setRange(0, 1)
+        self._set_batch_running(False)
+
+    def closeEvent(self, event):
+        # Stop a running batch job before the window goes away
+        if self.batch_thread is not None:
+            self.batch_worker.cancel()
+            self.batch_thread.quit()
+            self.batch_thread.wait()
+        super().closeEvent(event)
+
+    def _log_stats(self, stats):
+        """Append the per-stage timing table to the log and keep it for export."""
+        self.last_stats = stats
+        self.btn_export_stats.setEnabled(True)
+        self.log_area.append("\n--- Stage Statistics ---")
+        lines = stats.format_lines(
+            ("Stage", "Seconds", "Rows", "Rows/s", "Peak MB", "Delta MB")
+        )
+        self.log_area.append(
+            "<pre>" + "\n".join(html.escape(line) for line in lines) + "</pre>"
+        )
+
+    def _export_stats(self):
+        """Save the statistics of the last batch run as JSON."""
+        if self.last_stats is None:
+            return
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export Stage Statistics", "", "JSON Files (*.json)"
+        )
+        if not path:
+            return
+        try:
+            self.last_stats.to_json(path)
+            self.log_area.append(f"Statistics exported to: {path}")
+        except OSError as e:
+            QMessageBox.critical(self, "Export Error", f"Could not save file:\n{e}")
+
+    def _perform_multi_file_calculation(
+        self,
+        pattern,
+        element_cols,
+        from_unit,
+        to_unit,
+        designation=None,
+        species=False,
+    ):
+        """Convert every data file in a folder / wildcard pattern with a process pool."""
+        from parallel_batch import convert_files, expand_input_paths, summarize_results
+
+        compression = self._output_compression()
+        try:
+            input_paths = expand_input_paths(
+                [pattern], from_unit, to_unit, compression=compression
+            )
+        except ValueError as e:
+            self.log_area.append(str(e))
+            return
+        if not input_paths:
+            self.log_area.append("Error: No data files found.")
+            return
+        workers = self.workers_sb.value()
+        chunksize = (
+            self.chunk_rows_sb.value() if self.cb_streaming.isChecked() else None
+        )
+        validation = self._validation_options()
+        self.log_area.append(
+            f"Converting {len(input_paths)} files with {workers} worker processes..."
+        )
+
+        def job(worker):
+            finished = []
+
+            def log_result(result):
+                finished.append(result)
+                if result.error is None:
+                    quarantined = (
+                        f", {result.quarantined} quarantined"
+                        if result.quarantined
+                        else ""
+                    )
+                    worker.message.emit(
+                        f"[OK] {result.input_path} -> {result.output_path} "
+                        f"({result.rows} rows{quarantined}, {result.seconds:.2f} s)"
+                    )
+                else:
+                    worker.message.emit(f"[FAILED] {result.input_path}: {result.error}")
+                worker.report_progress(len(finished), len(input_paths))
+
+            worker.report_progress(0, len(input_paths))
+            start = time.perf_counter()
+            results = convert_files(
+                input_paths,
+                from_unit,
+                to_unit,
+                ATOMIC_MASSES,
+                names=element_cols,
+                chunksize=chunksize,
+                workers=workers,
+                designation=designation,
+                species=species,
+                on_result=log_result,
+                validation=validation,
+                compression=compression,
+            )
+            return summarize_results(results, time.perf_counter() - start)
+
+        self.batch_progress.setFormat("%v / %m files")
+        self._start_batch_worker(job, self._multi_file_finished)
+
+    def _multi_file_finished(self, summary):
+        self.log_area.append(
+            f"\nDone: {summary['succeeded']} succeeded, {summary['failed']} failed, "
+            f"{summary['rows']} rows in {summary['seconds']:.2f} s "
+            f"({summary['files_per_s']:.2f} files/s, {summary['rows_per_s']:.0f} rows/s)"
+        )
+        if summary["quarantined"]:
+            self.log_area.append(
+                f"{summary['quarantined']} rows failed validation and were quarantined."
+            )
+        if summary["failed"]:
+            QMessageBox.warning(
                 self,
-                "Success",
-                f"Processing complete. Results saved to:\n{output_path}",
+                "Finished with Errors",
+                f"{summary['failed']} of {summary['files']} files failed. See the log.",
+            )
+        else:
+            QMessageBox.information(
+                self, "Success", f"Converted {summary['files']} files."
             )
-        except Exception as e:
-            self.log_area.append(f"\n--- AN ERROR OCCURRED ---\n{e}")
-            QMessageBox.critical(self, "Processing Error", f"An error occurred:\n{e}")
 
 
-# --- 3. APPLICATION ENTRY POINT ---
-if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    window = ConverterApp()
+# --- 4. APPLICATION ENTRY POINT ---
+
+
+def parse_startup_arguments(argv):
+    """Split our own options from the ones meant for Qt."""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument(
+        "--startup-report",
+        action="store_true",
+        help="print how long each startup step took to stderr",
+    )
+    parser.add_argument("--startup-json", help="save the startup timings as JSON")
+    return parser.parse_known_args(argv)
+
+
+def main(argv=None):
+    argv = sys.argv if argv is None else argv
+    args, qt_argv = parse_startup_arguments(argv[1:])
+    startup = StageStats("startup")
+    startup.add("imports", time.perf_counter() - _IMPORT_START)
+
+    with startup.stage("qapplication"):
+        app = QApplication(argv[:1] + qt_argv)
+    window = ConverterApp(startup)
+    show_start = time.perf_counter()
     window.show()
-    sys.exit(app.exec())
+
+    def first_paint():
+        # Runs on the first event loop turn, i.e. after the window is painted
+        startup.add("show", time.perf_counter() - show_start)
+        total = time.perf_counter() - _IMPORT_START
+        window.statusBar().showMessage(f"Ready in {total:.2f} s", 5000)
+        if args.startup_report:
+            print(f"--- Startup ({total:.3f} s) ---", file=sys.stderr)
+            for line in startup.format_lines(
+                ("Step", "Seconds", "Rows", "Rows/s", "Peak MB", "Delta MB")
+            ):
+                print(line, file=sys.stderr)
+        if args.startup_json:
+            startup.to_json(args.startup_json)
+        window.preload_batch_modules()
+
+    QTimer.singleShot(0, first_paint)
+    return app.exec()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1283 @@
+import functools
+import itertools
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from composition_parser import parse_composition
+from conversion_memo import DEFAULT_CACHE_SIZE
+from elements import mass_vector
+from instrumentation import stage
+from pipeline import DEFAULT_QUEUE_CHUNKS, PipelineStats, run_pipeline
+from species import SpeciesConverter, select_species_columns
+from table_io import (
+    CSV,
+    arrow_block,
+    detect_format,
+    open_binary,
+    open_text,
+    output_extension,
+    read_arrow_table,
+    read_column_names,
+    read_frame,
+    split_compression,
+    with_compression,
+    write_frame,
+    write_arrow_table,
+)
+from validation import UNPARSEABLE, quarantine_path_for
+
+# --- 批量计算引擎 ---
+# 命令行版 (convert_at_wt.py) 与图形界面版 (GUI_convert_at_wt.py) 共用的向量化批量转换核心。
+# 整个成分块作为二维浮点数组一次性计算，结果与 wt_to_at / at_to_wt 字典函数逐位一致：
+#   - 含量 <= 0 (或为空) 的元素在字典结果中不存在，这里对应为 NaN (写入CSV时为空单元格)；
+#   - 某行所有元素含量都为 0 时，字典函数对所有元素返回 0，这里同样整行为 0。
+
+
+def _row_sums(parts):
+    """
+    按列顺序逐列累加每一行的总和
+    与 Python 内置 sum() 从左到右累加字典值的顺序一致，保证结果与字典函数逐位相同。
+    :param parts: 二维数组 (行数 x 元素数)
+    :return: 一维数组，每行的总和
+    """
+    totals = np.zeros(parts.shape[0])
+    for j in range(parts.shape[1]):
+        totals += parts[:, j]
+    return totals
+
+
+def _normalise(parts, present):
+    """
+    将每行的摩尔数 (或质量贡献) 归一化为百分比
+    :param parts: 二维数组，不存在的元素位置为 0
+    :param present: 布尔数组，标记含量 > 0 的元素
+    :return: 百分比数组；不存在的元素为 NaN，总和为 0 的行全部为 0
+    """
+    totals = _row_sums(parts)
+    nonzero = totals != 0
+    result = np.full(parts.shape, np.nan)
+    np.divide(parts, totals[:, None], out=result, where=present & nonzero[:, None])
+    result *= 100
+    result[~nonzero] = 0.0
+    return result
+
+
+def wt_to_at_array(wt_values, masses):
+    """
+    将质量百分比 (wt%) 成分块批量转换为原子百分比 (at%)
+    :param wt_values: 二维数组 (行数 x 元素数)，每行为一个合金成分
+    :param masses: 一维数组，与列一一对应的原子量
+    :return: 原子百分比数组，形状与输入相同
+    """
+    wt_values = np.asarray(wt_values, dtype=np.float64)
+    masses = np.asarray(masses, dtype=np.float64)
+    present = wt_values > 0
+    moles = np.where(present, wt_values / masses, 0.0)
+    return _normalise(moles, present)
+
+
+def at_to_wt_array(at_values, masses):
+    """
+    将原子百分比 (at%) 成分块批量转换为质量百分比 (wt%)
+    :param at_values: 二维数组 (行数 x 元素数)，每行为一个合金成分
+    :param masses: 一维数组，与列一一对应的原子量
+    :return: 质量百分比数组，形状与输入相同
+    """
+    at_values = np.asarray(at_values, dtype=np.float64)
+    masses = np.asarray(masses, dtype=np.float64)
+    present = at_values > 0
+    mass_contributions = np.where(present, at_values * masses, 0.0)
+    return _normalise(mass_contributions, present)
+
+
+# 目标单位 -> 批量转换函数
+BATCH_KERNELS = {"at": wt_to_at_array, "wt": at_to_wt_array}
+
+
+# --- 精简内存模式 ---
+# 超宽 (30+ 元素)、超长 (千万行) 的表格：只读入成分列，以 float32 保存与计算，
+# 每行总和用 float64 累加，内存约为 float64 路径的一半，且不必把其余列读入 pandas。
+# 误差界 (u = 2**-24 为 float32 的单位舍入误差)：
+#   - 输入舍入为 float32 引入 <= u；原子量保持 float64，除以 (或乘以) 原子量在 float64 中进行，
+#     结果舍入为 float32 再引入 <= u，每个分量 <= 2u (若原子量也舍入为 float32，还要多出 u，界不成立)；
+#   - 各分量均为正数，float64 累加的总和相对误差同样 <= 2u (累加本身的误差可以忽略)；
+#   - 100 / 总和 舍入为 float32、再与分量相乘，又各引入 <= u。
+# 因此每个结果的相对误差 <= 6u ≈ 3.6e-7，结果不超过 100，绝对误差 <= 3.6e-5 个百分点。
+
+LEAN_DTYPE = np.float32
+
+# 精简内存模式结果的最大相对误差 (相对于精确计算)
+LEAN_RELATIVE_ERROR_BOUND = 6 * 2.0**-24
+
+# 统计行数时每次读取的字节数
+LINE_COUNT_READ_BYTES = 16 * 2**20
+
+# 精简内存模式中每次格式化、拼接写出的行数 (限制文本缓冲区的大小)
+LEAN_WRITE_ROWS = 10_000
+
+
+def lean_convert_block(values, masses, to_unit):
+    """
+    以 float32 转换成分块，每行总和用 float64 累加
+    含量 <= 0 与空值的处理与 BATCH_KERNELS 相同，误差界见 LEAN_RELATIVE_ERROR_BOUND
+    :param values: 二维数组 (行数 x 元素数)，最好已是 float32
+    :param masses: 与列对应的原子量数组
+    :param to_unit: 目标单位，'at' 或 'wt'
+    :return: float32 结果数组
+    """
+    values = np.asarray(values, dtype=LEAN_DTYPE)
+    masses = np.asarray(masses, dtype=np.float64)
+    present = values > 0
+    # 逐列在 float64 中除以 (乘以) 原子量再舍入为 float32，临时的 float64 数组只有一列
+    operation = np.divide if to_unit == "at" else np.multiply
+    parts = np.empty_like(values)
+    for j in range(values.shape[1]):
+        parts[:, j] = operation(values[:, j], masses[j], dtype=np.float64)
+    parts[~present] = 0.0
+    totals = parts.sum(axis=1, dtype=np.float64)
+    nonzero = totals != 0
+    scale = np.divide(100.0, totals, out=np.zeros_like(totals), where=nonzero)
+    parts *= scale.astype(LEAN_DTYPE)[:, None]
+    parts[~present] = np.nan
+    parts[~nonzero] = 0.0
+    return parts
+
+
+# --- 去重与缓存 ---
+# 生产数据中大量重复的成分 (牌号名义成分、每小时复测的标样等) 只需计算一次。
+
+
+def dedupe_rows(values):
+    """
+    找出成分块中互不相同的行
+    含量 <= 0 与空值对结果的影响完全相同，先统一为 0 再比较，可以合并更多重复行。
+    :param values: 二维数组 (行数 x 元素数)
+    :return: (不重复的行, 每一行对应的不重复行下标)，满足 unique[inverse] 与原数据结果相同
+    """
+    clean = np.where(values > 0, values, 0.0)
+    if clean.shape[1] == 0:
+        return clean[:1], np.zeros(len(clean), dtype=np.intp)
+    frame = pd.DataFrame(clean)
+    inverse = frame.groupby(list(frame.columns), sort=False).ngroup().to_numpy()
+    first = np.flatnonzero(~frame.duplicated().to_numpy())
+    return clean[first], inverse
+
+
+class ConversionCache:
+    """
+    批量转换用的有界 LRU 缓存：成分行 -> 转换结果行
+    每个分块先去重，只有缓存中没有的成分才交给向量化核心计算，
+    因此跨分块、跨文件重复出现的成分也只计算一次。
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.rows = 0
+        self.unique_rows = 0
+        self.hits = 0
+        self.misses = 0
+
+    def convert(self, values, masses, to_unit):
+        """
+        转换成分块，结果与直接调用 BATCH_KERNELS[to_unit] 逐位相同
+        :param values: 二维数组 (行数 x 元素数)
+        :param masses: 与列对应的原子量数组
+        :param to_unit: 目标单位，'at' 或 'wt'
+        :return: 转换结果数组
+        """
+        values = np.asarray(values, dtype=np.float64)
+        masses = np.asarray(masses, dtype=np.float64)
+        unique, inverse = dedupe_rows(values)
+        self.rows += len(values)
+        self.unique_rows += len(unique)
+
+        prefix = to_unit.encode() + masses.tobytes()
+        keys = [prefix + row.tobytes() for row in unique]
+        results = np.empty(unique.shape)
+        missing = []
+        for i, key in enumerate(keys):
+            cached = self._entries.get(key)
+            if cached is None:
+                missing.append(i)
+            else:
+                self._entries.move_to_end(key)
+                results[i] = cached
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            computed = BATCH_KERNELS[to_unit](unique[missing], masses)
+            results[missing] = computed
+            for i, row in zip(missing, computed):
+                self._entries[keys[i]] = row
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return results[inverse]
+
+    def summary(self):
+        """返回行数、不重复行数与缓存命中情况"""
+        return {
+            "rows": self.rows,
+            "unique_rows": self.unique_rows,
+            "hits": self.hits,
+            "misses": self.misses,
+            "cached": len(self._entries),
+        }
+
+
+# --- DataFrame 辅助函数 ---
+
+
+def convert_block(
+    values,
+    masses,
+    to_unit,
+    cache=None,
+    species_converter=None,
+    unit_converter=None,
+    units=None,
+):
+    """
+    转换二维成分块，按需经过去重缓存
+    :param values: 二维数组 (行数 x 元素数)
+    :param masses: 与列对应的原子量数组
+    :param to_unit: 目标单位，'at' 或 'wt'
+    :param cache: ConversionCache 或 None
+    :param species_converter: species.SpeciesConverter；给出时各列为化合物 wt%，
+        结果为 species_converter.elements 中各元素的 at% / wt% (此时忽略 masses)
+    :param unit_converter: units.UnitConverter；给出时按其源单位与目标单位换算 (此时忽略 to_unit)
+    :param units: 每行的源单位，见 units.UnitConverter.convert
+    :return: 转换结果数组
+    """
+    if unit_converter is not None:
+        return unit_converter.convert(values, masses, units)
+    if species_converter is not None:
+        return species_converter.convert(values, to_unit)
+    if cache is None:
+        return BATCH_KERNELS[to_unit](values, masses)
+    return cache.convert(values, masses, to_unit)
+
+
+def result_column_names(
+    element_cols, to_unit, species_converter=None, unit_converter=None
+):
+    """结果列名，形如 'Cu(at%)'；化合物输入时为各元素的结果列"""
+    if unit_converter is not None:
+        return unit_converter.result_column_names(element_cols)
+    if species_converter is not None:
+        element_cols = species_converter.elements
+    return [f"{el}({to_unit}%)" for el in element_cols]
+
+
+def convert_frame(
+    df,
+    element_cols,
+    masses,
+    to_unit,
+    cache=None,
+    species_converter=None,
+    unit_converter=None,
+):
+    """
+    对 DataFrame 中的成分列进行批量转换
+    :param df: 输入数据
+    :param element_cols: 成分列名列表
+    :param masses: 与 element_cols 对应的原子量数组
+    :param to_unit: 目标单位，'at' 或 'wt'
+    :param cache: ConversionCache；给出时先去重，每个不同成分只计算一次
+    :param species_converter: 见 convert_block
+    :param unit_converter: 见 convert_block；每行的源单位取自 df 中的单位列
+    :return: 结果 DataFrame，列名形如 'Cu(at%)'，索引与 df 相同
+    """
+    values = df[element_cols].to_numpy(dtype=np.float64)
+    units = None
+    if unit_converter is not None and unit_converter.unit_column is not None:
+        units = df[unit_converter.unit_column].to_numpy()
+    result = convert_block(
+        values, masses, to_unit, cache, species_converter, unit_converter, units
+    )
+    return pd.DataFrame(
+        result,
+        index=df.index,
+        columns=result_column_names(
+            element_cols, to_unit, species_converter, unit_converter
+        ),
+    )
+
+
+# --- 流式分块转换 ---
+
+# 流式模式下每次读入的默认行数
+DEFAULT_CHUNK_ROWS = 100_000
+
+
+def _common_dtype(dtypes):
+    """
+    合并同一列在不同分块中推断出的类型，规则与 pandas 一次性读取整个文件时相同：
+    整数与浮点混合时提升为浮点，其余不一致的情况统一为 object。
+    """
+    unique = list(dict.fromkeys(dtypes))
+    if len(unique) == 1:
+        return unique[0]
+    if all(
+        pd.api.types.is_numeric_dtype(dt) and not pd.api.types.is_bool_dtype(dt)
+        for dt in unique
+    ):
+        return np.result_type(*unique)
+    return object
+
+
+def merge_dtypes(dtype_maps):
+    """
+    合并多个分块 (或分区) 各自推断出的列类型
+    :param dtype_maps: 列名 -> dtype 字典的可迭代对象
+    :return: 合并后的 列名 -> dtype 字典
+    """
+    seen = {}
+    for dtype_map in dtype_maps:
+        for col, dtype in dtype_map.items():
+            seen.setdefault(col, []).append(dtype)
+    return {col: _common_dtype(dtypes) for col, dtypes in seen.items()}
+
+
+def scan_csv_dtypes(csv_path, chunksize=DEFAULT_CHUNK_ROWS):
+    """
+    分块扫描整个CSV文件，得到与一次性读取时一致的列类型
+    若不预先统一类型，某个分块里恰好没有空值的整数列会被写成 '1' 而不是 '1.0'，
+    流式结果就会与非流式结果不同。
+    :param csv_path: CSV文件路径
+    :param chunksize: 每块行数
+    :return: (列名 -> dtype 的字典, 总行数)
+    """
+    dtype_maps, total_rows = [], 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        dtype_maps.append(dict(chunk.dtypes))
+        total_rows += len(chunk)
+    return merge_dtypes(dtype_maps), total_rows
+
+
+class ConversionCancelled(Exception):
+    """进度回调请求取消转换时抛出"""
+
+
+def write_converted_chunks(
+    chunks,
+    out,
+    element_cols,
+    masses,
+    to_unit,
+    header=True,
+    cache=None,
+    stats=None,
+    progress=None,
+    validator=None,
+    designation=None,
+    species_converter=None,
+    unit_converter=None,
+):
+    """
+    逐块转换并写入已打开的文本流 (文件或标准输出)，只在第一块写表头
+    :param chunks: DataFrame 分块的可迭代对象
+    :param out: 以 newline="" 打开的文本流
+    :param header: 为 False 时不写表头 (用于拼接在其他输出之后)
+    :param cache: 见 convert_frame
+    :param stats: instrumentation.StageStats；给出时按阶段累计各分块的耗时
+    :param progress: 每写完一块调用一次 progress(已处理行数)；
+        回调抛出 ConversionCancelled 即可在两块之间中止转换
+    :param validator: validation.RowValidator；给出时先校验每一块，坏行写入隔离文件
+    :param designation: DesignationColumn；给出时先把每一块的牌号列展开为成分列 (记为 'parse' 阶段)，
+        element_cols 应为其 elements
+    :param species_converter: 见 convert_block
+    :param unit_converter: 见 convert_frame
+    :return: 处理的总行数 (含被隔离的行)
+    """
+    total_rows = 0
+    chunks = iter(chunks)
+    while True:
+        # 分块读取器在取下一块时才真正解析，因此读取耗时要包住 next()
+        with stage(stats, "read") as record:
+            chunk = next(chunks, None)
+            record["rows"] = 0 if chunk is None else len(chunk)
+        if chunk is None:
+            break
+        total_rows += len(chunk)
+        flags = None
+        if designation is not None:
+            with stage(stats, "parse", len(chunk)):
+                chunk, flags = designation.expand_with_reasons(chunk)
+        chunk = _validate_stage(chunk, element_cols, validator, stats, flags)
+        with stage(stats, "convert", len(chunk)):
+            result_df = convert_frame(
+                chunk,
+                element_cols,
+                masses,
+                to_unit,
+                cache,
+                species_converter,
+                unit_converter,
+            )
+        with stage(stats, "concat", len(chunk)):
+            final_df = pd.concat([chunk, result_df], axis=1)
+        with stage(stats, "write", len(chunk)):
+            final_df.to_csv(out, header=header, index=False)
+        header = False
+        if progress is not None:
+            progress(total_rows)
+    return total_rows
+
+
+def _validate_stage(df, element_cols, validator, stats, flags=None):
+    """按需校验成分行，记为 'validate' 阶段；返回需要转换的行 (flags 见 RowValidator.split)"""
+    if validator is None:
+        return df
+    with stage(stats, "validate", len(df)):
+        return validator.split(df, element_cols, flags)
+
+
+def _report_progress(progress, total_rows, rows):
+    progress(rows, total_rows)
+
+
+def convert_csv_streaming(
+    csv_path,
+    output_path,
+    element_cols,
+    masses,
+    to_unit,
+    chunksize=DEFAULT_CHUNK_ROWS,
+    encoding="utf-8",
+    cache=None,
+    stats=None,
+    progress=None,
+    validator=None,
+    designation=None,
+    species_converter=None,
+    unit_converter=None,
+):
+    """
+    按行分块读取CSV、逐块转换并追加写入输出文件，内存占用与文件大小无关
+    输出与一次性读取、转换、合并后 to_csv 的结果逐字节相同。
+    :param csv_path: 输入CSV文件路径
+    :param output_path: 输出CSV文件路径
+    :param element_cols: 成分列名列表
+    :param masses: 与 element_cols 对应的原子量数组
+    :param to_unit: 目标单位，'at' 或 'wt'
+    :param chunksize: 每块行数
+    :param encoding: 输出文件编码
+    :param cache: 见 convert_frame
+    :param stats: 见 write_converted_chunks；类型预扫描记为 'scan' 阶段
+    :param progress: 见 convert_file
+    :param validator: 见 write_converted_chunks
+    :param designation: 见 write_converted_chunks；应已扫描过整列
+    :param species_converter: 见 convert_block
+    :param unit_converter: 见 convert_frame
+    :return: 处理的总行数
+    """
+    with stage(stats, "scan") as record:
+        dtypes, total_rows = scan_csv_dtypes(csv_path, chunksize)
+        record["rows"] = total_rows
+    on_chunk = None
+    if progress is not None:
+        progress(0, total_rows)
+        on_chunk = functools.partial(_report_progress, progress, total_rows)
+    with open_text(output_path, "w", encoding) as out:
+        chunks = pd.read_csv(csv_path, chunksize=chunksize, dtype=dtypes)
+        return write_converted_chunks(
+            chunks,
+            out,
+            element_cols,
+            masses,
+            to_unit,
+            cache=cache,
+            stats=stats,
+            progress=on_chunk,
+            validator=validator,
+            designation=designation,
+            species_converter=species_converter,
+            unit_converter=unit_converter,
+        )
+
+
+def convert_csv_pipelined(
+    csv_path,
+    output_path,
+    element_cols,
+    masses,
+    to_unit,
+    chunksize=DEFAULT_CHUNK_ROWS,
+    encoding="utf-8",
+    cache=None,
+    stats=None,
+    progress=None,
+    validator=None,
+    species_converter=None,
+    unit_converter=None,
+    pipeline_stats=None,
+    queue_chunks=DEFAULT_QUEUE_CHUNKS,
+):
+    """
+    与 convert_csv_streaming 相同的分块转换，但读取、转换、写出三个阶段并发执行 (见 pipeline.run_pipeline)：
+    转换第 N 块时，第 N+1 块已在解析、第 N-1 块正在写出。输出与 convert_csv_streaming 逐字节相同。
+    校验 (若有) 与合并结果列计入 'convert' 阶段。
+    :param stats: 类型预扫描记为 'scan' 阶段，三个阶段的忙碌时间分别累计为 'read'、'convert'、'write'
+    :param pipeline_stats: pipeline.PipelineStats；给出时累计各阶段的忙碌、等待时间与利用率
+    :param queue_chunks: 阶段之间每个队列最多缓存的分块数
+    其余参数见 convert_csv_streaming
+    :return: 处理的总行数
+    """
+    with stage(stats, "scan") as record:
+        dtypes, total_rows = scan_csv_dtypes(csv_path, chunksize)
+        record["rows"] = total_rows
+    on_chunk = None
+    if progress is not None:
+        progress(0, total_rows)
+        done = [0]
+
+        def on_chunk(rows):
+            done[0] += rows
+            progress(done[0], total_rows)
+
+    def convert(chunk):
+        if validator is not None:
+            chunk = validator.split(chunk, element_cols)
+        result_df = convert_frame(
+            chunk,
+            element_cols,
+            masses,
+            to_unit,
+            cache,
+            species_converter,
+            unit_converter,
+        )
+        return pd.concat([chunk, result_df], axis=1)
+
+    run = PipelineStats()
+    with open_text(output_path, "w", encoding) as out:
+        header = [True]
+
+        def write(final_df):
+            final_df.to_csv(out, header=header[0], index=False)
+            header[0] = False
+
+        chunks = pd.read_csv(csv_path, chunksize=chunksize, dtype=dtypes)
+        try:
+            rows = run_pipeline(
+                chunks, convert, write, queue_chunks, on_chunk, pipeline_stats=run
+            )
+        finally:
+            if stats is not None:
+                run.add_to(stats)
+            if pipeline_stats is not None:
+                pipeline_stats.merge(run)
+    return rows
+
+
+def _count_data_lines(csv_path):
+    """统计CSV文件的数据行数 (换行符个数减去表头，末行没有换行符时加一)，只用于进度显示"""
+    lines = 0
+    last = b"\n"
+    with open_binary(csv_path) as f:
+        for block in iter(lambda: f.read(LINE_COUNT_READ_BYTES), b""):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    return max(lines - 1 + (last != b"\n"), 0)
+
+
+def _next_data_lines(raw, count):
+    """从二进制文件中取出接下来 count 个非空行 (pandas 读取时同样跳过空行)，去掉行尾换行符"""
+    lines = []
+    while len(lines) < count:
+        block = [
+            line.rstrip(b"\r\n") for line in itertools.islice(raw, count - len(lines))
+        ]
+        if not block:
+            break
+        lines.extend(line for line in block if line)
+    return lines
+
+
+def _write_lean_lines(out, raw, result):
+    """把结果块格式化为文本，与输入文件中对应的原始行逐行拼接后写出"""
+    result_lines = (
+        pd.DataFrame(result)
+        .to_csv(header=False, index=False, lineterminator="\n")
+        .split("\n")
+    )
+    source_lines = (
+        b"\n".join(_next_data_lines(raw, len(result))).decode("utf-8").split("\n")
+    )
+    out.write(os.linesep.join(map(",".join, zip(source_lines, result_lines))))
+    out.write(os.linesep)
+
+
+def convert_csv_lean(
+    csv_path,
+    output_path,
+    element_cols,
+    masses,
+    to_unit,
+    chunksize=DEFAULT_CHUNK_ROWS,
+    encoding="utf-8",
+    stats=None,
+    progress=None,
+):
+    """
+    精简内存模式：分块只把成分列读为 float32，用 lean_convert_block 转换，
+    其余列不经过 pandas，按输入文件中的原始文本逐行与结果拼接
+    输入须为 UTF-8 编码；与分区并行模式一样，要求字段内部不含换行符。
+    结果以 float32 的最短表示写出，位数少于 float64 路径。
+    :param chunksize: 每块行数
+    :param stats: 见 write_converted_chunks；进度所需的行数统计记为 'scan' 阶段
+    :param progress: 见 convert_file
+    其余参数见 convert_csv_streaming
+    :return: 处理的总行数
+    """
+    total_rows = None
+    if progress is not None:
+        with stage(stats, "scan") as record:
+            total_rows = _count_data_lines(csv_path)
+            record["rows"] = total_rows
+        progress(0, total_rows)
+    reader = pd.read_csv(
+        csv_path,
+        usecols=element_cols,
+        dtype=dict.fromkeys(element_cols, LEAN_DTYPE),
+        chunksize=chunksize,
+    )
+    rows = 0
+    with open_binary(csv_path) as raw, open_text(output_path, "w", encoding) as out:
+        header = raw.readline().decode("utf-8-sig").rstrip("\r\n")
+        out.write(",".join([header] + result_column_names(element_cols, to_unit)))
+        out.write(os.linesep)
+        while True:
+            with stage(stats, "read") as record:
+                chunk = next(reader, None)
+                record["rows"] = 0 if chunk is None else len(chunk)
+            if chunk is None:
+                break
+            with stage(stats, "convert", len(chunk)):
+                result = lean_convert_block(
+                    chunk[element_cols].to_numpy(), masses, to_unit
+                )
+            with stage(stats, "write", len(chunk)):
+                for start in range(0, len(result), LEAN_WRITE_ROWS):
+                    part = result[start : start + LEAN_WRITE_ROWS]
+                    _write_lean_lines(out, raw, part)
+            rows += len(chunk)
+            if progress is not None:
+                progress(rows, max(total_rows, rows))
+    return rows
+
+
+# --- 列选择与输出文件命名 ---
+
+# 默认输出文件名模板：alloys.csv -> alloys-at.csv, alloys.parquet -> alloys-at.parquet
+# 可用字段：{stem} 输入文件名(不含扩展名)、{ext} 输入扩展名、{from} 源单位、{to} 目标单位、
+# {out_ext} 默认输出扩展名 (列式格式保持原扩展名，其余为 .csv；压缩的输入加上同样的压缩扩展名，例如 .csv.gz)
+DEFAULT_OUTPUT_TEMPLATE = "{stem}-{to}{out_ext}"
+
+
+def select_element_columns(columns, atomic_masses, names=None, col_range=None):
+    """
+    确定需要计算的成分列
+    :param columns: 文件中的全部列名
+    :param atomic_masses: 元素 -> 原子量 的字典，用于校验与自动识别
+    :param names: 指定的列名列表
+    :param col_range: (起始列号, 结束列号)，从1开始且包含两端，与交互模式一致
+    :return: 成分列名列表；names 与 col_range 都未指定时，选出所有列名为已知元素的列
+    """
+    columns = list(columns)
+    if names:
+        missing = [name for name in names if name not in columns]
+        if missing:
+            raise ValueError(f"错误：文件中找不到以下列: {', '.join(missing)}")
+        element_cols = list(names)
+    elif col_range is not None:
+        start, end = col_range
+        if not 1 <= start <= end <= len(columns):
+            raise ValueError(
+                f"错误：列号范围 {start}-{end} 无效，文件共有 {len(columns)} 列。"
+            )
+        element_cols = columns[start - 1 : end]
+    else:
+        element_cols = [col for col in columns if col in atomic_masses]
+        if not element_cols:
+            raise ValueError("错误：文件中没有列名为已知元素的列，请指定成分列。")
+
+    unknown = [el for el in element_cols if el not in atomic_masses]
+    if unknown:
+        raise ValueError(
+            f"错误：以下列名不在预设的元素列表中: {', '.join(unknown)}。"
+            "请检查列名是否为正确的元素符号。"
+        )
+    return element_cols
+
+
+def output_path_for(
+    input_path,
+    from_unit,
+    to_unit,
+    template=DEFAULT_OUTPUT_TEMPLATE,
+    output_dir=None,
+    compression=None,
+):
+    """
+    根据模板生成输出文件路径
+    :param input_path: 输入文件路径；压缩扩展名不计入 {stem} 与 {ext}
+    :param template: 文件名模板，见 DEFAULT_OUTPUT_TEMPLATE
+    :param output_dir: 输出目录，默认与输入文件相同
+    :param compression: 输出的压缩方式 (见 table_io.parse_compression，'none' 为不压缩)；
+        为 None 时由模板生成的扩展名决定
+    :return: 输出文件路径
+    """
+    directory, file_name = os.path.split(input_path)
+    stem, ext = os.path.splitext(split_compression(file_name)[0])
+    name = template.format(
+        stem=stem,
+        ext=ext,
+        out_ext=output_extension(file_name),
+        to=to_unit,
+        **{"from": from_unit},
+    )
+    if compression is not None:
+        name = with_compression(name, compression)
+    return os.path.join(directory if output_dir is None else output_dir, name)
+
+
+def resolve_columns(path, atomic_masses, names=None, col_range=None):
+    """
+    读取文件的列名，确定成分列并一次性取出对应的原子量
+    :return: (成分列名列表, 原子量数组)
+    """
+    columns = read_column_names(path)
+    element_cols = select_element_columns(columns, atomic_masses, names, col_range)
+    return element_cols, mass_vector(element_cols, atomic_masses)
+
+
+def resolve_composition(path, atomic_masses, names=None, col_range=None, species=False):
+    """
+    确定成分列：元素列，或 species 为 True 时的化合物列 (列名为化学式，例如 Al2O3)
+    :return: (成分列名列表, 原子量数组 (化合物输入时为 None), SpeciesConverter 或 None)
+    """
+    if not species:
+        return resolve_columns(path, atomic_masses, names, col_range) + (None,)
+    columns = read_column_names(path)
+    species_cols = select_species_columns(columns, atomic_masses, names, col_range)
+    return species_cols, None, SpeciesConverter(species_cols, atomic_masses)
+
+
+# --- 牌号 / 化学式列 ---
+# 成分以字符串形式保存在一列中 (例如 'Al-4.5Cu-1.5Mg') 时，先展开为按元素分列的成分块，
+# 追加在原有列之后，再按普通成分列转换。
+
+
+class DesignationColumn:
+    """
+    把牌号 / 化学式字符串列展开为按元素分列的成分块
+    每一块只对其中互不相同的字符串解析一次 (解析结果另有跨分块、跨文件的 LRU 缓存)，
+    再按下标一次性取出整个成分块。
+    """
+
+    def __init__(self, column, atomic_masses, errors="raise"):
+        """
+        :param column: 字符串列名
+        :param atomic_masses: 用于检查元素符号的原子量表
+        :param errors: 'raise' 遇到空值或无法解析的字符串时报错；
+            'coerce' 把这些行的成分全部设为空值 (配合 RowValidator 时会被隔离，
+            空单元格的原因为 missing，无法解析的字符串为 unparseable，见 expand_with_reasons)
+        """
+        self.column = column
+        self.atomic_masses = atomic_masses
+        self.errors = errors
+        self.elements = []
+        self.rows = 0
+        self.unique_strings = 0
+        self.invalid_rows = 0
+
+    def _parse_unique(self, strings):
+        """逐个解析互不相同的字符串；errors='coerce' 时无法解析的结果为 None"""
+        compositions = []
+        for text in strings:
+            try:
+                compositions.append(parse_composition(text, self.atomic_masses))
+            except ValueError:
+                if self.errors == "raise":
+                    raise
+                compositions.append(None)
+        return compositions
+
+    def scan(self, strings):
+        """
+        扫描整列，按首次出现的顺序确定展开后的元素列
+        流式处理时必须先扫描，保证每一块展开得到的列相同。
+        :param strings: 该列全部值的序列 (pandas.Series 或列表)
+        """
+        for composition in self._parse_unique(pd.unique(pd.Series(strings))):
+            for el in composition or ():
+                if el not in self.elements:
+                    self.elements.append(el)
+        if not self.elements:
+            raise ValueError(f"错误：列 '{self.column}' 中没有可以解析的成分。")
+
+    def expand(self, frame):
+        """
+        把一块数据的字符串列展开为成分列，追加在原有列之后
+        字符串中没有出现的元素含量为 0。
+        :param frame: 含字符串列的 DataFrame
+        :return: 新的 DataFrame
+        """
+        return self.expand_with_reasons(frame)[0]
+
+    def expand_with_reasons(self, frame):
+        """
+        与 expand 相同，另外返回每行的原因位掩码，供 RowValidator.split 的 flags 使用
+        :return: (新的 DataFrame, 整数数组；字符串无法解析的行为 validation.UNPARSEABLE，其余为 0)
+        """
+        clash = [el for el in self.elements if el in frame.columns]
+        if clash:
+            raise ValueError(
+                f"错误：文件中已有列 {', '.join(clash)}，无法展开列 '{self.column}'。"
+            )
+        codes, uniques = pd.factorize(frame[self.column])
+        compositions = self._parse_unique(uniques)
+        index = {el: j for j, el in enumerate(self.elements)}
+        # 最后一行对应空值 (factorize 的下标 -1)
+        block = np.zeros((len(uniques) + 1, len(self.elements)))
+        block[-1] = np.nan
+        for i, composition in enumerate(compositions):
+            if composition is None:
+                block[i] = np.nan
+                continue
+            for el, value in composition.items():
+                if el not in index:
+                    raise ValueError(
+                        f"错误：成分 '{uniques[i]}' 中的元素 {el} 不在扫描得到的元素列中。"
+                    )
+                block[i, index[el]] = value
+        if self.errors == "raise" and (codes == -1).any():
+            raise ValueError(f"错误：列 '{self.column}' 中有空单元格。")
+
+        values = block[codes]
+        unparseable = np.array(
+            [composition is None for composition in compositions] + [False]
+        )[codes]
+        self.rows += len(frame)
+        self.unique_strings += len(uniques)
+        self.invalid_rows += int(np.isnan(values).all(axis=1).sum())
+        parsed = pd.DataFrame(values, index=frame.index, columns=self.elements)
+        reasons = np.where(unparseable, UNPARSEABLE, 0)
+        return pd.concat([frame, parsed], axis=1), reasons
+
+
+def convert_designation_file(
+    input_path,
+    output_path,
+    to_unit,
+    atomic_masses,
+    designation,
+    chunksize=None,
+    encoding="utf-8",
+    cache=None,
+    stats=None,
+    progress=None,
+    validator=None,
+):
+    """
+    转换成分以牌号 / 化学式字符串保存在一列中的文件
+    :param designation: 字符串列名
+    其余参数见 convert_file；给出 validator 时无法解析的字符串按空成分处理并被隔离，否则报错
+    :return: (处理的行数, 展开得到的成分列名列表)
+    """
+    parser = DesignationColumn(
+        designation, atomic_masses, "raise" if validator is None else "coerce"
+    )
+    with stage(stats, "validate"):
+        if designation not in read_column_names(input_path):
+            raise ValueError(f"错误：文件中找不到以下列: {designation}")
+
+    if chunksize is None:
+        df = _read_frame_stage(input_path, stats)
+        with stage(stats, "parse", len(df)):
+            parser.scan(df[designation])
+            df, flags = parser.expand_with_reasons(df)
+        masses = mass_vector(parser.elements, atomic_masses)
+        _convert_and_write(
+            df,
+            output_path,
+            parser.elements,
+            masses,
+            to_unit,
+            encoding,
+            cache,
+            stats,
+            progress,
+            validator,
+            flags=flags,
+        )
+        return len(df), parser.elements
+
+    if detect_format(input_path) != CSV or detect_format(output_path) != CSV:
+        raise ValueError("错误：流式分块模式只支持CSV输入和CSV输出。")
+    # 先只读取字符串列，确定所有分块共同的元素列
+    with stage(stats, "parse") as record:
+        strings = pd.read_csv(input_path, usecols=[designation])[designation]
+        parser.scan(strings)
+        record["rows"] = len(strings)
+    total_rows = convert_csv_streaming(
+        input_path,
+        output_path,
+        parser.elements,
+        mass_vector(parser.elements, atomic_masses),
+        to_unit,
+        chunksize,
+        encoding,
+        cache,
+        stats,
+        progress,
+        validator,
+        parser,
+    )
+    return total_rows, parser.elements
+
+
+def convert_csv_file(
+    csv_path,
+    output_path,
+    to_unit,
+    atomic_masses,
+    names=None,
+    col_range=None,
+    chunksize=None,
+    encoding="utf-8",
+    cache=None,
+    stats=None,
+    progress=None,
+    validator=None,
+    species=False,
+    unit_converter=None,
+    lean=False,
+    pipeline_stats=None,
+):
+    """
+    非交互地转换一个CSV文件
+    :param chunksize: 为 None 时一次性读入，否则流式分块处理
+    :param stats: instrumentation.StageStats；给出时记录各阶段的耗时与内存
+    :param progress: 见 convert_file
+    :param validator: 见 convert_file
+    :param species: 见 convert_file
+    :param unit_converter: 见 convert_file
+    :param lean: 见 convert_file
+    :param pipeline_stats: 见 convert_file
+    其余参数见 select_element_columns 与 convert_csv_streaming
+    :return: (处理的行数, 成分列名列表)
+    """
+    with stage(stats, "validate"):
+        element_cols, masses, species_converter = resolve_composition(
+            csv_path, atomic_masses, names, col_range, species
+        )
+        _check_unit_columns(unit_converter, csv_path, element_cols)
+
+    if lean:
+        total_rows = convert_csv_lean(
+            csv_path,
+            output_path,
+            element_cols,
+            masses,
+            to_unit,
+            chunksize or DEFAULT_CHUNK_ROWS,
+            encoding,
+            stats,
+            progress,
+        )
+        return total_rows, element_cols
+    if pipeline_stats is not None:
+        total_rows = convert_csv_pipelined(
+            csv_path,
+            output_path,
+            element_cols,
+            masses,
+            to_unit,
+            chunksize or DEFAULT_CHUNK_ROWS,
+            encoding,
+            cache,
+            stats,
+            progress,
+            validator,
+            species_converter,
+            unit_converter,
+            pipeline_stats,
+        )
+        return total_rows, element_cols
+    if chunksize is not None:
+        total_rows = convert_csv_streaming(
+            csv_path,
+            output_path,
+            element_cols,
+            masses,
+            to_unit,
+            chunksize,
+            encoding,
+            cache,
+            stats,
+            progress,
+            validator,
+            species_converter=species_converter,
+            unit_converter=unit_converter,
+        )
+        return total_rows, element_cols
+
+    df = _read_csv_stage(csv_path, stats)
+    _convert_and_write(
+        df,
+        output_path,
+        element_cols,
+        masses,
+        to_unit,
+        encoding,
+        cache,
+        stats,
+        progress,
+        validator,
+        species_converter,
+        unit_converter,
+    )
+    return len(df), element_cols
+
+
+def _check_unit_columns(unit_converter, path, element_cols):
+    """检查单位列存在、余量元素不是成分列"""
+    if unit_converter is None:
+        return
+    column = unit_converter.unit_column
+    if column is not None and column not in read_column_names(path):
+        raise ValueError(f"错误：文件中找不到单位列: {column}")
+    unit_converter.check_columns(element_cols)
+
+
+def _read_csv_stage(csv_path, stats):
+    """一次性读入CSV，记为 'read' 阶段"""
+    with stage(stats, "read") as record:
+        df = pd.read_csv(csv_path)
+        record["rows"] = len(df)
+    return df
+
+
+def _read_frame_stage(path, stats):
+    """把任意支持格式的文件读入为 DataFrame，记为 'read' 阶段"""
+    with stage(stats, "read") as record:
+        df = read_frame(path)
+        record["rows"] = len(df)
+    return df
+
+
+def _convert_and_write(
+    df,
+    output_path,
+    element_cols,
+    masses,
+    to_unit,
+    encoding,
+    cache,
+    stats,
+    progress,
+    validator=None,
+    species_converter=None,
+    unit_converter=None,
+    flags=None,
+):
+    """
+    校验、转换、合并结果列并写出，分别记为 'validate'、'convert'、'concat'、'write' 阶段
+    :param flags: 每行已知的原因位掩码，见 RowValidator.split
+    """
+    df = _validate_stage(df, element_cols, validator, stats, flags)
+    if progress is not None:
+        progress(0, len(df))
+    with stage(stats, "convert", len(df)):
+        result_df = convert_frame(
+            df,
+            element_cols,
+            masses,
+            to_unit,
+            cache,
+            species_converter,
+            unit_converter,
+        )
+    with stage(stats, "concat", len(df)):
+        final_df = pd.concat([df, result_df], axis=1)
+    with stage(stats, "write", len(df)):
+        if progress is not None and detect_format(output_path) == CSV:
+            _write_csv_slices(final_df, output_path, encoding, progress)
+        else:
+            write_frame(final_df, output_path, encoding)
+    if progress is not None:
+        progress(len(df), len(df))
+
+
+def _write_csv_slices(df, output_path, encoding, progress):
+    """
+    按 DEFAULT_CHUNK_ROWS 行一段写出CSV，每段之后报告进度 (写出是最慢的阶段)
+    与一次性 to_csv 的输出逐字节相同。
+    """
+    with open_text(output_path, "w", encoding) as out:
+        for start in range(0, max(len(df), 1), DEFAULT_CHUNK_ROWS):
+            part = df.iloc[start : start + DEFAULT_CHUNK_ROWS]
+            part.to_csv(out, header=start == 0, index=False)
+            progress(start + len(part), len(df))
+
+
+def convert_file(
+    input_path,
+    output_path,
+    to_unit,
+    atomic_masses,
+    names=None,
+    col_range=None,
+    chunksize=None,
+    encoding="utf-8",
+    cache=None,
+    stats=None,
+    progress=None,
+    validator=None,
+    designation=None,
+    species=False,
+    unit_converter=None,
+    lean=False,
+    pipeline_stats=None,
+):
+    """
+    非交互地转换一个文件，输入、输出格式 (CSV / Parquet / Feather) 由扩展名决定
+    列式输入不经过 pandas：只有成分列被转换为数组，其余列原样从 Arrow 表写出。
+    :param chunksize: 流式分块处理的行数，只支持CSV到CSV
+    :param progress: 进度回调 progress(已处理行数, 总行数)。CSV输出按块报告，
+        列式输出只在开始和结束时报告；回调抛出 ConversionCancelled 即可中止转换，
+        此时输出文件可能不完整，由调用方删除
+    :param validator: validation.RowValidator；给出时先校验成分行，不合格的行写入
+        隔离文件 (默认为 validation.quarantine_path_for(output_path))，其余行照常转换。
+        列式输入经校验时会整表读入 pandas
+    :param designation: 成分以牌号 / 化学式字符串保存在此列中 (例如 'Al-4.5Cu-1.5Mg')，
+        见 convert_designation_file；此时忽略 names 与 col_range
+    :param species: 为 True 时成分列为化合物的质量百分比 (列名为化学式，例如 Al2O3、MgO)，
+        按化学计量矩阵转换为各元素的 at% (to_unit='at') 或 wt% (to_unit='wt')；不能与去重缓存同时使用
+    :param unit_converter: units.UnitConverter；给出时按其源单位 (或每行单位列) 换算为其目标单位
+        (例如 ppm、质量 / 摩尔分数)，此时忽略 to_unit；不能与去重缓存、牌号列或化合物成分同时使用
+    :param lean: 精简内存模式 (float32)，见 convert_csv_lean；只支持CSV到CSV的普通 wt / at 转换，
+        总是分块处理 (chunksize 为 None 时按 DEFAULT_CHUNK_ROWS)
+    :param pipeline_stats: pipeline.PipelineStats；给出时分块的读取、转换、写出并发执行
+        (见 convert_csv_pipelined)，各阶段的利用率累计在其中；只支持CSV到CSV，不能与牌号列或精简内存模式同时使用，
+        chunksize 为 None 时按 DEFAULT_CHUNK_ROWS
+    其余参数见 convert_csv_file
+    :return: (处理的行数, 成分列名列表)
+    """
+    if validator is not None:
+        validator.start(quarantine_path_for(output_path))
+    if species and (cache is not None or designation is not None):
+        raise ValueError("错误：化合物成分不能与去重缓存或牌号列同时使用。")
+    if unit_converter is not None and (
+        cache is not None or designation is not None or species
+    ):
+        raise ValueError("错误：单位换算不能与去重缓存、牌号列或化合物成分同时使用。")
+    if lean and (
+        cache is not None
+        or validator is not None
+        or designation is not None
+        or species
+        or unit_converter is not None
+    ):
+        raise ValueError(
+            "错误：精简内存模式不能与去重缓存、校验、牌号列、化合物成分或单位换算同时使用。"
+        )
+    if pipeline_stats is not None and (designation is not None or lean):
+        raise ValueError("错误：流水线模式不能与牌号列或精简内存模式同时使用。")
+    if designation is not None:
+        return convert_designation_file(
+            input_path,
+            output_path,
+            to_unit,
+            atomic_masses,
+            designation,
+            chunksize,
+            encoding,
+            cache,
+            stats,
+            progress,
+            validator,
+        )
+    in_format, out_format = detect_format(input_path), detect_format(output_path)
+    if in_format == CSV and out_format == CSV:
+        return convert_csv_file(
+            input_path,
+            output_path,
+            to_unit,
+            atomic_masses,
+            names,
+            col_range,
+            chunksize,
+            encoding,
+            cache,
+            stats,
+            progress,
+            validator,
+            species,
+            unit_converter,
+            lean,
+            pipeline_stats,
+        )
+    if lean:
+        raise ValueError("错误：精简内存模式只支持CSV输入和CSV输出。")
+    if pipeline_stats is not None:
+        raise ValueError("错误：流水线模式只支持CSV输入和CSV输出。")
+    if chunksize is not None:
+        raise ValueError("错误：流式分块模式只支持CSV输入和CSV输出。")
+
+    with stage(stats, "validate"):
+        element_cols, masses, species_converter = resolve_composition(
+            input_path, atomic_masses, names, col_range, species
+        )
+        _check_unit_columns(unit_converter, input_path, element_cols)
+    # 校验与每行单位都需要 DataFrame；只有固定源单位时仍可直接转换 Arrow 表
+    per_row_units = unit_converter is not None and unit_converter.unit_column
+    if in_format == CSV or validator is not None or per_row_units:
+        df = _read_frame_stage(input_path, stats)
+        _convert_and_write(
+            df,
+            output_path,
+            element_cols,
+            masses,
+            to_unit,
+            encoding,
+            cache,
+            stats,
+            progress,
+            validator,
+            species_converter,
+            unit_converter,
+        )
+        return len(df), element_cols
+
+    with stage(stats, "read") as record:
+        # 输出包含输入的全部列，因此读取整个表；Feather 输入经内存映射，
+        # 未压缩的原样列不复制，只有 arrow_block 取出的成分列被转换为数组
+        table = read_arrow_table(input_path, columns=None)
+        values = arrow_block(table, element_cols)
+        record["rows"] = table.num_rows
+    if progress is not None:
+        progress(0, table.num_rows)
+    with stage(stats, "convert", table.num_rows):
+        result = convert_block(
+            values, masses, to_unit, cache, species_converter, unit_converter
+        )
+    with stage(stats, "concat", table.num_rows):
+        names = result_column_names(
+            element_cols, to_unit, species_converter, unit_converter
+        )
+        for name, column in zip(names, result.T):
+            table = table.append_column(name, [column])
+    with stage(stats, "write", table.num_rows):
+        write_arrow_table(table, output_path, encoding)
+    if progress is not None:
+        progress(table.num_rows, table.num_rows)
+    return table.num_rows, element_cols
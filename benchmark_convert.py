@@ -0,0 +1,383 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from batch_engine import (
+    BATCH_KERNELS,
+    LEAN_RELATIVE_ERROR_BOUND,
+    ConversionCache,
+    convert_csv_lean,
+    convert_frame,
+    lean_convert_block,
+    resolve_columns,
+)
+from convert_at_wt import at_to_wt, wt_to_at
+from elements import ATOMIC_MASS_TABLE_VERSION, ATOMIC_MASSES
+from instrumentation import StageStats, peak_rss_mb
+from validation import DEFAULT_SUM_TARGET, DEFAULT_SUM_TOLERANCE, check_block
+
+# --- 基准测试 ---
+# 离线运行：生成合成合金数据，分别计时 读取 / 校验 / 转换 / 写出 四个阶段，
+# 报告吞吐量 (行/秒) 与峰值内存，把结果保存为 JSON，并与保存的基准结果比较。
+# 每个测试用例在单独的进程中运行，保证峰值内存互不影响。
+#
+# 用法示例:
+#   python benchmark_convert.py                                # 默认规模
+#   python benchmark_convert.py --rows 1e3,1e5 --elements 2,30
+#   python benchmark_convert.py --save-baseline benchmark_baseline.json
+#   python benchmark_convert.py --baseline benchmark_baseline.json
+#   python benchmark_convert.py --lean                         # 同时比较精简内存模式的峰值内存
+
+# 合成数据使用的元素，按常见合金元素排列，取前 N 个
+BENCH_ELEMENTS = [
+    "Al", "Cu", "Mg", "Si", "Zn", "Mn", "Fe", "Ni", "Cr", "Ti",
+    "Li", "Zr", "Co", "Mo", "V", "Nb", "W", "Sn", "Ag", "Sc",
+    "Ca", "Y", "La", "Ce", "Hf", "Ta", "Re", "B", "C", "N",
+]  # fmt: skip
+
+DEFAULT_ROWS = "1e3,1e4,1e5,1e6"
+FULL_ROWS = "1e3,1e4,1e5,1e6,1e7"
+DEFAULT_ELEMENTS = "2,6,30"
+
+# 与字典函数逐行比对时最多抽取的行数
+REFERENCE_SAMPLE_ROWS = 2000
+
+STAGES = ["read", "validate", "convert", "write"]
+
+
+def make_dataset(rows, elements, seed=0):
+    """
+    生成合成合金成分数据：第一种元素为基体，其余为 0~10% 的合金元素，约一半为 0
+    :param rows: 行数
+    :param elements: 元素种数 (2 ~ 30)
+    :return: 含样品编号列与成分列的 DataFrame
+    """
+    rng = np.random.default_rng(seed)
+    symbols = BENCH_ELEMENTS[:elements]
+    alloying = rng.random((rows, elements - 1)) * 10
+    alloying[rng.random(alloying.shape) < 0.5] = 0.0
+    values = np.column_stack([100 - alloying.sum(axis=1), alloying]).round(4)
+    df = pd.DataFrame(values, columns=symbols)
+    df.insert(0, "sample", np.arange(rows))
+    return df
+
+
+def write_dataset(path, rows, elements):
+    """生成合成数据并写入CSV (在独立进程中调用，使生成数据的内存不计入测试用例)"""
+    make_dataset(rows, elements).to_csv(path, index=False)
+
+
+def dataset_path(workdir, rows, elements):
+    return os.path.join(workdir, f"bench-{rows}x{elements}.csv")
+
+
+def check_reference(values, masses, element_cols, to_unit):
+    """
+    把快速路径的结果与字典函数逐行比对
+    :return: (是否逐位相同, 最大绝对误差)
+    """
+    sample = values[:REFERENCE_SAMPLE_ROWS]
+    conversion_func = wt_to_at if to_unit == "at" else at_to_wt
+    expected = np.full(sample.shape, np.nan)
+    for i, row in enumerate(sample):
+        result = conversion_func(dict(zip(element_cols, row)))
+        for j, el in enumerate(element_cols):
+            if el in result:
+                expected[i, j] = result[el]
+
+    fast_paths = [
+        BATCH_KERNELS[to_unit](sample, masses),
+        ConversionCache().convert(sample, masses, to_unit),
+    ]
+    exact = all(np.array_equal(r, expected, equal_nan=True) for r in fast_paths)
+    errors = [np.nan_to_num(np.abs(r - expected)) for r in fast_paths]
+    return exact, float(max(e.max(initial=0.0) for e in errors))
+
+
+def run_case(rows, elements, to_unit, workdir):
+    """
+    运行一个测试用例 (在独立进程中调用)，输入文件由 write_dataset 预先生成
+    :return: 结果字典
+    """
+    input_path = dataset_path(workdir, rows, elements)
+    output_path = os.path.join(workdir, f"bench-{rows}x{elements}-{to_unit}.csv")
+    file_mb = os.path.getsize(input_path) / 2**20
+    baseline_rss = peak_rss_mb()
+
+    timings = {}
+    start = time.perf_counter()
+    df = pd.read_csv(input_path)
+    timings["read"] = time.perf_counter() - start
+
+    # 与 --validate 相同的整块检查 (默认的总和目标值与容差)
+    start = time.perf_counter()
+    element_cols, masses = resolve_columns(input_path, ATOMIC_MASSES)
+    values, reasons = check_block(
+        df, element_cols, DEFAULT_SUM_TOLERANCE, DEFAULT_SUM_TARGET, False
+    )
+    timings["validate"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result_df = convert_frame(df, element_cols, masses, to_unit)
+    timings["convert"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pd.concat([df, result_df], axis=1).to_csv(output_path, index=False)
+    timings["write"] = time.perf_counter() - start
+
+    exact, max_error = check_reference(values, masses, element_cols, to_unit)
+    os.remove(output_path)
+
+    return {
+        "case": f"{rows}x{elements}",
+        "rows": rows,
+        "elements": elements,
+        "to_unit": to_unit,
+        "file_mb": round(file_mb, 3),
+        "stages": {
+            stage: {
+                "seconds": seconds,
+                "rows_per_s": rows / seconds if seconds > 0 else None,
+            }
+            for stage, seconds in timings.items()
+        },
+        "total_seconds": sum(timings.values()),
+        "flagged_rows": int(np.count_nonzero(reasons)),
+        "peak_rss_mb": peak_rss_mb(),
+        "startup_rss_mb": baseline_rss,
+        "reference_exact": exact,
+        "reference_max_abs_error": max_error,
+    }
+
+
+def run_lean_case(rows, elements, to_unit, workdir):
+    """
+    精简内存模式 (float32) 的测试用例 (在独立进程中调用)
+    结果与 float64 快速路径比较，检查相对误差不超过 LEAN_RELATIVE_ERROR_BOUND
+    :return: 结果字典，用例名为 '行数x元素数-lean'
+    """
+    input_path = dataset_path(workdir, rows, elements)
+    output_path = os.path.join(workdir, f"bench-{rows}x{elements}-{to_unit}-lean.csv")
+    file_mb = os.path.getsize(input_path) / 2**20
+    baseline_rss = peak_rss_mb()
+
+    # 精简内存模式不做校验，'validate' 阶段在结果中为空
+    stats = StageStats(input_path)
+    element_cols, masses = resolve_columns(input_path, ATOMIC_MASSES)
+    convert_csv_lean(
+        input_path, output_path, element_cols, masses, to_unit, stats=stats
+    )
+    peak_rss = peak_rss_mb()
+    timings = {name: entry["seconds"] for name, entry in stats.stages.items()}
+
+    sample = pd.read_csv(input_path, usecols=element_cols, nrows=REFERENCE_SAMPLE_ROWS)
+    values = sample[element_cols].to_numpy(dtype=np.float64)
+    expected = BATCH_KERNELS[to_unit](values, masses)
+    lean = lean_convert_block(values, masses, to_unit).astype(np.float64)
+    same_nan = np.array_equal(np.isnan(expected), np.isnan(lean))
+    relative = np.abs(lean - expected) / np.where(expected > 0, expected, 1.0)
+    max_relative = float(np.nan_to_num(relative).max(initial=0.0))
+    os.remove(output_path)
+
+    return {
+        "case": f"{rows}x{elements}-lean",
+        "rows": rows,
+        "elements": elements,
+        "to_unit": to_unit,
+        "file_mb": round(file_mb, 3),
+        "stages": {
+            stage: {
+                "seconds": timings.get(stage, 0.0),
+                "rows_per_s": rows / timings[stage] if timings.get(stage) else None,
+            }
+            for stage in STAGES
+        },
+        "total_seconds": sum(timings.values()),
+        "peak_rss_mb": peak_rss,
+        "startup_rss_mb": baseline_rss,
+        "reference_exact": None,
+        "reference_max_rel_error": max_relative,
+        "within_error_bound": same_nan and max_relative <= LEAN_RELATIVE_ERROR_BOUND,
+    }
+
+
+def run_isolated(func, *args):
+    """在一个全新的进程中运行 func，使峰值内存只反映这一个用例"""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(func, *args).result()
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """
+    与基准结果比较各阶段吞吐量
+    :param tolerance: 允许的相对下降比例，例如 0.2 表示比基准慢 20% 以内不算退化
+    :return: 退化项列表，每项为 (用例, 阶段, 当前行/秒, 基准行/秒)
+    """
+    reference = {r["case"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        old = reference.get(result["case"])
+        if old is None:
+            continue
+        for stage, current in result["stages"].items():
+            old_rate = old["stages"].get(stage, {}).get("rows_per_s")
+            new_rate = current["rows_per_s"]
+            if old_rate and new_rate and new_rate < old_rate * (1 - tolerance):
+                regressions.append((result["case"], stage, new_rate, old_rate))
+    return regressions
+
+
+def parse_counts(text):
+    """解析形如 '1e3,1e4' 的数量列表"""
+    return [int(float(item)) for item in text.split(",") if item.strip()]
+
+
+def print_results(results):
+    header = f"{'用例':<14}" + "".join(f"{stage + ' 行/秒':>16}" for stage in STAGES)
+    print(header + f"{'峰值内存MB':>12}{'逐位一致':>10}")
+    print("-" * (len(header) + 24))
+    for r in results:
+        line = f"{r['case']:<14}"
+        for stage in STAGES:
+            rate = r["stages"][stage]["rows_per_s"]
+            line += f"{rate:>16,.0f}" if rate else f"{'-':>16}"
+        rss = r["peak_rss_mb"]
+        line += f"{rss:>12.1f}" if rss is not None else f"{'-':>12}"
+        if r["reference_exact"] is None:
+            # 精简内存模式不要求逐位一致，只要求误差在界内
+            line += f"{'误差界内' if r['within_error_bound'] else '超出误差界':>10}"
+        else:
+            line += f"{'是' if r['reference_exact'] else '否':>10}"
+        print(line)
+
+
+def print_memory_comparison(results):
+    """对比同一用例在普通模式与精简内存模式下的峰值内存"""
+    by_case = {r["case"]: r for r in results}
+    lines = []
+    for r in results:
+        lean = by_case.get(f"{r['case']}-lean")
+        if lean is None or r["peak_rss_mb"] is None or lean["peak_rss_mb"] is None:
+            continue
+        change = lean["peak_rss_mb"] / r["peak_rss_mb"] - 1
+        lines.append(
+            f"{r['case']:<14}{r['peak_rss_mb']:>12.1f}{lean['peak_rss_mb']:>12.1f}"
+            f"{change:>10.0%}{lean['reference_max_rel_error']:>14.2e}"
+        )
+    if lines:
+        print("\n--- 峰值内存：普通模式 (float64) 与精简内存模式 (float32) ---")
+        print(
+            f"{'用例':<14}{'普通MB':>12}{'精简MB':>12}{'变化':>10}{'最大相对误差':>14}"
+        )
+        print("\n".join(lines))
+        print(f"误差界: {LEAN_RELATIVE_ERROR_BOUND:.2e}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="wt%/at% 转换的离线基准测试")
+    parser.add_argument(
+        "--rows", default=DEFAULT_ROWS, help="行数列表，默认 %(default)s"
+    )
+    parser.add_argument(
+        "--full", action="store_true", help=f"使用完整的行数范围 {FULL_ROWS}"
+    )
+    parser.add_argument(
+        "--elements",
+        default=DEFAULT_ELEMENTS,
+        help="元素种数列表 (2~30)，默认 %(default)s",
+    )
+    parser.add_argument("--to", default="at", choices=["at", "wt"], help="目标单位")
+    parser.add_argument(
+        "--lean",
+        action="store_true",
+        help="每个用例再用精简内存模式 (float32) 运行一次，报告两者的峰值内存与误差",
+    )
+    parser.add_argument(
+        "-o", "--output", default="benchmark_results.json", help="结果 JSON 文件"
+    )
+    parser.add_argument("--baseline", help="与此基准结果 JSON 比较")
+    parser.add_argument("--save-baseline", help="把本次结果另存为基准")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="吞吐量相对基准下降超过此比例时视为退化，默认 %(default)s",
+    )
+    args = parser.parse_args(argv)
+
+    rows_list = parse_counts(FULL_ROWS if args.full else args.rows)
+    element_list = parse_counts(args.elements)
+    if not all(2 <= n <= len(BENCH_ELEMENTS) for n in element_list):
+        parser.error(f"元素种数必须在 2 到 {len(BENCH_ELEMENTS)} 之间")
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="at-wt-bench-") as workdir:
+        for elements in element_list:
+            for rows in rows_list:
+                print(f"运行 {rows} 行 x {elements} 种元素 ...", file=sys.stderr)
+                input_path = dataset_path(workdir, rows, elements)
+                run_isolated(write_dataset, input_path, rows, elements)
+                results.append(run_isolated(run_case, rows, elements, args.to, workdir))
+                if args.lean:
+                    results.append(
+                        run_isolated(run_lean_case, rows, elements, args.to, workdir)
+                    )
+                os.remove(input_path)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "atomic_mass_table": ATOMIC_MASS_TABLE_VERSION,
+        },
+        "results": results,
+    }
+    print_results(results)
+    print_memory_comparison(results)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到: {args.output}")
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"基准已保存到: {args.save_baseline}")
+
+    status = 0
+    if any(r["reference_exact"] is False for r in results):
+        print("错误：快速路径的结果与字典函数不一致！", file=sys.stderr)
+        status = 1
+    if any(r.get("within_error_bound") is False for r in results):
+        print("错误：精简内存模式的误差超出了误差界！", file=sys.stderr)
+        status = 1
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare_with_baseline(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\n--- 与基准相比的性能退化 ---")
+            for case, stage, new_rate, old_rate in regressions:
+                print(
+                    f"  {case} {stage}: {new_rate:,.0f} 行/秒 (基准 {old_rate:,.0f}, "
+                    f"{new_rate / old_rate - 1:+.0%})"
+                )
+            status = 1
+        else:
+            print("\n与基准相比没有性能退化。")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
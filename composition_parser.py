@@ -0,0 +1,92 @@
+import functools
+import re
+
+from conversion_memo import DEFAULT_CACHE_SIZE
+from elements import ATOMIC_MASSES
+
+# --- 牌号 / 化学式字符串解析 ---
+# 把以字符串表示的成分解析为 元素 -> 含量 的字典，支持两种常见写法：
+#   - 牌号式：基体元素在前、不带数字，其余为 "含量+元素"，基体为余量。
+#     例如 'Al-4.5Cu-1.5Mg-0.6Mn' -> Al 93.4, Cu 4.5, Mg 1.5, Mn 0.6；
+#     连字符可以省略，因此 'Ti6Al4V' 按冶金惯例解析为 Ti-6Al-4V。
+#   - 化学式：每个元素后跟含量，例如 'Al90Cu10'、'Al90 Cu10'、'Al90-Cu10'；
+#     最多一个元素可以不带含量，作为余量，例如 'Al-Cu4.5-Mg1.5'。
+# 两种写法都能解析的字符串 (例如 'Ti6Al4V') 按牌号式解析。
+# 含量的单位与数据的源单位相同 (wt% 或 at%)。不依赖 pandas，图形界面也可以直接使用。
+
+_SYMBOL = r"[A-Z][a-z]?"
+_NUMBER = r"(?:\d+(?:\.\d*)?|\.\d+)"
+
+# 牌号式：基体元素 + 若干个 "[-]含量元素"
+_DESIGNATION = re.compile(rf"({_SYMBOL})((?:[\s-]*{_NUMBER}\s*{_SYMBOL})*)")
+_DESIGNATION_PART = re.compile(rf"[\s-]*({_NUMBER})\s*({_SYMBOL})")
+
+# 化学式：若干个 "元素[含量]"，元素之间可以用空格、连字符、逗号或分号分隔
+_FORMULA = re.compile(rf"(?:[\s,;-]*{_SYMBOL}\s*{_NUMBER}?)+")
+_FORMULA_PART = re.compile(rf"[\s,;-]*({_SYMBOL})\s*({_NUMBER})?")
+
+# 余量元素的目标总和
+BALANCE_TOTAL = 100.0
+
+
+@functools.lru_cache(maxsize=DEFAULT_CACHE_SIZE)
+def _parse_cached(text):
+    """
+    解析一个成分字符串 (只做语法解析，不检查元素是否已知)，结果按字符串缓存
+    :return: ((元素, 含量), ...) 元组
+    """
+    stripped = text.strip()
+    match = _DESIGNATION.fullmatch(stripped)
+    if match:
+        base = match.group(1)
+        parts = [
+            (symbol, float(value))
+            for value, symbol in _DESIGNATION_PART.findall(match.group(2))
+        ]
+        return _with_balance([(base, None)] + parts, text)
+
+    if _FORMULA.fullmatch(stripped):
+        parts = [
+            (symbol, float(value) if value else None)
+            for symbol, value in _FORMULA_PART.findall(stripped)
+        ]
+        if sum(value is None for _, value in parts) > 1:
+            raise ValueError(f"错误：成分 '{text}' 中有多个元素没有给出含量。")
+        return _with_balance(parts, text)
+
+    raise ValueError(
+        f"错误：无法解析成分 '{text}'，应形如 Al-4.5Cu-1.5Mg 或 Al90Cu10。"
+    )
+
+
+def _with_balance(parts, text):
+    """检查重复元素，并把含量为 None 的元素 (至多一个) 计算为余量"""
+    symbols = [symbol for symbol, _ in parts]
+    duplicates = sorted({s for s in symbols if symbols.count(s) > 1})
+    if duplicates:
+        raise ValueError(f"错误：成分 '{text}' 中元素重复出现: {', '.join(duplicates)}")
+    given = sum(value for _, value in parts if value is not None)
+    balance = BALANCE_TOTAL - given
+    if any(value is None for _, value in parts) and balance < 0:
+        raise ValueError(f"错误：成分 '{text}' 中各元素之和超过 100，无法计算余量。")
+    return tuple(
+        (symbol, balance if value is None else value) for symbol, value in parts
+    )
+
+
+def parse_composition(text, atomic_masses=ATOMIC_MASSES):
+    """
+    把牌号或化学式字符串解析为 元素 -> 含量 的字典
+    :param text: 例如 'Al-4.5Cu-1.5Mg-0.6Mn' 或 'Al90Cu10'
+    :param atomic_masses: 用于检查元素符号的原子量表
+    :return: 按字符串中出现顺序排列的字典，例如 {'Al': 90.0, 'Cu': 10.0}
+    """
+    if not isinstance(text, str):
+        raise ValueError(f"错误：成分 '{text}' 不是字符串。")
+    parts = _parse_cached(text)
+    unknown = [symbol for symbol, _ in parts if symbol not in atomic_masses]
+    if unknown:
+        raise ValueError(
+            f"错误：成分 '{text}' 中有未知的元素符号: {', '.join(unknown)}"
+        )
+    return dict(parts)
@@ -0,0 +1,28 @@
+import functools
+
+# --- 单点转换缓存 ---
+# 不依赖 pandas / numpy，图形界面启动时只需导入这一部分。
+
+# 缓存默认最多保存的成分条数
+DEFAULT_CACHE_SIZE = 65_536
+
+
+def cached_conversion(conversion_func, maxsize=DEFAULT_CACHE_SIZE):
+    """
+    给 wt_to_at / at_to_wt 这类字典函数加上有界 LRU 缓存
+    :param conversion_func: 输入、输出均为 元素 -> 含量 字典的转换函数
+    :param maxsize: 最多缓存的成分条数
+    :return: 带缓存的函数，可用 cache_info() 查看命中/未命中次数
+    """
+
+    @functools.lru_cache(maxsize=maxsize)
+    def cached(items):
+        return conversion_func(dict(items))
+
+    @functools.wraps(conversion_func)
+    def wrapper(percents):
+        return dict(cached(tuple(percents.items())))
+
+    wrapper.cache_info = cached.cache_info
+    wrapper.cache_clear = cached.cache_clear
+    return wrapper
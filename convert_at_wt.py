@@ -1,98 +1,71 @@
 import pandas as pd
+import argparse
+import itertools
 import os
-from collections import OrderedDict
+import sys
+import time
 
-# --- 元素配置区域 ---
-# 在这里添加或修改元素及其原子量，脚本会自动适应
-# 数据来源：IUPAC (国际纯粹与应用化学联合会)
-ATOMIC_MASSES = OrderedDict(
-    [
-        ("Al", 26.9815385),
-        ("Li", 6.94),
-        ("Cu", 63.546),
-        ("Mg", 24.305),
-        ("Zr", 91.224),
-        ("Mn", 54.938044),
-        # 您可以在这里继续添加，例如:
-        # ('Si', 28.0855),
-        # ('Fe', 55.845),
-    ]
+from batch_engine import (
+    DEFAULT_CACHE_SIZE,
+    DEFAULT_CHUNK_ROWS,
+    DEFAULT_OUTPUT_TEMPLATE,
+    ConversionCache,
+    DesignationColumn,
+    convert_file,
+    convert_csv_pipelined,
+    convert_frame,
+    output_path_for,
+    select_element_columns,
+    write_converted_chunks,
+)
+from composition_parser import parse_composition
+from elements import ATOMIC_MASSES, at_to_wt, mass_vector, wt_to_at
+from instrumentation import StageStats, stage
+from parallel_batch import (
+    convert_csv_partitioned,
+    convert_files,
+    expand_input_paths,
+    summarize_results,
+)
+from pipeline import PipelineStats
+from result_cache import (
+    DEFAULT_RESULT_CACHE_DIR,
+    DEFAULT_RESULT_CACHE_MAX_AGE,
+    DEFAULT_RESULT_CACHE_MAX_BYTES,
+    ResultCache,
+)
+from species import SpeciesConverter, select_species_columns
+from units import (
+    UNIT_LABELS,
+    UNITS,
+    UnitConverter,
+    convert_composition,
+    parse_unit,
+    unit_scale,
+)
+from table_io import (
+    COMPRESSIONS,
+    CSV,
+    NO_COMPRESSION,
+    detect_format,
+    read_frame,
+    with_compression,
+    write_frame,
+)
+from validation import (
+    DEFAULT_SUM_TARGET,
+    DEFAULT_SUM_TOLERANCE,
+    RowValidator,
+    quarantine_path_for,
 )
 
-# --- 核心计算函数 ---
-
-
-def wt_to_at(wt_percents: dict) -> dict:
-    """
-    将质量百分比 (wt%) 转换为原子百分比 (at%)
-    :param wt_percents: 包含元素和其质量百分比的字典, e.g., {'Al': 90, 'Cu': 10}
-    :return: 包含元素和其原子百分比的字典
-    """
-    at_percents = {}
-    total_moles = 0
-
-    # 检查输入中是否有未知元素
-    for element in wt_percents.keys():
-        if element not in ATOMIC_MASSES:
-            raise ValueError(
-                f"错误：元素 '{element}' 的原子量未知。请将其添加到脚本顶部的 ATOMIC_MASSES 字典中。"
-            )
-
-    # 1. 计算每个元素的摩尔数
-    moles = {
-        el: wt / ATOMIC_MASSES[el]
-        for el, wt in wt_percents.items()
-        if el in ATOMIC_MASSES and wt > 0
-    }
-
-    # 2. 计算总摩尔数
-    total_moles = sum(moles.values())
-
-    if total_moles == 0:
-        return {el: 0 for el in wt_percents.keys()}
-
-    # 3. 计算每个元素的原子百分比
-    at_percents = {el: (mol / total_moles) * 100 for el, mol in moles.items()}
-
-    return at_percents
-
-
-def at_to_wt(at_percents: dict) -> dict:
-    """
-    将原子百分比 (at%) 转换为质量百分比 (wt%)
-    :param at_percents: 包含元素和其原子百分比的字典, e.g., {'Al': 95, 'Cu': 5}
-    :return: 包含元素和其质量百分比的字典
-    """
-    wt_percents = {}
-    total_mass = 0
-
-    # 检查输入中是否有未知元素
-    for element in at_percents.keys():
-        if element not in ATOMIC_MASSES:
-            raise ValueError(
-                f"错误：元素 '{element}' 的原子量未知。请将其添加到脚本顶部的 ATOMIC_MASSES 字典中。"
-            )
-
-    # 1. 计算每个元素的相对质量贡献
-    mass_contributions = {
-        el: at * ATOMIC_MASSES[el]
-        for el, at in at_percents.items()
-        if el in ATOMIC_MASSES and at > 0
-    }
-
-    # 2. 计算总质量
-    total_mass = sum(mass_contributions.values())
-
-    if total_mass == 0:
-        return {el: 0 for el in at_percents.keys()}
-
-    # 3. 计算每个元素的质量百分比
-    wt_percents = {
-        el: (mass / total_mass) * 100 for el, mass in mass_contributions.items()
-    }
-
-    return wt_percents
+# serve、watch 与稀疏模式用到的模块 (http_service、watch_folder、sparse_batch) 在各自的处理函数中导入，
+# 其他子命令启动时不必加载 asyncio 等模块；这些子命令参数的默认值也因此由各模块决定 (参数缺省为 None)。
 
+# --- 元素配置区域 ---
+# 原子量与单点转换函数 wt_to_at / at_to_wt 统一来自 elements.py 中的元素注册表 (全部118种元素)
+# 单点计算模式默认依次询问的元素，可在运行时输入其他元素
+DEFAULT_POINT_ELEMENTS = ["Al", "Li", "Cu", "Mg", "Zr", "Mn"]
 
 # --- 模式处理函数 ---
 
@@ -140,15 +113,30 @@ def handle_single_point_calculation(elements, conversion_func, from_unit, to_uni
     print(values)
 
 
-def handle_batch_calculation(elements, conversion_func, from_unit, to_unit):
-    """处理批量计算模式"""
-    print(f"\n--- 批量计算：{from_unit}% -> {to_unit}% ---")
+def handle_batch_calculation(
+    elements, conversion_func, from_unit, to_unit, chunksize=None
+):
+    """
+    处理批量计算模式
+    :param chunksize: 为 None 时一次性读入整个文件；否则按此行数分块流式处理，内存占用恒定
+    """
+    mode_name = "批量计算" if chunksize is None else "流式批量计算"
+    print(f"\n--- {mode_name}：{from_unit}% -> {to_unit}% ---")
+    stats = StageStats()
 
-    # 1. 获取CSV文件路径
+    # 1. 获取文件路径 (流式模式下只读入前几行用于预览)
     while True:
-        csv_path = input("请输入CSV文件的路径 (例如: alloys.csv): ")
+        csv_path = input("请输入CSV/Parquet/Feather文件的路径 (例如: alloys.csv): ")
         try:
-            df = pd.read_csv(csv_path)
+            if chunksize is None:
+                with stats.stage("read") as record:
+                    df = read_frame(csv_path)
+                    record["rows"] = len(df)
+            elif detect_format(csv_path) != CSV:
+                print("错误：流式批量计算只支持CSV文件。")
+                continue
+            else:
+                df = pd.read_csv(csv_path, nrows=5)
             print(f"成功读取文件 '{csv_path}'。")
             print("文件前5行预览:")
             print(df.head())
@@ -176,50 +164,132 @@ def handle_batch_calculation(elements, conversion_func, from_unit, to_unit):
         except ValueError:
             print("错误：请输入有效的整数。")
 
-    # 3. 校验元素是否存在于已知元素列表中
-    unknown_elements = [el for el in element_cols if el not in elements]
+    # 3. 校验元素是否存在于已知元素列表中，并一次性取出原子量
+    #    不认识的列跳过 (原样保留在输出中)，其余成分列照常计算
+    stats.label = csv_path
+    with stats.stage("validate"):
+        unknown_elements = [el for el in element_cols if el not in elements]
+        element_cols = [el for el in element_cols if el in elements]
+        masses = mass_vector(element_cols, ATOMIC_MASSES)
     if unknown_elements:
         print("\n" + "=" * 50)
-        print("!! 警告：CSV文件中的以下列名不在预设的元素列表中 !!")
+        print("!! 警告：文件中的以下列名不在预设的元素列表中，将不参与计算 !!")
         for el in unknown_elements:
             print(f"  - {el}")
-        print("请在脚本顶部的 ATOMIC_MASSES 字典中添加这些元素的数据后重试。")
         print("=" * 50)
+    if not element_cols:
+        print(
+            "错误：所选列中没有可以计算的元素列，请检查列名是否为正确的元素符号后重试。"
+        )
         return
 
     print(f"\n将对以下成分列进行计算: {', '.join(element_cols)}")
+    output_path = output_path_for(csv_path, from_unit, to_unit)
 
-    # 4. 定义行计算函数并应用
-    def calculate_row(row):
-        input_percents = row[element_cols].to_dict()
-        result_percents = conversion_func(input_percents)
-        return pd.Series(result_percents)
+    # 4. 按需校验成分行：不合格的行写入隔离文件，其余行照常计算
+    validator = ask_validator(output_path)
 
-    result_df = df.apply(calculate_row, axis=1)
+    if chunksize is not None:
+        # 5. 流式模式：读取、转换、写出流水线并发执行，逐块追加写入新文件
+        pipeline_stats = PipelineStats()
+        total_rows = convert_csv_pipelined(
+            csv_path,
+            output_path,
+            element_cols,
+            masses,
+            to_unit,
+            chunksize=chunksize,
+            encoding="utf-8-sig",
+            stats=stats,
+            validator=validator,
+            pipeline_stats=pipeline_stats,
+        )
+        print("\n--- 计算完成 ---")
+        print(f"共处理 {total_rows} 行，结果已保存到新文件: {output_path}")
+        print("新文件预览:")
+        print(pd.read_csv(output_path, nrows=5, encoding="utf-8-sig"))
+        print_validation_summary(validator)
+        print_stats(stats)
+        print_pipeline_summary(pipeline_stats)
+        return
 
-    # 5. 重命名结果列并合并
-    result_df = result_df.rename(
-        columns={el: f"{el}({to_unit}%)" for el in result_df.columns}
-    )
-    final_df = pd.concat([df, result_df], axis=1)
+    # 5. 对整个成分块进行向量化计算并合并结果列
+    if validator is not None:
+        with stats.stage("validate", len(df)):
+            df = validator.split(df, element_cols)
+    with stats.stage("convert", len(df)):
+        result_df = convert_frame(df, element_cols, masses, to_unit)
+    with stats.stage("concat", len(df)):
+        final_df = pd.concat([df, result_df], axis=1)
 
     # 6. 保存到新文件
-    base_name, ext = os.path.splitext(csv_path)
-    output_path = f"{base_name}-{to_unit}.csv"
-
-    final_df.to_csv(output_path, index=False, encoding="utf-8-sig")
+    with stats.stage("write", len(df)):
+        write_frame(final_df, output_path, encoding="utf-8-sig")
     print("\n--- 计算完成 ---")
     print(f"结果已保存到新文件: {output_path}")
     print("新文件预览:")
     print(final_df.head())
+    print_validation_summary(validator)
+    print_stats(stats)
 
 
-# --- 主程序入口 ---
-def main():
+def print_stats(stats, file=None):
+    """打印分阶段统计表"""
+    print("\n--- 分阶段统计 ---", file=file)
+    for line in stats.format_lines():
+        print(line, file=file)
+
+
+def ask_point_elements():
+    """询问单点计算需要输入的元素"""
+    default = ", ".join(DEFAULT_POINT_ELEMENTS)
+    while True:
+        text = input(
+            f"请输入需要计算的元素，用逗号分隔 (直接回车使用默认值 {default}): "
+        )
+        if not text.strip():
+            return list(DEFAULT_POINT_ELEMENTS)
+        elements = [el.strip() for el in text.split(",") if el.strip()]
+        unknown = [el for el in elements if el not in ATOMIC_MASSES]
+        if not unknown:
+            return elements
+        print(f"错误：未知的元素符号: {', '.join(unknown)}，请重新输入。")
+
+
+def ask_chunksize():
+    """询问流式模式的分块行数"""
+    while True:
+        text = input(f"请输入每块的行数 (直接回车使用默认值 {DEFAULT_CHUNK_ROWS}): ")
+        if not text.strip():
+            return DEFAULT_CHUNK_ROWS
+        try:
+            chunksize = int(text)
+            if chunksize > 0:
+                return chunksize
+            print("行数必须为正整数，请重新输入。")
+        except ValueError:
+            print("错误：请输入有效的整数。")
+
+
+def ask_validator(output_path):
+    """询问是否校验成分行；需要时返回已指定隔离文件的 RowValidator"""
+    answer = input(
+        "是否校验成分 (非数字、负值、空值、总和偏离100%) 并把不合格的行写入隔离文件? (y/N): "
+    )
+    if answer.strip().lower() not in ("y", "yes"):
+        return None
+    answer = input("是否把通过校验的行归一化到总和 100%? (y/N): ")
+    validator = RowValidator(renormalise=answer.strip().lower() in ("y", "yes"))
+    validator.start(quarantine_path_for(output_path))
+    return validator
+
+
+# --- 交互式向导 ---
+def run_wizard():
     print("=" * 50)
     print("        质量百分比 (wt%) 与 原子百分比 (at%) 转换工具")
     print("=" * 50)
-    print("支持的元素:", ", ".join(ATOMIC_MASSES.keys()))
+    print(f"支持全部 {len(ATOMIC_MASSES)} 种元素 (H ~ Og)")
 
     # 选择转换方向
     while True:
@@ -242,22 +312,1020 @@ def main():
     while True:
         print("\n请选择计算模式:")
         print("  1. 单点计算 (手动输入单个合金成分)")
-        print("  2. 批量计算 (从CSV文件读取)")
-        mode = input("请输入选项 (1或2): ")
-        if mode in ["1", "2"]:
+        print("  2. 批量计算 (从CSV/Parquet/Feather文件读取)")
+        print("  3. 流式批量计算 (分块读取，适合超出内存的大文件)")
+        mode = input("请输入选项 (1、2或3): ")
+        if mode in ["1", "2", "3"]:
             break
         else:
-            print("无效输入，请输入 1 或 2。")
+            print("无效输入，请输入 1、2 或 3。")
 
     # 执行相应的功能
     element_list = list(ATOMIC_MASSES.keys())
     if mode == "1":
         handle_single_point_calculation(
-            element_list, conversion_func, from_unit, to_unit
+            ask_point_elements(), conversion_func, from_unit, to_unit
         )
     elif mode == "2":
         handle_batch_calculation(element_list, conversion_func, from_unit, to_unit)
+    elif mode == "3":
+        handle_batch_calculation(
+            element_list,
+            conversion_func,
+            from_unit,
+            to_unit,
+            chunksize=ask_chunksize(),
+        )
+
+
+# --- 命令行接口 ---
+
+# 目标单位 -> (转换函数, 源单位)
+DIRECTIONS = {"at": (wt_to_at, "wt"), "wt": (at_to_wt, "at")}
+
+
+def parse_column_range(text):
+    """解析形如 '2-7' 或 '2:7' 的列号范围 (从1开始，包含两端)"""
+    try:
+        start, end = text.replace(":", "-").split("-")
+        return int(start), int(end)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的列号范围: '{text}'，应形如 2-7")
+
+
+def parse_column_names(text):
+    """解析逗号分隔的列名列表"""
+    return [name.strip() for name in text.split(",") if name.strip()]
+
+
+def parse_point_value(text):
+    """
+    解析形如 'Cu=4.5' 的元素含量，或 'Al-4.5Cu-1.5Mg'、'Al90Cu10' 这样的牌号 / 化学式
+    :return: (元素, 含量) 列表
+    """
+    element, sep, value = text.partition("=")
+    if not sep:
+        try:
+            return list(parse_composition(text).items())
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(str(e))
+    try:
+        return [(element.strip(), float(value))]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的成分: '{text}'，应形如 Cu=4.5")
+
+
+def add_column_arguments(parser):
+    """添加成分列选择参数，未指定时自动选出列名为已知元素的列"""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        "-c",
+        "--columns",
+        type=parse_column_names,
+        help="成分列名，逗号分隔，例如 Al,Cu,Mg",
+    )
+    group.add_argument(
+        "-r",
+        "--column-range",
+        type=parse_column_range,
+        help="成分列号范围 (从1开始，包含两端)，例如 2-7",
+    )
+    group.add_argument(
+        "-d",
+        "--designation",
+        help="成分以牌号或化学式字符串保存在此列中 (例如 Al-4.5Cu-1.5Mg 或 Al90Cu10)，"
+        "先展开为按元素分列的成分再转换",
+    )
+
+
+def parse_unit_argument(text):
+    """解析单位参数，接受 UNITS 中的名称及 wt%、ppm 等常见写法"""
+    try:
+        return parse_unit(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def add_unit_arguments(parser, unit_column=True):
+    """
+    添加目标单位与源单位参数
+    :param unit_column: 是否提供 --unit-column (每行单位不同的文件)
+    """
+    units = ", ".join(UNITS)
+    parser.add_argument(
+        "-t",
+        "--to",
+        required=True,
+        type=parse_unit_argument,
+        help=f"目标单位: {units} (ppmw / ppma 为质量 / 原子 ppm，w / x 为质量 / 摩尔分数)",
+    )
+    parser.add_argument(
+        "--from",
+        dest="from_unit",
+        type=parse_unit_argument,
+        help="源单位，默认 --to at 时为 wt、--to wt 时为 at；目标为其他单位时必须指定",
+    )
+    if unit_column:
+        parser.add_argument(
+            "--unit-column",
+            help="每行的源单位保存在此列中 (例如 wt%%、ppm)，同一单位的行整体换算",
+        )
+    parser.add_argument(
+        "--balance",
+        help="余量元素 (例如 Fe)：只给出微量元素时，各行未给出的部分计为该元素参与换算",
+    )
+
+
+def source_unit(args):
+    """源单位：--from，或 --to 为 wt / at 时的另一单位；使用单位列时为 'mixed'"""
+    if getattr(args, "unit_column", None):
+        return "mixed"
+    if args.from_unit is not None:
+        return args.from_unit
+    if args.to not in DIRECTIONS:
+        raise ValueError(
+            f"错误：目标单位为 {args.to} 时必须用 --from 指定源单位"
+            "或用 --unit-column 指定单位列。"
+        )
+    return DIRECTIONS[args.to][1]
+
+
+def unit_options(args):
+    """
+    按命令行参数得到 UnitConverter 的参数字典
+    :return: 只是 wt <-> at 互换 (原有的转换方向) 时返回 None
+    """
+    unit_column = getattr(args, "unit_column", None)
+    if unit_column and args.from_unit is not None:
+        raise ValueError("错误：--from 与 --unit-column 只能二选一。")
+    from_unit = None if unit_column else source_unit(args)
+    if (
+        not unit_column
+        and args.balance is None
+        and args.to in DIRECTIONS
+        and from_unit == DIRECTIONS[args.to][1]
+    ):
+        return None
+    return dict(
+        to_unit=args.to,
+        from_unit=from_unit,
+        unit_column=unit_column,
+        balance=args.balance,
+        atomic_masses=dict(ATOMIC_MASSES),
+    )
+
+
+def make_unit_converter(args):
+    """按命令行参数创建单位换算器；只是 wt <-> at 互换时返回 None"""
+    options = unit_options(args)
+    return None if options is None else UnitConverter(**options)
+
+
+def print_unit_summary(converter, file=None):
+    """打印每行单位不同时各单位的行数"""
+    if converter is None or converter.unit_column is None:
+        return
+    counts = ", ".join(f"{unit} {rows}" for unit, rows in converter.summary().items())
+    print(f"源单位: {counts}", file=file)
+
+
+def add_species_argument(parser):
+    """添加化合物成分参数"""
+    parser.add_argument(
+        "--species",
+        action="store_true",
+        help="成分列为化合物的质量百分比，列名为化学式 (例如 Al2O3、MgO、ZrO2)，"
+        "转换为各元素的 at%% (--to at) 或 wt%% (--to wt)",
+    )
+
+
+def add_lean_argument(parser):
+    """添加精简内存模式参数"""
+    parser.add_argument(
+        "--lean",
+        action="store_true",
+        help="精简内存模式：只读入成分列，以 float32 分块计算 (每行总和用 float64 累加)，"
+        "适合很宽很长的表格；结果的相对误差不超过 3.6e-7",
+    )
+
+
+def add_compression_argument(parser):
+    """添加输出压缩参数"""
+    parser.add_argument(
+        "--compress",
+        choices=list(COMPRESSIONS) + [NO_COMPRESSION],
+        help="输出CSV的压缩方式 (替换输出文件名中的压缩扩展名)。默认由输出扩展名决定："
+        "压缩的输入 (例如 .csv.gz、.csv.zst) 默认输出同样压缩的文件，zstd 需要安装 zstandard",
+    )
+
+
+def output_path_from_args(args, from_unit, template):
+    """convert 的输出路径：-o 优先，否则按模板生成；指定 --compress 时换成对应的压缩扩展名"""
+    if args.output:
+        if args.compress:
+            return with_compression(args.output, args.compress)
+        return args.output
+    return output_path_for(
+        args.input, from_unit, args.to, template, args.output_dir, args.compress
+    )
+
+
+def add_pipeline_argument(parser):
+    """添加流水线模式参数"""
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="流水线模式：分块的读取、转换、写出在不同线程中同时进行 (有界队列限制内存)，"
+        f"结束后打印各阶段的利用率；未指定 --chunksize 时每块 {DEFAULT_CHUNK_ROWS} 行",
+    )
+
+
+def print_pipeline_summary(pipeline_stats, file=None):
+    """打印流水线各阶段的利用率与瓶颈阶段"""
+    if pipeline_stats is None:
+        return
+    print("\n--- 流水线阶段利用率 ---", file=file)
+    for line in pipeline_stats.format_lines():
+        print(line, file=file)
+    summary = pipeline_stats.summary()
+    print(
+        f"总耗时 {summary['wall_seconds']:.4f} 秒, 瓶颈阶段: {summary['bottleneck']}",
+        file=file,
+    )
+
+
+def add_cache_arguments(parser):
+    """添加去重缓存参数"""
+    parser.add_argument(
+        "--dedupe",
+        action="store_true",
+        help="去除重复成分：每个不同成分只计算一次，并用 LRU 缓存跨分块复用结果",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_CACHE_SIZE,
+        help="去重缓存最多保存的成分条数，默认 %(default)s",
+    )
+
+
+def make_cache(args):
+    """按命令行参数创建去重缓存；未启用时返回 None"""
+    return ConversionCache(args.cache_size) if args.dedupe else None
+
+
+def print_cache_summary(cache):
+    """把去重缓存的统计信息打印到标准错误"""
+    if cache is None:
+        return
+    summary = cache.summary()
+    print(
+        f"去重: {summary['rows']} 行中有 {summary['unique_rows']} 个不同成分 (按分块统计), "
+        f"缓存命中 {summary['hits']} 次, 未命中 {summary['misses']} 次",
+        file=sys.stderr,
+    )
+
+
+def add_result_cache_arguments(parser):
+    """添加磁盘结果缓存参数"""
+    parser.add_argument(
+        "--result-cache",
+        nargs="?",
+        const=DEFAULT_RESULT_CACHE_DIR,
+        metavar="DIR",
+        help="按输入文件内容缓存转换结果，内容未变的文件直接复用上一次的结果；"
+        f"可指定缓存目录，默认 {DEFAULT_RESULT_CACHE_DIR}",
+    )
+    parser.add_argument(
+        "--result-cache-max-mb",
+        type=float,
+        default=DEFAULT_RESULT_CACHE_MAX_BYTES / 2**20,
+        help="结果缓存的总大小上限 (MB)，超出时删除最久未用的条目，默认 %(default).0f",
+    )
+    parser.add_argument(
+        "--result-cache-max-days",
+        type=float,
+        default=DEFAULT_RESULT_CACHE_MAX_AGE / 86400,
+        help="结果缓存条目自最近一次使用起的保留天数，默认 %(default).0f",
+    )
+
+
+def make_result_cache(args):
+    """按命令行参数创建磁盘结果缓存；未启用时返回 None"""
+    if args.result_cache is None:
+        return None
+    return ResultCache(
+        args.result_cache,
+        max_bytes=int(args.result_cache_max_mb * 2**20),
+        max_age=args.result_cache_max_days * 86400,
+    )
+
+
+def add_stats_arguments(parser):
+    """添加分阶段统计参数"""
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="完成后在标准错误输出各阶段的耗时、行数、吞吐量与峰值内存",
+    )
+    parser.add_argument("--stats-json", help="把分阶段统计导出为此 JSON 文件")
+
+
+def make_stats(args, label):
+    """按命令行参数创建分阶段统计；未启用时返回 None"""
+    if args.stats or args.stats_json:
+        return StageStats(label)
+    return None
+
+
+def report_stats(stats, args):
+    """按命令行参数输出或导出分阶段统计"""
+    if stats is None:
+        return
+    if args.stats:
+        print_stats(stats, file=sys.stderr)
+    if args.stats_json:
+        stats.to_json(args.stats_json)
+
+
+def parse_tolerance(text):
+    """解析总和容差；'none' 表示不检查总和"""
+    if text.strip().lower() == "none":
+        return None
+    try:
+        value = float(text)
+    except ValueError:
+        value = -1
+    if value < 0:
+        raise argparse.ArgumentTypeError(f"无效的容差: '{text}'，应为非负数或 none")
+    return value
+
+
+def add_validation_arguments(parser, quarantine_help=None):
+    """
+    添加成分校验参数
+    :param quarantine_help: --quarantine 参数的说明；为 None 时不提供该参数 (每个文件使用默认的隔离文件)
+    """
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="校验成分行：非数字、负值、空值、总和超出容差的行写入隔离文件，其余行照常转换",
+    )
+    parser.add_argument(
+        "--sum-tolerance",
+        type=parse_tolerance,
+        default=DEFAULT_SUM_TOLERANCE,
+        help="总和允许偏离 100 的范围，默认 %(default)s；none 表示不检查总和。"
+        "源单位不是百分比时按满量程换算 (例如 ppm 时为 ±0.1%% x 1e6)",
+    )
+    parser.add_argument(
+        "--allow-missing",
+        action="store_true",
+        help="校验时把空单元格视为 0 (该元素不存在)，不算错误",
+    )
+    parser.add_argument(
+        "--renormalise",
+        action="store_true",
+        help="把通过校验的行按比例归一化到总和 100 后再转换 (隐含 --validate)",
+    )
+    if quarantine_help is not None:
+        parser.add_argument("--quarantine", help=quarantine_help)
+
+
+def validation_options(args):
+    """按命令行参数得到 RowValidator 的参数字典；未启用校验时返回 None"""
+    if not (args.validate or args.renormalise):
+        return None
+    tolerance = args.sum_tolerance
+    if getattr(args, "unit_column", None) or args.balance:
+        # 各行的满量程不同，或只给出了微量元素，总和没有固定的目标值
+        if tolerance is not None or args.renormalise:
+            raise ValueError(
+                "错误：使用 --unit-column 或 --balance 时无法检查或归一化总和，"
+                "请指定 --sum-tolerance none 且不使用 --renormalise。"
+            )
+        target = DEFAULT_SUM_TARGET
+    else:
+        target = unit_scale(source_unit(args))
+        if tolerance is not None:
+            tolerance *= target / DEFAULT_SUM_TARGET
+    return dict(
+        tolerance=tolerance,
+        target=target,
+        allow_missing=args.allow_missing,
+        renormalise=args.renormalise,
+        quarantine_path=getattr(args, "quarantine", None),
+    )
+
+
+def make_validator(args):
+    """按命令行参数创建成分校验器；未启用时返回 None"""
+    options = validation_options(args)
+    return None if options is None else RowValidator(**options)
+
+
+def print_validation_summary(validator, file=None):
+    """打印成分校验的结果"""
+    if validator is None:
+        return
+    summary = validator.summary()
+    print(
+        f"校验: {summary['rows']} 行中 {summary['valid']} 行通过, "
+        f"{summary['quarantined']} 行被隔离",
+        file=file,
+    )
+    if summary["quarantined"]:
+        reasons = ", ".join(
+            f"{name} {count}" for name, count in summary["reasons"].items() if count
+        )
+        print(f"  原因: {reasons}", file=file)
+        print(f"  隔离文件: {validator.quarantine_path}", file=file)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="convert_at_wt.py",
+        description="质量百分比 (wt%) 与 原子百分比 (at%) 转换工具。不带参数运行时进入交互式向导。",
+    )
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+
+    # 向导
+    subparsers.add_parser("wizard", help="交互式向导 (与不带参数运行相同)")
+
+    # 单点计算
+    point = subparsers.add_parser(
+        "point",
+        help="单点计算，例如: point --to at Al=90 Cu=10 或 point --to at Al-4.5Cu",
+    )
+    add_unit_arguments(point, unit_column=False)
+    point.add_argument(
+        "values",
+        nargs="+",
+        type=parse_point_value,
+        help="元素含量，形如 Cu=4.5，或牌号 / 化学式，形如 Al-4.5Cu-1.5Mg、Al90Cu10",
+    )
+
+    # 批量计算 (文件)
+    convert = subparsers.add_parser(
+        "convert", help="批量转换一个文件 (CSV / Parquet / Feather，按扩展名识别格式)"
+    )
+    convert.add_argument("input", help="输入文件路径")
+    add_unit_arguments(convert)
+    convert.add_argument(
+        "-o",
+        "--output",
+        help="输出文件路径，扩展名决定输出格式 (优先于 --name-template)",
+    )
+    convert.add_argument(
+        "--name-template",
+        default=DEFAULT_OUTPUT_TEMPLATE,
+        help="输出文件名模板，可用字段 {stem} {ext} {out_ext} {from} {to}，默认 '%(default)s'",
+    )
+    convert.add_argument("--output-dir", help="输出目录，默认与输入文件相同")
+    add_compression_argument(convert)
+    add_column_arguments(convert)
+    add_species_argument(convert)
+    processing = convert.add_mutually_exclusive_group()
+    processing.add_argument(
+        "--chunksize",
+        type=int,
+        help="流式分块处理，每块的行数 (默认一次性读入整个文件)",
+    )
+    processing.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        help="把文件按字节切分成多个分区，用此数量的进程并行转换 (适合单个超大文件)",
+    )
+    add_lean_argument(convert)
+    add_pipeline_argument(convert)
+    convert.add_argument(
+        "--sparse",
+        action="store_true",
+        help="稀疏模式：成分按 CSR 形式保存，只转换非零项，输出长格式 (样品, 元素, 含量)；"
+        "输出扩展名为 .npz 时保存为 CSR 数组。适合很宽、大部分为 0 的表格",
+    )
+    convert.add_argument(
+        "--id-column",
+        help="稀疏模式下作为样品编号写入输出的列，默认使用行号",
+    )
+    add_cache_arguments(convert)
+    add_stats_arguments(convert)
+    add_validation_arguments(
+        convert, "隔离文件路径，默认为输出文件名加 -quarantine.csv"
+    )
+    convert.add_argument(
+        "--encoding", default="utf-8-sig", help="输出文件编码，默认 %(default)s"
+    )
+
+    # 多文件并行批量计算
+    batch = subparsers.add_parser(
+        "batch", help="用多个进程并行转换多个文件 (目录、通配符或文件列表)"
+    )
+    batch.add_argument(
+        "inputs",
+        nargs="+",
+        help="输入文件、目录 (转换其中的 CSV/Parquet/Feather 文件，CSV可以是压缩的) 或通配符，例如 'data/*.csv'",
+    )
+    add_unit_arguments(batch)
+    batch.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        help="工作进程数，默认使用全部CPU核心",
+    )
+    batch.add_argument(
+        "--name-template",
+        default=DEFAULT_OUTPUT_TEMPLATE,
+        help="输出文件名模板，可用字段 {stem} {ext} {out_ext} {from} {to}，默认 '%(default)s'",
+    )
+    batch.add_argument("--output-dir", help="输出目录，默认与各输入文件相同")
+    add_compression_argument(batch)
+    add_column_arguments(batch)
+    add_species_argument(batch)
+    batch.add_argument("--chunksize", type=int, help="每个文件都按此行数流式分块处理")
+    add_lean_argument(batch)
+    add_result_cache_arguments(batch)
+    add_validation_arguments(batch)
+    batch.add_argument(
+        "--encoding", default="utf-8-sig", help="输出文件编码，默认 %(default)s"
+    )
+
+    # 监视文件夹 (增量转换不断追加的文件)
+    watch = subparsers.add_parser(
+        "watch",
+        help="监视一个目录：新文件整体转换，已有文件只转换新追加的行并追加到对应的输出文件",
+    )
+    watch.add_argument("directory", help="被监视的目录 (其中未压缩的CSV文件)")
+    add_unit_arguments(watch)
+    watch.add_argument(
+        "--interval",
+        type=float,
+        help="扫描间隔 (秒)，默认使用 watch_folder.DEFAULT_WATCH_INTERVAL",
+    )
+    watch.add_argument(
+        "--once",
+        action="store_true",
+        help="只扫描一次后退出 (适合由计划任务定期调用)",
+    )
+    watch.add_argument(
+        "--state",
+        help="保存各文件处理进度的状态文件，默认为输出目录中的 .convert-watch-state.json",
+    )
+    watch.add_argument(
+        "--name-template",
+        default=DEFAULT_OUTPUT_TEMPLATE,
+        help="输出文件名模板，可用字段 {stem} {ext} {out_ext} {from} {to}，默认 '%(default)s'",
+    )
+    watch.add_argument("--output-dir", help="输出目录，默认与被监视的目录相同")
+    add_column_arguments(watch)
+    add_species_argument(watch)
+    watch.add_argument(
+        "--encoding", default="utf-8-sig", help="输出文件编码，默认 %(default)s"
+    )
+
+    # 本地HTTP转换服务
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="启动本地HTTP转换服务 (POST /convert、/convert/bulk，GET /metrics)",
+    )
+    serve_parser.add_argument(
+        "--host",
+        help="监听地址，默认为本机地址 (http_service.DEFAULT_HOST，只允许本机访问)",
+    )
+    serve_parser.add_argument(
+        "--port", type=int, help="端口，默认使用 http_service.DEFAULT_PORT"
+    )
+    serve_parser.add_argument(
+        "--batch-rows",
+        type=int,
+        help="一个微批最多合并的行数，默认使用 http_service.DEFAULT_BATCH_ROWS",
+    )
+    serve_parser.add_argument(
+        "--batch-delay-ms",
+        type=float,
+        help="收到第一个请求后继续收集并发请求的最长时间 (毫秒)，"
+        "默认使用 http_service.DEFAULT_BATCH_DELAY；为 0 时只合并已经排队的请求",
+    )
+
+    # 管道过滤 (标准输入 -> 标准输出)
+    filter_parser = subparsers.add_parser(
+        "filter", help="从标准输入读取CSV，把结果写到标准输出"
+    )
+    add_unit_arguments(filter_parser)
+    add_column_arguments(filter_parser)
+    add_species_argument(filter_parser)
+    filter_parser.add_argument(
+        "--chunksize",
+        type=int,
+        help="分块处理，每块的行数 (默认一次性读入)。注意：标准输入无法预先扫描列类型，"
+        "分块时个别整数列的格式可能与一次性读入不同",
+    )
+    add_cache_arguments(filter_parser)
+    add_stats_arguments(filter_parser)
+    add_validation_arguments(filter_parser, "隔离文件路径 (使用 --validate 时必须指定)")
+    return parser
+
+
+def run_point(args):
+    input_percents = dict(itertools.chain.from_iterable(args.values))
+    options = unit_options(args)
+    if options is None:
+        conversion_func, _ = DIRECTIONS[args.to]
+        result_percents = conversion_func(input_percents)
+    else:
+        unknown = [el for el in input_percents if el not in ATOMIC_MASSES]
+        if unknown:
+            raise ValueError(f"错误：未知的元素符号: {', '.join(unknown)}")
+        result_percents = convert_composition(
+            input_percents,
+            options["from_unit"],
+            args.to,
+            ATOMIC_MASSES,
+            args.balance,
+        )
+    elements = list(input_percents)
+    print(",".join(f"{el}({UNIT_LABELS[args.to]})" for el in elements))
+    print(",".join(f"{result_percents.get(el, 0):.4f}" for el in elements))
+
+
+def run_sparse_convert(args):
+    """convert --sparse：以 CSR 形式转换，输出长格式或 .npz"""
+    if (
+        args.workers
+        or args.dedupe
+        or args.lean
+        or args.pipeline
+        or args.species
+        or args.designation
+        or validation_options(args) is not None
+        or unit_options(args) is not None
+    ):
+        raise ValueError(
+            "错误：--sparse 只支持 wt / at 互换，不能与 --workers、--dedupe、--lean、--pipeline、"
+            "--species、--designation、校验或其他单位同时使用。"
+        )
+    from sparse_batch import SPARSE_OUTPUT_TEMPLATE, convert_file_sparse
+
+    template = args.name_template
+    if template == DEFAULT_OUTPUT_TEMPLATE:
+        template = SPARSE_OUTPUT_TEMPLATE
+    output_path = output_path_from_args(args, source_unit(args), template)
+    stats = make_stats(args, args.input)
+    total_rows, element_cols, nnz = convert_file_sparse(
+        args.input,
+        output_path,
+        args.to,
+        ATOMIC_MASSES,
+        names=args.columns,
+        col_range=args.column_range,
+        id_column=args.id_column,
+        chunksize=args.chunksize or DEFAULT_CHUNK_ROWS,
+        encoding=args.encoding,
+        stats=stats,
+    )
+    density = nnz / (total_rows * len(element_cols)) if total_rows else 0.0
+    print(
+        f"{args.input} -> {output_path}: {total_rows} 行, 成分列 {', '.join(element_cols)}, "
+        f"非零项 {nnz} 个 (占 {density:.1%})",
+        file=sys.stderr,
+    )
+    report_stats(stats, args)
+
+
+def run_convert(args):
+    if args.sparse:
+        return run_sparse_convert(args)
+    if args.id_column:
+        raise ValueError("错误：--id-column 只能与 --sparse 一起使用。")
+    from_unit = source_unit(args)
+    output_path = output_path_from_args(args, from_unit, args.name_template)
+    if args.workers and args.dedupe:
+        raise ValueError(
+            "错误：--dedupe 只能用于单进程模式，不能与 --workers 同时使用。"
+        )
+    validator = make_validator(args)
+    if args.workers and validator is not None:
+        raise ValueError(
+            "错误：--validate 只能用于单进程模式，不能与 --workers 同时使用。"
+        )
+    if args.workers and args.designation:
+        raise ValueError(
+            "错误：--designation 只能用于单进程模式，不能与 --workers 同时使用。"
+        )
+    if args.workers and args.species:
+        raise ValueError(
+            "错误：--species 只能用于单进程模式，不能与 --workers 同时使用。"
+        )
+    if args.workers and args.lean:
+        raise ValueError("错误：--lean 只能用于单进程模式，不能与 --workers 同时使用。")
+    if args.workers and args.pipeline:
+        raise ValueError(
+            "错误：--pipeline 只能用于单进程模式，不能与 --workers 同时使用。"
+        )
+    unit_converter = make_unit_converter(args)
+    if args.workers and unit_converter is not None:
+        raise ValueError(
+            "错误：wt / at 互换以外的单位换算只能用于单进程模式，不能与 --workers 同时使用。"
+        )
+
+    cache = make_cache(args)
+    stats = make_stats(args, args.input)
+    pipeline_stats = PipelineStats() if args.pipeline else None
+    if args.workers:
+        # 各分区在工作进程中处理，只能记录整体耗时
+        with stage(stats, "partitioned") as record:
+            total_rows, element_cols = convert_csv_partitioned(
+                args.input,
+                output_path,
+                args.to,
+                ATOMIC_MASSES,
+                names=args.columns,
+                col_range=args.column_range,
+                workers=args.workers,
+                encoding=args.encoding,
+            )
+            record["rows"] = total_rows
+    else:
+        total_rows, element_cols = convert_file(
+            args.input,
+            output_path,
+            args.to,
+            ATOMIC_MASSES,
+            names=args.columns,
+            col_range=args.column_range,
+            chunksize=args.chunksize,
+            encoding=args.encoding,
+            cache=cache,
+            stats=stats,
+            validator=validator,
+            designation=args.designation,
+            species=args.species,
+            unit_converter=unit_converter,
+            lean=args.lean,
+            pipeline_stats=pipeline_stats,
+        )
+    print(
+        f"{args.input} -> {output_path}: {total_rows} 行, 成分列 {', '.join(element_cols)}",
+        file=sys.stderr,
+    )
+    print_validation_summary(validator, file=sys.stderr)
+    print_unit_summary(unit_converter, file=sys.stderr)
+    print_cache_summary(cache)
+    print_pipeline_summary(pipeline_stats, file=sys.stderr)
+    report_stats(stats, args)
+
+
+def print_file_result(result):
+    """打印多文件模式中单个文件的结果"""
+    if result.error is None:
+        quarantined = f", 隔离 {result.quarantined} 行" if result.quarantined else ""
+        status = "复用" if result.reused else "完成"
+        print(
+            f"[{status}] {result.input_path} -> {result.output_path}: "
+            f"{result.rows} 行{quarantined}, {result.seconds:.2f} 秒"
+        )
+    else:
+        print(f"[失败] {result.input_path}: {result.error}")
+
+
+def run_batch(args):
+    from_unit = source_unit(args)
+    input_paths = expand_input_paths(
+        args.inputs, from_unit, args.to, args.name_template, args.compress
+    )
+    if not input_paths:
+        raise ValueError("错误：没有找到需要转换的文件。")
+
+    result_cache = make_result_cache(args)
+    start = time.perf_counter()
+    results = convert_files(
+        input_paths,
+        from_unit,
+        args.to,
+        ATOMIC_MASSES,
+        names=args.columns,
+        col_range=args.column_range,
+        chunksize=args.chunksize,
+        encoding=args.encoding,
+        template=args.name_template,
+        output_dir=args.output_dir,
+        workers=args.workers,
+        on_result=print_file_result,
+        validation=validation_options(args),
+        designation=args.designation,
+        species=args.species,
+        units=unit_options(args),
+        lean=args.lean,
+        compression=args.compress,
+        result_cache=result_cache,
+    )
+    summary = summarize_results(results, time.perf_counter() - start)
+
+    print("\n--- 批量转换汇总 ---")
+    print(
+        f"文件: {summary['files']} 个 (成功 {summary['succeeded']}, 失败 {summary['failed']})"
+    )
+    print(f"总行数: {summary['rows']}, 耗时: {summary['seconds']:.2f} 秒")
+    if result_cache is not None:
+        cached = result_cache.summary()
+        print(
+            f"结果缓存: 复用 {summary['reused']} 个文件, 重新转换 {summary['recomputed']} 个; "
+            f"缓存中共 {cached['entries']} 个条目, {cached['bytes'] / 2**20:.1f} MB"
+        )
+    if summary["quarantined"]:
+        print(f"校验未通过而被隔离的行: {summary['quarantined']}")
+    print(
+        f"吞吐量: {summary['files_per_s']:.2f} 文件/秒, {summary['rows_per_s']:.0f} 行/秒"
+    )
+    return 1 if summary["failed"] else 0
+
+
+def print_watch_update(input_path, output_path, rows, error):
+    """打印监视模式中一个文件的变化"""
+    stamp = time.strftime("%H:%M:%S")
+    if error is None:
+        print(f"{stamp} [追加] {input_path} -> {output_path}: +{rows} 行", flush=True)
+    else:
+        print(f"{stamp} [失败] {input_path}: {error}", flush=True)
+
+
+def run_watch(args):
+    from watch_folder import DEFAULT_WATCH_INTERVAL, FolderWatcher
+
+    if not os.path.isdir(args.directory):
+        raise ValueError(f"错误：找不到目录: {args.directory}")
+    if args.designation:
+        raise ValueError("错误：--designation 需要先扫描整列，不能用于监视模式。")
+    watcher = FolderWatcher(
+        args.directory,
+        args.to,
+        source_unit(args),
+        ATOMIC_MASSES,
+        names=args.columns,
+        col_range=args.column_range,
+        encoding=args.encoding,
+        template=args.name_template,
+        output_dir=args.output_dir,
+        state_path=args.state,
+        species=args.species,
+        unit_converter=make_unit_converter(args),
+    )
+    if args.once:
+        watcher.run(on_update=print_watch_update, max_polls=1)
+        return 0
+    interval = DEFAULT_WATCH_INTERVAL if args.interval is None else args.interval
+    print(
+        f"正在监视 {args.directory} (每 {interval:g} 秒扫描一次)，按 Ctrl+C 停止",
+        file=sys.stderr,
+    )
+    try:
+        watcher.run(interval, on_update=print_watch_update)
+    except KeyboardInterrupt:
+        print("已停止监视。", file=sys.stderr)
+    return 0
+
+
+def run_serve(args):
+    import asyncio
+
+    from http_service import ConversionService, serve
+
+    if (args.batch_rows is not None and args.batch_rows < 1) or (
+        args.batch_delay_ms is not None and args.batch_delay_ms < 0
+    ):
+        raise ValueError("错误：--batch-rows 必须为正数，--batch-delay-ms 不能为负。")
+    # 只传入命令行给出的参数，其余使用 ConversionService 的默认值
+    options = dict(
+        host=args.host,
+        port=args.port,
+        max_batch_rows=args.batch_rows,
+        max_batch_delay=(
+            None if args.batch_delay_ms is None else args.batch_delay_ms / 1000
+        ),
+    )
+    service = ConversionService(
+        atomic_masses=ATOMIC_MASSES,
+        **{key: value for key, value in options.items() if value is not None},
+    )
+
+    def on_started(service):
+        print(f"正在监听 {service.url}，按 Ctrl+C 停止", file=sys.stderr, flush=True)
+
+    try:
+        asyncio.run(serve(service, on_started))
+    except KeyboardInterrupt:
+        print("服务已停止。", file=sys.stderr)
+    for line in service.metrics.format_lines():
+        print(line, file=sys.stderr)
+    return 0
+
+
+def run_filter(args):
+    validator = make_validator(args)
+    if validator is not None and not args.quarantine:
+        raise ValueError(
+            "错误：filter 模式使用 --validate 时必须用 --quarantine 指定隔离文件。"
+        )
+    if args.species and (args.dedupe or args.designation):
+        raise ValueError("错误：化合物成分不能与去重缓存或牌号列同时使用。")
+    stats = make_stats(args, "<stdin>")
+    # 行数由 write_converted_chunks 取出各块时统计，这里只累计读取耗时
+    with stage(stats, "read"):
+        if args.chunksize is None:
+            df = pd.read_csv(sys.stdin)
+            chunks = [df]
+            columns = df.columns
+        else:
+            reader = pd.read_csv(sys.stdin, chunksize=args.chunksize)
+            first = next(reader)
+            chunks = itertools.chain([first], reader)
+            columns = first.columns
+    designation = None
+    species_converter = None
+    with stage(stats, "validate"):
+        if args.designation:
+            if args.chunksize is not None:
+                raise ValueError(
+                    "错误：--designation 需要先扫描整列，不能与 --chunksize 同时使用。"
+                )
+            if args.designation not in columns:
+                raise ValueError(f"错误：文件中找不到以下列: {args.designation}")
+            designation = DesignationColumn(
+                args.designation,
+                ATOMIC_MASSES,
+                "raise" if validator is None else "coerce",
+            )
+            designation.scan(df[args.designation])
+            element_cols = designation.elements
+        elif args.species:
+            element_cols = select_species_columns(
+                columns, ATOMIC_MASSES, args.columns, args.column_range
+            )
+            species_converter = SpeciesConverter(element_cols, ATOMIC_MASSES)
+        else:
+            element_cols = select_element_columns(
+                columns, ATOMIC_MASSES, args.columns, args.column_range
+            )
+        masses = None if args.species else mass_vector(element_cols, ATOMIC_MASSES)
+        unit_converter = make_unit_converter(args)
+        if unit_converter is not None:
+            if args.dedupe or args.designation or args.species:
+                raise ValueError(
+                    "错误：单位换算不能与去重缓存、牌号列或化合物成分同时使用。"
+                )
+            if args.unit_column and args.unit_column not in columns:
+                raise ValueError(f"错误：文件中找不到单位列: {args.unit_column}")
+            unit_converter.check_columns(element_cols)
+    cache = make_cache(args)
+    if validator is not None:
+        validator.start()
+    try:
+        write_converted_chunks(
+            chunks,
+            sys.stdout,
+            element_cols,
+            masses,
+            args.to,
+            cache=cache,
+            stats=stats,
+            validator=validator,
+            designation=designation,
+            species_converter=species_converter,
+            unit_converter=unit_converter,
+        )
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # 下游命令 (如 head) 提前关闭了管道，不视为错误
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    print_validation_summary(validator, file=sys.stderr)
+    print_unit_summary(unit_converter, file=sys.stderr)
+    print_cache_summary(cache)
+    report_stats(stats, args)
+
+
+# --- 主程序入口 ---
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    args = build_parser().parse_args(argv)
+    if args.command in (None, "wizard"):
+        run_wizard()
+        return 0
+
+    handlers = {
+        "point": run_point,
+        "convert": run_convert,
+        "batch": run_batch,
+        "filter": run_filter,
+        "watch": run_watch,
+        "serve": run_serve,
+    }
+    try:
+        return handlers[args.command](args) or 0
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,253 @@
+from collections import OrderedDict
+
+import numpy as np
+
+# --- 元素注册表 ---
+# 命令行版与图形界面版共用的唯一一份原子量表。
+# 数据来源：IUPAC (国际纯粹与应用化学联合会) 标准原子量，给出区间的元素取约定值；
+# 没有稳定同位素的元素取最长寿命同位素的质量数。
+# Al、Mn、Zr 保留本工具一直使用的数值，以免已有结果发生变化。
+
+# 原子量表版本号，修改下面任何数值时都应同时更新，依赖它的缓存会因此失效
+ATOMIC_MASS_TABLE_VERSION = "1"
+
+# 按原子序数排列: (元素符号, 原子量)
+ELEMENT_DATA = (
+    ("H", 1.008),
+    ("He", 4.002602),
+    ("Li", 6.94),
+    ("Be", 9.0121831),
+    ("B", 10.81),
+    ("C", 12.011),
+    ("N", 14.007),
+    ("O", 15.999),
+    ("F", 18.998403163),
+    ("Ne", 20.1797),
+    ("Na", 22.98976928),
+    ("Mg", 24.305),
+    ("Al", 26.9815385),
+    ("Si", 28.085),
+    ("P", 30.973761998),
+    ("S", 32.06),
+    ("Cl", 35.45),
+    ("Ar", 39.95),
+    ("K", 39.0983),
+    ("Ca", 40.078),
+    ("Sc", 44.955908),
+    ("Ti", 47.867),
+    ("V", 50.9415),
+    ("Cr", 51.9961),
+    ("Mn", 54.938044),
+    ("Fe", 55.845),
+    ("Co", 58.933194),
+    ("Ni", 58.6934),
+    ("Cu", 63.546),
+    ("Zn", 65.38),
+    ("Ga", 69.723),
+    ("Ge", 72.630),
+    ("As", 74.921595),
+    ("Se", 78.971),
+    ("Br", 79.904),
+    ("Kr", 83.798),
+    ("Rb", 85.4678),
+    ("Sr", 87.62),
+    ("Y", 88.90584),
+    ("Zr", 91.224),
+    ("Nb", 92.90637),
+    ("Mo", 95.95),
+    ("Tc", 98.0),
+    ("Ru", 101.07),
+    ("Rh", 102.90549),
+    ("Pd", 106.42),
+    ("Ag", 107.8682),
+    ("Cd", 112.414),
+    ("In", 114.818),
+    ("Sn", 118.710),
+    ("Sb", 121.760),
+    ("Te", 127.60),
+    ("I", 126.90447),
+    ("Xe", 131.293),
+    ("Cs", 132.90545196),
+    ("Ba", 137.327),
+    ("La", 138.90547),
+    ("Ce", 140.116),
+    ("Pr", 140.90766),
+    ("Nd", 144.242),
+    ("Pm", 145.0),
+    ("Sm", 150.36),
+    ("Eu", 151.964),
+    ("Gd", 157.25),
+    ("Tb", 158.925354),
+    ("Dy", 162.500),
+    ("Ho", 164.930328),
+    ("Er", 167.259),
+    ("Tm", 168.934218),
+    ("Yb", 173.045),
+    ("Lu", 174.9668),
+    ("Hf", 178.49),
+    ("Ta", 180.94788),
+    ("W", 183.84),
+    ("Re", 186.207),
+    ("Os", 190.23),
+    ("Ir", 192.217),
+    ("Pt", 195.084),
+    ("Au", 196.966570),
+    ("Hg", 200.592),
+    ("Tl", 204.38),
+    ("Pb", 207.2),
+    ("Bi", 208.98040),
+    ("Po", 209.0),
+    ("At", 210.0),
+    ("Rn", 222.0),
+    ("Fr", 223.0),
+    ("Ra", 226.0),
+    ("Ac", 227.0),
+    ("Th", 232.0377),
+    ("Pa", 231.03588),
+    ("U", 238.02891),
+    ("Np", 237.0),
+    ("Pu", 244.0),
+    ("Am", 243.0),
+    ("Cm", 247.0),
+    ("Bk", 247.0),
+    ("Cf", 251.0),
+    ("Es", 252.0),
+    ("Fm", 257.0),
+    ("Md", 258.0),
+    ("No", 259.0),
+    ("Lr", 262.0),
+    ("Rf", 267.0),
+    ("Db", 268.0),
+    ("Sg", 269.0),
+    ("Bh", 270.0),
+    ("Hs", 269.0),
+    ("Mt", 278.0),
+    ("Ds", 281.0),
+    ("Rg", 282.0),
+    ("Cn", 285.0),
+    ("Nh", 286.0),
+    ("Fl", 289.0),
+    ("Mc", 290.0),
+    ("Lv", 293.0),
+    ("Ts", 294.0),
+    ("Og", 294.0),
+)
+
+# 元素符号 -> 原子量
+ATOMIC_MASSES = OrderedDict(ELEMENT_DATA)
+
+# 元素符号与整数索引 (原子序数 - 1) 的双向映射
+ELEMENT_SYMBOLS = tuple(symbol for symbol, _ in ELEMENT_DATA)
+ELEMENT_INDEX = {symbol: i for i, symbol in enumerate(ELEMENT_SYMBOLS)}
+
+# 按索引排列的原子量，只读
+MASSES = np.array([mass for _, mass in ELEMENT_DATA], dtype=np.float64)
+MASSES.setflags(write=False)
+
+
+def element_indices(symbols):
+    """
+    把元素符号列表转换为注册表中的整数索引
+    :param symbols: 元素符号列表, e.g., ['Al', 'Cu']
+    :return: 整数索引数组
+    """
+    unknown = [el for el in symbols if el not in ELEMENT_INDEX]
+    if unknown:
+        raise ValueError(
+            f"错误：元素 {', '.join(map(repr, unknown))} 的原子量未知。请检查元素符号是否正确。"
+        )
+    return np.array([ELEMENT_INDEX[el] for el in symbols], dtype=np.intp)
+
+
+def mass_vector(symbols, atomic_masses=None):
+    """
+    按列顺序一次性取出原子量，供批量计算在整个文件上复用
+    :param symbols: 成分列名 (元素符号) 列表
+    :param atomic_masses: 自定义的 元素 -> 原子量 字典；默认使用注册表
+    :return: 一维原子量数组
+    """
+    if atomic_masses is None or atomic_masses is ATOMIC_MASSES:
+        return MASSES[element_indices(symbols)]
+
+    unknown = [el for el in symbols if el not in atomic_masses]
+    if unknown:
+        raise ValueError(
+            f"错误：元素 {', '.join(map(repr, unknown))} 的原子量未知。请将其添加到原子量表中。"
+        )
+    return np.array([atomic_masses[el] for el in symbols], dtype=np.float64)
+
+
+# --- 单点转换 (字典函数) ---
+# 命令行版与图形界面版共用；批量转换的向量化核心 (batch_engine) 与之逐位一致。
+
+
+def wt_to_at(wt_percents: dict) -> dict:
+    """
+    将质量百分比 (wt%) 转换为原子百分比 (at%)
+    :param wt_percents: 包含元素和其质量百分比的字典, e.g., {'Al': 90, 'Cu': 10}
+    :return: 包含元素和其原子百分比的字典
+    """
+    at_percents = {}
+    total_moles = 0
+
+    # 检查输入中是否有未知元素
+    for element in wt_percents.keys():
+        if element not in ATOMIC_MASSES:
+            raise ValueError(
+                f"错误：元素 '{element}' 的原子量未知。请检查元素符号是否正确。"
+            )
+
+    # 1. 计算每个元素的摩尔数
+    moles = {
+        el: wt / ATOMIC_MASSES[el]
+        for el, wt in wt_percents.items()
+        if el in ATOMIC_MASSES and wt > 0
+    }
+
+    # 2. 计算总摩尔数
+    total_moles = sum(moles.values())
+
+    if total_moles == 0:
+        return {el: 0 for el in wt_percents.keys()}
+
+    # 3. 计算每个元素的原子百分比
+    at_percents = {el: (mol / total_moles) * 100 for el, mol in moles.items()}
+
+    return at_percents
+
+
+def at_to_wt(at_percents: dict) -> dict:
+    """
+    将原子百分比 (at%) 转换为质量百分比 (wt%)
+    :param at_percents: 包含元素和其原子百分比的字典, e.g., {'Al': 95, 'Cu': 5}
+    :return: 包含元素和其质量百分比的字典
+    """
+    wt_percents = {}
+    total_mass = 0
+
+    # 检查输入中是否有未知元素
+    for element in at_percents.keys():
+        if element not in ATOMIC_MASSES:
+            raise ValueError(
+                f"错误：元素 '{element}' 的原子量未知。请检查元素符号是否正确。"
+            )
+
+    # 1. 计算每个元素的相对质量贡献
+    mass_contributions = {
+        el: at * ATOMIC_MASSES[el]
+        for el, at in at_percents.items()
+        if el in ATOMIC_MASSES and at > 0
+    }
+
+    # 2. 计算总质量
+    total_mass = sum(mass_contributions.values())
+
+    if total_mass == 0:
+        return {el: 0 for el in at_percents.keys()}
+
+    # 3. 计算每个元素的质量百分比
+    wt_percents = {
+        el: (mass / total_mass) * 100 for el, mass in mass_contributions.items()
+    }
+
+    return wt_percents
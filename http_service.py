@@ -0,0 +1,610 @@
+import asyncio
+import io
+import json
+import math
+import time
+from collections import OrderedDict, deque
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from batch_engine import (
+    BATCH_KERNELS,
+    convert_frame,
+    select_element_columns,
+)
+from composition_parser import parse_composition
+from elements import ATOMIC_MASSES, mass_vector
+
+# --- 本地HTTP转换服务 ---
+# 供其他内部工具调用的 wt% <-> at% 转换服务，只使用标准库 asyncio，只监听本机地址。
+# 接口:
+#   POST /convert        单个成分: {"to": "at", "composition": {"Al": 90, "Cu": 10}}
+#                        成分也可以是牌号 / 化学式字符串，例如 "Al-4.5Cu-1.5Mg"
+#   POST /convert/bulk   多个成分: {"to": "at", "compositions": [{...}, "Al90Cu10", ...]}
+#                        或 Content-Type: text/csv 的CSV正文，目标单位等参数放在查询串中:
+#                        /convert/bulk?to=at&columns=Al,Cu，返回原表加结果列的CSV
+#   GET  /metrics        各接口的请求数、延迟分位数、吞吐量与微批统计
+#   GET  /health         存活检查
+# 微批：同时到达的 JSON 请求先进入队列，收集最多 max_delay 秒 (或 max_rows 行) 后合并，
+# 按 (目标单位, 元素列表) 分组，每组堆叠为一个二维数组，只调用一次 BATCH_KERNELS 中的向量化函数。
+# 元素顺序与请求中一致，结果与 wt_to_at / at_to_wt 字典函数逐位相同 (含量 <= 0 的元素不出现在结果中)。
+# CSV 正文本身就是一整块，直接整体转换，不经过微批队列。
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# 一个微批最多合并的行数，与收集请求的最长等待时间 (秒)；等待时间为 0 时只合并已在队列中的请求
+DEFAULT_BATCH_ROWS = 4096
+DEFAULT_BATCH_DELAY = 0.001
+
+# 请求正文的最大字节数
+DEFAULT_MAX_BODY_BYTES = 64 * 2**20
+
+# 每个接口保留最近多少个请求的延迟用于计算分位数
+LATENCY_WINDOW = 10_000
+
+# 表格输出的列标题 (接口, 请求数, 错误数, 行数, 平均延迟, p50, p99)
+METRICS_HEADERS = ("接口", "请求数", "错误", "行数", "平均ms", "p50 ms", "p99 ms")
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+
+class HttpError(Exception):
+    """以指定状态码返回给客户端的错误"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# --- 请求解析 ---
+
+
+def parse_target_unit(value):
+    """目标单位只能是 'at' 或 'wt' (源单位为另一个)"""
+    if value not in BATCH_KERNELS:
+        raise ValueError(
+            f"错误：目标单位 '{value}' 无效，应为 {' 或 '.join(BATCH_KERNELS)}。"
+        )
+    return value
+
+
+def normalise_composition(composition, atomic_masses=ATOMIC_MASSES):
+    """
+    把请求中的一个成分整理为 (元素元组, 含量元组)，元素顺序与请求中一致
+    :param composition: 元素 -> 含量 的字典，或牌号 / 化学式字符串
+    :return: (('Al', 'Cu'), (90.0, 10.0))
+    """
+    if isinstance(composition, str):
+        composition = parse_composition(composition, atomic_masses)
+    if not isinstance(composition, dict) or not composition:
+        raise ValueError(
+            f"错误：成分 {composition!r} 应为非空的 元素 -> 含量 对象或牌号字符串。"
+        )
+    unknown = [el for el in composition if el not in atomic_masses]
+    if unknown:
+        raise ValueError(
+            f"错误：元素 {', '.join(map(repr, unknown))} 的原子量未知。请检查元素符号是否正确。"
+        )
+    values = []
+    for el, value in composition.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"错误：元素 '{el}' 的含量 {value!r} 不是数字。")
+        if not math.isfinite(value):
+            raise ValueError(f"错误：元素 '{el}' 的含量 {value!r} 不是有限的数。")
+        values.append(float(value))
+    return tuple(composition), tuple(values)
+
+
+def convert_compositions(rows, to_unit, atomic_masses=ATOMIC_MASSES):
+    """
+    按元素列表分组，每组调用一次向量化转换
+    :param rows: [(元素元组, 含量元组), ...]，见 normalise_composition
+    :param to_unit: 'at' 或 'wt'
+    :return: 与 rows 一一对应的结果字典列表
+    """
+    groups = OrderedDict()
+    for i, (elements, _) in enumerate(rows):
+        groups.setdefault(elements, []).append(i)
+    results = [None] * len(rows)
+    for elements, indices in groups.items():
+        values = np.array([rows[i][1] for i in indices], dtype=np.float64)
+        converted = BATCH_KERNELS[to_unit](values, mass_vector(elements, atomic_masses))
+        for i, row in zip(indices, converted.tolist()):
+            # NaN 为含量 <= 0 的元素，字典函数的结果中没有这些元素
+            results[i] = {
+                el: value for el, value in zip(elements, row) if not math.isnan(value)
+            }
+    return results
+
+
+def convert_csv_text(text, to_unit, names=None, atomic_masses=ATOMIC_MASSES):
+    """
+    转换CSV正文，返回原表加结果列的CSV文本
+    :param names: 成分列名列表；为 None 时自动识别元素符号列
+    :return: (CSV文本, 行数)
+    """
+    df = pd.read_csv(io.StringIO(text))
+    element_cols = select_element_columns(df.columns, atomic_masses, names)
+    masses = mass_vector(element_cols, atomic_masses)
+    result_df = convert_frame(df, element_cols, masses, to_unit)
+    return pd.concat([df, result_df], axis=1).to_csv(index=False), len(df)
+
+
+# --- 指标 ---
+
+
+class ServiceMetrics:
+    """
+    按接口统计请求数、错误数、行数与延迟，并统计微批的合并情况
+    延迟为从读完请求到写出响应的时间，分位数按每个接口最近 LATENCY_WINDOW 个请求计算。
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.endpoints = OrderedDict()
+        self.batches = 0
+        self.batched_requests = 0
+        self.batched_rows = 0
+        self.max_batch_requests = 0
+        self.kernel_seconds = 0.0
+
+    def record(self, endpoint, seconds, rows=0, error=False):
+        entry = self.endpoints.setdefault(
+            endpoint,
+            {
+                "requests": 0,
+                "errors": 0,
+                "rows": 0,
+                "seconds": 0.0,
+                "latencies": deque(maxlen=LATENCY_WINDOW),
+            },
+        )
+        entry["requests"] += 1
+        entry["errors"] += bool(error)
+        entry["rows"] += rows
+        entry["seconds"] += seconds
+        entry["latencies"].append(seconds)
+
+    def record_batch(self, requests, rows, seconds):
+        self.batches += 1
+        self.batched_requests += requests
+        self.batched_rows += rows
+        self.max_batch_requests = max(self.max_batch_requests, requests)
+        self.kernel_seconds += seconds
+
+    def summary(self):
+        """
+        :return: 可直接序列化为 JSON 的统计字典 (延迟单位为毫秒)
+        """
+        uptime = time.perf_counter() - self._start
+        endpoints = []
+        for name, entry in self.endpoints.items():
+            latencies = np.array(entry["latencies"]) * 1000
+            p50, p90, p99 = np.percentile(latencies, [50, 90, 99]).tolist()
+            endpoints.append(
+                {
+                    "endpoint": name,
+                    "requests": entry["requests"],
+                    "errors": entry["errors"],
+                    "rows": entry["rows"],
+                    "mean_ms": entry["seconds"] * 1000 / entry["requests"],
+                    "p50_ms": p50,
+                    "p90_ms": p90,
+                    "p99_ms": p99,
+                    "max_ms": float(latencies.max()),
+                }
+            )
+        requests = sum(entry["requests"] for entry in self.endpoints.values())
+        rows = sum(entry["rows"] for entry in self.endpoints.values())
+        return {
+            "started": self.started,
+            "uptime_seconds": uptime,
+            "requests": requests,
+            "rows": rows,
+            "requests_per_s": requests / uptime if uptime > 0 else None,
+            "rows_per_s": rows / uptime if uptime > 0 else None,
+            "endpoints": endpoints,
+            "micro_batches": {
+                "batches": self.batches,
+                "requests": self.batched_requests,
+                "rows": self.batched_rows,
+                "mean_requests": (
+                    self.batched_requests / self.batches if self.batches else None
+                ),
+                "max_requests": self.max_batch_requests,
+                "kernel_seconds": self.kernel_seconds,
+            },
+        }
+
+    def format_lines(self, headers=METRICS_HEADERS):
+        """
+        把统计结果排成文本表格
+        :param headers: 七个列标题
+        :return: 文本行列表
+        """
+        summary = self.summary()
+        lines = [
+            f"{headers[0]:<18}{headers[1]:>10}{headers[2]:>8}{headers[3]:>12}"
+            f"{headers[4]:>10}{headers[5]:>10}{headers[6]:>10}"
+        ]
+        for s in summary["endpoints"]:
+            lines.append(
+                f"{s['endpoint']:<18}{s['requests']:>10}{s['errors']:>8}{s['rows']:>12}"
+                f"{s['mean_ms']:>10.3f}{s['p50_ms']:>10.3f}{s['p99_ms']:>10.3f}"
+            )
+        batches = summary["micro_batches"]
+        if batches["batches"]:
+            lines.append(
+                f"微批: {batches['batches']} 批, 平均每批 {batches['mean_requests']:.1f} 个请求, "
+                f"最多 {batches['max_requests']} 个"
+            )
+        return lines
+
+
+# --- 微批 ---
+
+
+class MicroBatcher:
+    """
+    把并发到达的小请求合并为一次向量化转换
+    用法 (在事件循环中):
+        batcher = MicroBatcher()
+        batcher.start()
+        results = await batcher.convert(rows, "at")
+        await batcher.close()
+    """
+
+    def __init__(
+        self,
+        atomic_masses=ATOMIC_MASSES,
+        max_rows=DEFAULT_BATCH_ROWS,
+        max_delay=DEFAULT_BATCH_DELAY,
+        metrics=None,
+    ):
+        """
+        :param atomic_masses: 原子量表
+        :param max_rows: 一个微批最多合并的行数 (单个请求超过时单独成批)
+        :param max_delay: 收到第一个请求后继续收集的最长时间 (秒)
+        :param metrics: ServiceMetrics；给出时记录每个微批的大小与计算时间
+        """
+        self.atomic_masses = atomic_masses
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.metrics = metrics
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        """在当前事件循环中启动收集任务"""
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._collect())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def convert(self, rows, to_unit):
+        """
+        提交一个请求的成分并等待结果
+        :param rows: [(元素元组, 含量元组), ...]，见 normalise_composition
+        :param to_unit: 'at' 或 'wt'
+        :return: 结果字典列表
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((rows, to_unit, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            rows = len(batch[0][0])
+            deadline = loop.time() + self.max_delay
+            while rows < self.max_rows:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                batch.append(item)
+                rows += len(item[0])
+            # 计算在线程池中进行，期间事件循环继续接收请求，下一批在队列中积累
+            start = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(None, self._convert_batch, batch)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            if self.metrics is not None:
+                self.metrics.record_batch(len(batch), rows, time.perf_counter() - start)
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def _convert_batch(self, batch):
+        """把一批请求的行合并转换，再按请求拆分结果"""
+        results = []
+        for to_unit in BATCH_KERNELS:
+            items = [
+                (i, rows) for i, (rows, unit, _) in enumerate(batch) if unit == to_unit
+            ]
+            if not items:
+                continue
+            merged = [row for _, rows in items for row in rows]
+            converted = convert_compositions(merged, to_unit, self.atomic_masses)
+            start = 0
+            for i, rows in items:
+                results.append((i, converted[start : start + len(rows)]))
+                start += len(rows)
+        return [result for _, result in sorted(results, key=lambda item: item[0])]
+
+
+# --- HTTP 服务 ---
+
+
+class ConversionService:
+    """
+    基于 asyncio 的本地HTTP转换服务 (HTTP/1.1，支持持久连接)
+    用法:
+        service = ConversionService(port=0)      # 0 表示由系统分配端口
+        await service.start()
+        print(service.port)
+        await service.serve_forever()
+    """
+
+    def __init__(
+        self,
+        host=DEFAULT_HOST,
+        port=DEFAULT_PORT,
+        atomic_masses=ATOMIC_MASSES,
+        max_batch_rows=DEFAULT_BATCH_ROWS,
+        max_batch_delay=DEFAULT_BATCH_DELAY,
+        max_body_bytes=DEFAULT_MAX_BODY_BYTES,
+    ):
+        """
+        :param host: 监听地址，默认只监听本机
+        :param port: 端口；为 0 时由系统分配，启动后从 self.port 读取
+        :param atomic_masses: 原子量表
+        :param max_batch_rows: 见 MicroBatcher
+        :param max_batch_delay: 见 MicroBatcher
+        :param max_body_bytes: 请求正文的最大字节数
+        """
+        self.host = host
+        self.port = port
+        self.atomic_masses = atomic_masses
+        self.max_body_bytes = max_body_bytes
+        self.metrics = ServiceMetrics()
+        self.batcher = MicroBatcher(
+            atomic_masses, max_batch_rows, max_batch_delay, self.metrics
+        )
+        self._server = None
+        self._routes = {
+            ("POST", "/convert"): self._handle_convert,
+            ("POST", "/convert/bulk"): self._handle_bulk,
+            ("GET", "/metrics"): self._handle_metrics,
+            ("GET", "/health"): self._handle_health,
+        }
+
+    async def start(self):
+        self.batcher.start()
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.batcher.close()
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await self._read_request(reader, writer)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                start = time.perf_counter()
+                status, content_type, payload, endpoint, rows = await self._dispatch(
+                    method, target, headers, body
+                )
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await self._write_response(
+                    writer, status, content_type, payload, keep_alive
+                )
+                self.metrics.record(
+                    endpoint, time.perf_counter() - start, rows, status != 200
+                )
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # 服务停止时仍保持着的空闲连接：直接关闭，不作为错误报告
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader, writer):
+        """读取一个请求；连接已关闭时返回 None，格式错误时回复错误后返回 None"""
+        try:
+            line = await reader.readline()
+            if not line:
+                return None
+            method, target, _ = line.decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            if "chunked" in headers.get("transfer-encoding", "").lower():
+                raise HttpError(411, "错误：请求正文须给出 Content-Length。")
+            length = int(headers.get("content-length", 0))
+            if length > self.max_body_bytes:
+                raise HttpError(
+                    413, f"错误：请求正文超过 {self.max_body_bytes} 字节的上限。"
+                )
+            body = await reader.readexactly(length) if length else b""
+        except HttpError as e:
+            await self._write_response(
+                writer, e.status, "application/json", _error_body(e), False
+            )
+            return None
+        except ValueError:
+            await self._write_response(
+                writer,
+                400,
+                "application/json",
+                _error_body("错误：无法解析的HTTP请求。"),
+                False,
+            )
+            return None
+        return method.upper(), target, headers, body
+
+    async def _write_response(self, writer, status, content_type, payload, keep_alive):
+        head = (
+            f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+            f"Content-Type: {content_type}; charset=utf-8\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + payload)
+        await writer.drain()
+
+    async def _dispatch(self, method, target, headers, body):
+        """
+        :return: (状态码, Content-Type, 响应正文, 统计用的接口名, 转换的行数)
+        """
+        parts = urlsplit(target)
+        path = parts.path.rstrip("/") or "/"
+        handler = self._routes.get((method, path))
+        endpoint = f"{method} {path}"
+        if handler is None:
+            if any(route_path == path for _, route_path in self._routes):
+                status, message = 405, f"错误：{path} 不支持 {method} 请求。"
+            else:
+                status, message = 404, f"错误：没有接口 {path}。"
+            return status, "application/json", _error_body(message), "other", 0
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        try:
+            status, content_type, payload, rows = await handler(query, headers, body)
+        except HttpError as e:
+            return e.status, "application/json", _error_body(e), endpoint, 0
+        except (ValueError, KeyError, UnicodeDecodeError) as e:
+            return 400, "application/json", _error_body(e), endpoint, 0
+        except Exception as e:
+            message = f"{type(e).__name__}: {e}"
+            return 500, "application/json", _error_body(message), endpoint, 0
+        return status, content_type, payload, endpoint, rows
+
+    async def _handle_convert(self, query, headers, body):
+        request = _json_body(body)
+        to_unit = parse_target_unit(request.get("to", query.get("to")))
+        if "composition" not in request:
+            raise ValueError("错误：请求中缺少 composition。")
+        row = normalise_composition(request["composition"], self.atomic_masses)
+        (result,) = await self.batcher.convert([row], to_unit)
+        return (
+            200,
+            "application/json",
+            _json_payload({"to": to_unit, "result": result}),
+            1,
+        )
+
+    async def _handle_bulk(self, query, headers, body):
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        if content_type == "text/csv":
+            to_unit = parse_target_unit(query.get("to"))
+            names = query["columns"].split(",") if query.get("columns") else None
+            text, rows = await asyncio.get_running_loop().run_in_executor(
+                None,
+                convert_csv_text,
+                body.decode("utf-8-sig"),
+                to_unit,
+                names,
+                self.atomic_masses,
+            )
+            return 200, "text/csv", text.encode("utf-8"), rows
+
+        request = _json_body(body)
+        to_unit = parse_target_unit(request.get("to", query.get("to")))
+        compositions = request.get("compositions")
+        if not isinstance(compositions, list):
+            raise ValueError("错误：请求中的 compositions 应为列表。")
+        rows = [normalise_composition(c, self.atomic_masses) for c in compositions]
+        results = await self.batcher.convert(rows, to_unit) if rows else []
+        payload = _json_payload({"to": to_unit, "results": results})
+        return 200, "application/json", payload, len(rows)
+
+    async def _handle_metrics(self, query, headers, body):
+        return 200, "application/json", _json_payload(self.metrics.summary()), 0
+
+    async def _handle_health(self, query, headers, body):
+        return 200, "application/json", _json_payload({"status": "ok"}), 0
+
+
+def _json_body(body):
+    try:
+        request = json.loads(body.decode("utf-8") or "null")
+    except json.JSONDecodeError as e:
+        raise ValueError(f"错误：请求正文不是有效的 JSON: {e}")
+    if not isinstance(request, dict):
+        raise ValueError("错误：请求正文应为 JSON 对象。")
+    return request
+
+
+def _json_payload(data):
+    return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+def _error_body(error):
+    return _json_payload({"error": str(error)})
+
+
+async def serve(service, on_started=None):
+    """
+    启动服务并一直运行，直到任务被取消
+    :param service: ConversionService
+    :param on_started: 开始监听后调用一次 on_started(service)
+    """
+    await service.start()
+    if on_started is not None:
+        on_started(service)
+    try:
+        await service.serve_forever()
+    finally:
+        await service.close()
@@ -0,0 +1,134 @@
+import json
+import sys
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+
+# --- 分阶段计时与内存统计 ---
+# 记录批量转换中每个阶段 (读取、校验、转换、合并、写出) 的耗时、行数、吞吐量与峰值内存。
+# 开销只有每个阶段两次 perf_counter 与 getrusage 调用，流式模式下同名阶段会跨分块累计。
+
+# 表格输出的列标题 (阶段, 耗时, 行数, 吞吐量, 峰值内存, 内存增长)
+STATS_HEADERS = ("阶段", "耗时(秒)", "行数", "行/秒", "峰值内存MB", "增长MB")
+
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存 (MB)；无法获取时返回 None"""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 2**20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+class StageStats:
+    """
+    按阶段累计耗时、行数与峰值内存
+    用法:
+        stats = StageStats("alloys.csv")
+        with stats.stage("read") as record:
+            df = pd.read_csv(path)
+            record["rows"] = len(df)
+    """
+
+    def __init__(self, label=""):
+        self.label = label
+        self.stages = OrderedDict()
+        self._created = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """
+        计时一个阶段；同名阶段多次出现时 (例如每个分块) 结果累加
+        :param name: 阶段名
+        :param rows: 该阶段处理的行数，也可以在 with 块内通过 record["rows"] 设置
+        """
+        record = {"rows": rows}
+        rss_before = peak_rss_mb()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            seconds = time.perf_counter() - start
+            rss_after = peak_rss_mb()
+            growth = None
+            if rss_before is not None and rss_after is not None:
+                growth = rss_after - rss_before
+            self.add(name, seconds, record["rows"], growth)
+
+    def add(self, name, seconds, rows=None, rss_growth_mb=None):
+        """
+        累计一个在别处计时的阶段 (例如 with 块无法包住的启动阶段)
+        :param seconds: 耗时 (秒)
+        :param rows: 处理的行数
+        :param rss_growth_mb: 该阶段的峰值内存增长
+        """
+        entry = self.stages.setdefault(
+            name,
+            {"seconds": 0.0, "rows": 0, "calls": 0, "peak_rss_mb": None},
+        )
+        entry["seconds"] += seconds
+        entry["rows"] += rows or 0
+        entry["calls"] += 1
+        entry["peak_rss_mb"] = peak_rss_mb()
+        if rss_growth_mb is not None:
+            entry["rss_growth_mb"] = entry.get("rss_growth_mb", 0.0) + rss_growth_mb
+
+    def summary(self):
+        """
+        :return: 可直接序列化为 JSON 的统计字典
+        """
+        stages = []
+        for name, entry in self.stages.items():
+            seconds = entry["seconds"]
+            rate = entry["rows"] / seconds if seconds > 0 and entry["rows"] else None
+            stages.append(dict(stage=name, **entry, rows_per_s=rate))
+        return {
+            "label": self.label,
+            "stage_seconds": sum(entry["seconds"] for entry in stages),
+            "wall_seconds": time.perf_counter() - self._created,
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": stages,
+        }
+
+    def format_lines(self, headers=STATS_HEADERS):
+        """
+        把统计结果排成文本表格
+        :param headers: 六个列标题
+        :return: 文本行列表
+        """
+        lines = [
+            f"{headers[0]:<14}{headers[1]:>12}{headers[2]:>12}"
+            f"{headers[3]:>14}{headers[4]:>12}{headers[5]:>10}"
+        ]
+        for s in self.summary()["stages"]:
+            rate = f"{s['rows_per_s']:,.0f}" if s["rows_per_s"] else "-"
+            peak = f"{s['peak_rss_mb']:.1f}" if s["peak_rss_mb"] is not None else "-"
+            growth = f"{s['rss_growth_mb']:+.1f}" if "rss_growth_mb" in s else "-"
+            lines.append(
+                f"{s['stage']:<14}{s['seconds']:>12.4f}{s['rows']:>12}"
+                f"{rate:>14}{peak:>12}{growth:>10}"
+            )
+        return lines
+
+    def to_json(self, path):
+        """把统计结果导出为 JSON 文件"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+
+
+def stage(stats, name, rows=None):
+    """
+    stats 为 None 时返回空上下文，便于在未开启统计时不加判断地使用
+    :param stats: StageStats 或 None
+    """
+    if stats is None:
+        return nullcontext({"rows": rows})
+    return stats.stage(name, rows)
@@ -0,0 +1,396 @@
+import glob
+import io
+import os
+import shutil
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from batch_engine import (
+    DEFAULT_OUTPUT_TEMPLATE,
+    convert_csv_file,
+    convert_file,
+    merge_dtypes,
+    output_path_for,
+    resolve_columns,
+    write_converted_chunks,
+)
+from result_cache import ResultCache
+from table_io import (
+    CSV,
+    DATA_EXTENSIONS,
+    detect_compression,
+    detect_format,
+    open_binary,
+)
+from units import UnitConverter
+from validation import RowValidator, quarantine_path_for
+
+# --- 多文件并行转换 ---
+# 每个文件交给进程池中的一个工作进程独立转换，单个文件出错只记录在它自己的结果里，
+# 不会影响其他文件。
+
+# 单个文件的转换结果；error 为 None 表示成功，quarantined 为校验时被隔离的行数，
+# reused 为 True 表示结果来自磁盘结果缓存 (见 result_cache)，没有重新转换
+FileResult = namedtuple(
+    "FileResult",
+    ["input_path", "output_path", "rows", "seconds", "error", "quarantined", "reused"],
+    defaults=(0, False),
+)
+
+# 不影响输出内容、不计入结果缓存键的参数
+_UNCACHED_OPTIONS = ("chunksize", "result_cache")
+
+
+def expand_input_paths(
+    patterns,
+    from_unit,
+    to_unit,
+    template=DEFAULT_OUTPUT_TEMPLATE,
+    compression=None,
+):
+    """
+    把目录、通配符和文件路径展开为待转换的文件列表
+    目录会展开为其中所有支持格式的文件 (*.csv、*.csv.gz、*.parquet、*.feather 等)；本次运行自己会生成的输出文件 (例如 alloys-at.csv)
+    以及对应的隔离文件会被排除，以免重复运行时把上一次的结果再转换一遍。
+    :param patterns: 路径、目录或通配符列表
+    :param compression: 输出的压缩方式，见 batch_engine.output_path_for
+    :return: 去重并排序后的文件路径列表
+    """
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for ext in DATA_EXTENSIONS:
+                paths.extend(glob.glob(os.path.join(pattern, f"*{ext}")))
+        elif glob.has_magic(pattern):
+            paths.extend(glob.glob(pattern))
+        else:
+            paths.append(pattern)
+
+    paths = sorted(set(os.path.normpath(p) for p in paths))
+    outputs = set()
+    for p in paths:
+        output_path = output_path_for(
+            p, from_unit, to_unit, template, None, compression
+        )
+        outputs.add(os.path.normpath(output_path))
+        outputs.add(os.path.normpath(quarantine_path_for(output_path)))
+    return [p for p in paths if p not in outputs]
+
+
+def _convert_one(job):
+    """工作进程入口：转换一个文件并把异常转为结果，保证单个坏文件不会中断整批任务"""
+    input_path, output_path, kwargs = job
+    cache_key_options = {k: v for k, v in kwargs.items() if k not in _UNCACHED_OPTIONS}
+    kwargs = dict(kwargs)
+    validation = kwargs.pop("validation", None)
+    validator = None if validation is None else RowValidator(**validation)
+    units = kwargs.pop("units", None)
+    if units is not None:
+        kwargs["unit_converter"] = UnitConverter(**units)
+    result_cache = kwargs.pop("result_cache", None)
+    quarantine_path = None if validator is None else quarantine_path_for(output_path)
+    start = time.perf_counter()
+    try:
+        cache = key = None
+        if result_cache is not None:
+            cache = ResultCache(**result_cache)
+            key = cache.key(input_path, output_path, cache_key_options)
+            meta = cache.lookup(key, output_path, quarantine_path)
+            if meta is not None:
+                return FileResult(
+                    input_path,
+                    output_path,
+                    meta["rows"],
+                    time.perf_counter() - start,
+                    None,
+                    meta["quarantined"],
+                    True,
+                )
+        rows, _ = convert_file(input_path, output_path, validator=validator, **kwargs)
+        error = None
+        if cache is not None:
+            cache.store(
+                key,
+                output_path,
+                rows,
+                quarantine_path,
+                0 if validator is None else validator.quarantined,
+            )
+    except Exception as e:
+        rows, error = 0, f"{type(e).__name__}: {e}"
+    quarantined = 0 if validator is None else validator.quarantined
+    return FileResult(
+        input_path,
+        output_path,
+        rows,
+        time.perf_counter() - start,
+        error,
+        quarantined,
+    )
+
+
+def convert_files(
+    input_paths,
+    from_unit,
+    to_unit,
+    atomic_masses,
+    names=None,
+    col_range=None,
+    chunksize=None,
+    encoding="utf-8",
+    template=DEFAULT_OUTPUT_TEMPLATE,
+    output_dir=None,
+    workers=None,
+    on_result=None,
+    validation=None,
+    designation=None,
+    species=False,
+    units=None,
+    lean=False,
+    compression=None,
+    result_cache=None,
+):
+    """
+    用进程池并行转换多个CSV文件
+    :param input_paths: 输入文件列表 (见 expand_input_paths)
+    :param workers: 工作进程数，默认使用全部CPU核心；为 1 时在当前进程内依次执行
+    :param on_result: 每完成一个文件就调用一次的回调，参数为 FileResult；
+        回调抛出异常 (如 batch_engine.ConversionCancelled) 时取消尚未开始的文件并向上抛出
+    :param validation: validation.RowValidator 的参数字典；给出时每个文件单独校验，
+        不合格的行写入各自的隔离文件
+    :param designation: 牌号 / 化学式字符串列名，见 batch_engine.convert_file
+    :param species: 成分列为化合物 (例如 Al2O3)，见 batch_engine.convert_file
+    :param units: units.UnitConverter 的参数字典；给出时按其中的单位换算，见 batch_engine.convert_file
+    :param lean: 精简内存模式 (float32)，见 batch_engine.convert_file
+    :param compression: 输出的压缩方式，见 batch_engine.output_path_for
+    :param result_cache: result_cache.ResultCache；给出时内容未变的文件直接复用缓存的结果，
+        新转换的结果存入缓存，全部完成后按大小与时间淘汰旧条目
+    其余参数见 batch_engine.convert_file 与 batch_engine.output_path_for
+    :return: 与 input_paths 顺序一致的 FileResult 列表
+    """
+    kwargs = dict(
+        to_unit=to_unit,
+        atomic_masses=dict(atomic_masses),
+        names=names,
+        col_range=col_range,
+        chunksize=chunksize,
+        encoding=encoding,
+        validation=validation,
+        designation=designation,
+        species=species,
+        units=units,
+        lean=lean,
+        result_cache=None if result_cache is None else result_cache.options(),
+    )
+    jobs = [
+        (
+            p,
+            output_path_for(p, from_unit, to_unit, template, output_dir, compression),
+            kwargs,
+        )
+        for p in input_paths
+    ]
+    workers = workers or os.cpu_count() or 1
+
+    results = {}
+    if workers == 1 or len(jobs) <= 1:
+        for job in jobs:
+            results[job[0]] = _convert_one(job)
+            if on_result:
+                on_result(results[job[0]])
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            futures = [pool.submit(_convert_one, job) for job in jobs]
+            try:
+                for future in as_completed(futures):
+                    result = future.result()
+                    results[result.input_path] = result
+                    if on_result:
+                        on_result(result)
+            except BaseException:
+                # 回调要求中止 (例如用户取消) 时不再启动排队中的文件
+                for future in futures:
+                    future.cancel()
+                raise
+    if result_cache is not None:
+        result_cache.evict()
+    return [results[job[0]] for job in jobs]
+
+
+def summarize_results(results, elapsed):
+    """
+    汇总一批文件的转换结果
+    :param results: FileResult 列表
+    :param elapsed: 整批任务的墙钟耗时 (秒)
+    :return: 包含成功/失败文件数、复用缓存 / 重新转换的文件数、总行数与吞吐量的字典
+    """
+    succeeded = [r for r in results if r.error is None]
+    rows = sum(r.rows for r in succeeded)
+    reused = sum(1 for r in succeeded if r.reused)
+    return {
+        "files": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "reused": reused,
+        "recomputed": len(succeeded) - reused,
+        "rows": rows,
+        "quarantined": sum(r.quarantined for r in succeeded),
+        "seconds": elapsed,
+        "files_per_s": len(results) / elapsed if elapsed > 0 else 0.0,
+        "rows_per_s": rows / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+# --- 单文件分区并行转换 ---
+# 把一个大CSV按字节切成若干段 (每段都在行首开始、行尾结束)，各段在不同进程中
+# 独立解析、转换并写入临时分段文件，最后按原始顺序拼接成完整输出。
+# 注意：按字节切分要求字段内部不含换行符 (成分数据通常满足)。
+
+# 每个分区的目标字节数；分区数至少等于工作进程数，文件越大分区越多，单个进程的内存占用有上限
+DEFAULT_PARTITION_BYTES = 64 * 2**20
+
+
+def split_byte_ranges(csv_path, partitions):
+    """
+    把CSV文件的数据部分 (表头之后) 切分为按行对齐的字节区间
+    :param csv_path: CSV文件路径
+    :param partitions: 期望的分区数
+    :return: (表头字节串, [(起始偏移, 结束偏移), ...])
+    """
+    size = os.path.getsize(csv_path)
+    with open(csv_path, "rb") as f:
+        header = f.readline()
+        data_start = f.tell()
+        step = max(1, (size - data_start) // max(1, partitions))
+
+        bounds = [data_start]
+        for target in range(data_start + step, size, step):
+            if target <= bounds[-1]:
+                continue
+            f.seek(target - 1)
+            f.readline()  # 移动到下一行行首
+            position = f.tell()
+            if bounds[-1] < position < size:
+                bounds.append(position)
+        bounds.append(size)
+    return header, [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def _read_partition(csv_path, header, start, end, dtypes=None):
+    """读取一个字节区间，并在前面补上表头后交给 pandas 解析"""
+    with open(csv_path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return pd.read_csv(io.BytesIO(header + data), dtype=dtypes)
+
+
+def _convert_partition(job):
+    """
+    工作进程入口：解析、转换一个分区并写入分段文件
+    :return: (处理的行数, 该分区推断出的列类型)
+    """
+    csv_path, header, start, end, part_path, write_header, convert_args, dtypes = job
+    element_cols, masses, to_unit, encoding = convert_args
+    df = _read_partition(csv_path, header, start, end, dtypes)
+    with open(part_path, "w", encoding=encoding, newline="") as out:
+        write_converted_chunks(
+            [df], out, element_cols, masses, to_unit, header=write_header
+        )
+    return len(df), dict(df.dtypes)
+
+
+def continuation_encoding(encoding):
+    """拼接在后面的分段不能再写 BOM"""
+    if encoding.lower().replace("_", "-") == "utf-8-sig":
+        return "utf-8"
+    return encoding
+
+
+def convert_csv_partitioned(
+    csv_path,
+    output_path,
+    to_unit,
+    atomic_masses,
+    names=None,
+    col_range=None,
+    workers=None,
+    encoding="utf-8",
+    partition_bytes=DEFAULT_PARTITION_BYTES,
+):
+    """
+    把一个大CSV切分成多个分区，用进程池并行解析和转换，再按原顺序拼接输出
+    各分区先按自己推断的列类型转换；若某分区的类型与全文件合并后的类型不同
+    (例如该分区中的整数列恰好没有空值)，只重做这些分区，保证输出与单进程结果逐字节相同。
+    :param workers: 工作进程数，默认使用全部CPU核心
+    :param partition_bytes: 每个分区的目标字节数
+    其余参数见 batch_engine.convert_csv_file
+    :return: (处理的行数, 成分列名列表)
+    """
+    if detect_format(csv_path) != CSV or detect_format(output_path) != CSV:
+        raise ValueError("错误：分区并行模式只支持CSV输入和CSV输出。")
+    if detect_compression(csv_path) is not None:
+        raise ValueError(
+            "错误：压缩的输入无法按字节切分，分区并行模式只支持未压缩的CSV输入。"
+        )
+    element_cols, masses = resolve_columns(csv_path, atomic_masses, names, col_range)
+    workers = workers or os.cpu_count() or 1
+    size = os.path.getsize(csv_path)
+    header, ranges = split_byte_ranges(
+        csv_path, max(workers, -(-size // partition_bytes))
+    )
+    if not ranges:
+        # 只有表头的文件直接走单进程路径
+        return convert_csv_file(
+            csv_path,
+            output_path,
+            to_unit,
+            atomic_masses,
+            element_cols,
+            encoding=encoding,
+        )
+
+    part_dir = tempfile.mkdtemp(
+        prefix=".partitions-", dir=os.path.dirname(os.path.abspath(output_path))
+    )
+    try:
+        jobs = []
+        for i, (start, end) in enumerate(ranges):
+            part_encoding = encoding if i == 0 else continuation_encoding(encoding)
+            jobs.append(
+                [
+                    csv_path,
+                    header,
+                    start,
+                    end,
+                    os.path.join(part_dir, f"{i:06d}.csv"),
+                    i == 0,
+                    (element_cols, masses, to_unit, part_encoding),
+                    None,
+                ]
+            )
+
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            results = list(pool.map(_convert_partition, jobs))
+            dtypes = merge_dtypes(part_dtypes for _, part_dtypes in results)
+            redo = [
+                i for i, (_, part_dtypes) in enumerate(results) if part_dtypes != dtypes
+            ]
+            for i in redo:
+                jobs[i][-1] = dtypes
+            for i, result in zip(
+                redo, pool.map(_convert_partition, [jobs[i] for i in redo])
+            ):
+                results[i] = result
+
+        # 分段文件未压缩；压缩的输出在拼接时一次性压缩
+        with open_binary(output_path, "wb") as out:
+            for job in jobs:
+                with open(job[4], "rb") as part:
+                    shutil.copyfileobj(part, out)
+    finally:
+        shutil.rmtree(part_dir, ignore_errors=True)
+    return sum(rows for rows, _ in results), element_cols
@@ -0,0 +1,242 @@
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+# --- 流水线 ---
+# 读取、转换、写出三个阶段各占一个线程，由有界队列连接：转换第 N 块的同时，
+# 读取线程解析第 N+1 块、写出线程格式化并写出第 N-1 块。队列满时上游阶段阻塞 (背压)，
+# 因此内存中最多同时存在 2 x queue_chunks + 3 个分块。
+# pandas 的CSV解析与 numpy 计算在执行期间会释放 GIL，阶段之间可以真正并行。
+# 每个阶段分别统计 忙碌 / 等待输入 / 等待输出 的时间，忙碌时间占比最高的阶段决定吞吐量。
+
+# 每个队列最多缓存的分块数
+DEFAULT_QUEUE_CHUNKS = 2
+
+# 阻塞在队列上时检查是否需要中止的间隔 (秒)
+_POLL_SECONDS = 0.1
+
+# 队列结束标记
+_DONE = object()
+
+# 表格输出的列标题 (阶段, 忙碌, 等待输入, 等待输出, 利用率, 行数)
+PIPELINE_HEADERS = ("阶段", "忙碌(秒)", "等待输入", "等待输出", "利用率", "行数")
+
+
+class _Aborted(Exception):
+    """另一个阶段出错或被取消，本阶段提前结束"""
+
+
+class PipelineStats:
+    """
+    流水线各阶段的忙碌与等待时间
+    利用率 = 忙碌时间 / 整条流水线的运行时间；利用率最高的阶段为瓶颈。
+    """
+
+    def __init__(self):
+        self.stages = OrderedDict()
+        self.wall_seconds = 0.0
+
+    def _entry(self, name):
+        return self.stages.setdefault(
+            name,
+            {"busy": 0.0, "wait_input": 0.0, "wait_output": 0.0, "rows": 0},
+        )
+
+    def bottleneck(self):
+        """忙碌时间最长的阶段名；没有记录时返回 None"""
+        if not self.stages:
+            return None
+        return max(self.stages, key=lambda name: self.stages[name]["busy"])
+
+    def summary(self):
+        """
+        :return: 可直接序列化为 JSON 的统计字典
+        """
+        stages = []
+        for name, entry in self.stages.items():
+            utilisation = (
+                entry["busy"] / self.wall_seconds if self.wall_seconds else None
+            )
+            stages.append(dict(stage=name, **entry, utilisation=utilisation))
+        return {
+            "wall_seconds": self.wall_seconds,
+            "bottleneck": self.bottleneck(),
+            "stages": stages,
+        }
+
+    def format_lines(self, headers=PIPELINE_HEADERS):
+        """
+        把统计结果排成文本表格
+        :param headers: 六个列标题
+        :return: 文本行列表
+        """
+        lines = [
+            f"{headers[0]:<14}{headers[1]:>12}{headers[2]:>12}"
+            f"{headers[3]:>12}{headers[4]:>10}{headers[5]:>12}"
+        ]
+        for s in self.summary()["stages"]:
+            utilisation = (
+                f"{s['utilisation']:.0%}" if s["utilisation"] is not None else "-"
+            )
+            lines.append(
+                f"{s['stage']:<14}{s['busy']:>12.4f}{s['wait_input']:>12.4f}"
+                f"{s['wait_output']:>12.4f}{utilisation:>10}{s['rows']:>12}"
+            )
+        return lines
+
+    def merge(self, other):
+        """累加另一次运行的统计 (例如多个文件依次经过流水线)"""
+        for name, entry in other.stages.items():
+            mine = self._entry(name)
+            for key, value in entry.items():
+                mine[key] += value
+        self.wall_seconds += other.wall_seconds
+
+    def add_to(self, stats):
+        """把各阶段的忙碌时间累计到 instrumentation.StageStats 中"""
+        for name, entry in self.stages.items():
+            stats.add(name, entry["busy"], entry["rows"])
+
+
+def _put(q, item, entry, abort):
+    """放入队列；队列满时等待 (计为等待输出)，等待期间发现中止则抛出 _Aborted"""
+    start = time.perf_counter()
+    try:
+        while True:
+            if abort.is_set():
+                raise _Aborted
+            try:
+                q.put(item, timeout=_POLL_SECONDS)
+                return
+            except queue.Full:
+                pass
+    finally:
+        entry["wait_output"] += time.perf_counter() - start
+
+
+def _get(q, entry, abort):
+    """从队列取出；队列空时等待 (计为等待输入)"""
+    start = time.perf_counter()
+    try:
+        while True:
+            if abort.is_set():
+                raise _Aborted
+            try:
+                return q.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                pass
+    finally:
+        entry["wait_input"] += time.perf_counter() - start
+
+
+def _read_stage(chunks, outbox, entry, abort, errors):
+    try:
+        while True:
+            start = time.perf_counter()
+            chunk = next(chunks, _DONE)
+            entry["busy"] += time.perf_counter() - start
+            if chunk is _DONE:
+                break
+            entry["rows"] += len(chunk)
+            _put(outbox, chunk, entry, abort)
+        _put(outbox, _DONE, entry, abort)
+    except _Aborted:
+        pass
+    except BaseException as e:
+        errors.append(e)
+        abort.set()
+
+
+def _write_stage(write, inbox, entry, abort, errors):
+    try:
+        while True:
+            item = _get(inbox, entry, abort)
+            if item is _DONE:
+                break
+            start = time.perf_counter()
+            write(item)
+            entry["busy"] += time.perf_counter() - start
+            entry["rows"] += len(item)
+    except _Aborted:
+        pass
+    except BaseException as e:
+        errors.append(e)
+        abort.set()
+
+
+def run_pipeline(
+    chunks,
+    convert,
+    write,
+    queue_chunks=DEFAULT_QUEUE_CHUNKS,
+    on_chunk=None,
+    pipeline_stats=None,
+    names=("read", "convert", "write"),
+):
+    """
+    以三级流水线处理分块：读取与写出在后台线程中进行，转换在调用线程中进行
+    任一阶段出错 (包括 on_chunk 抛出 ConversionCancelled) 时其余阶段尽快停止，
+    异常在调用线程中重新抛出。
+    :param chunks: 分块的迭代器，next() 在读取线程中调用；分块须支持 len()
+    :param convert: 转换函数 chunk -> item，item 须支持 len()
+    :param write: 写出函数 item -> None，在写出线程中按顺序调用
+    :param queue_chunks: 每个队列最多缓存的分块数 (背压)
+    :param on_chunk: 每转换完一块调用一次 on_chunk(该块的行数)
+    :param pipeline_stats: PipelineStats；给出时累计各阶段的忙碌与等待时间
+    :param names: 三个阶段在统计中的名称
+    :return: 转换的总行数
+    """
+    if pipeline_stats is None:
+        pipeline_stats = PipelineStats()
+    read_entry, convert_entry, write_entry = (
+        pipeline_stats._entry(name) for name in names
+    )
+    read_queue = queue.Queue(maxsize=queue_chunks)
+    write_queue = queue.Queue(maxsize=queue_chunks)
+    abort = threading.Event()
+    errors = []
+    threads = [
+        threading.Thread(
+            target=_read_stage,
+            args=(iter(chunks), read_queue, read_entry, abort, errors),
+            name="pipeline-read",
+            daemon=True,
+        ),
+        threading.Thread(
+            target=_write_stage,
+            args=(write, write_queue, write_entry, abort, errors),
+            name="pipeline-write",
+            daemon=True,
+        ),
+    ]
+    wall_start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    total_rows = 0
+    try:
+        while True:
+            chunk = _get(read_queue, convert_entry, abort)
+            if chunk is _DONE:
+                break
+            start = time.perf_counter()
+            item = convert(chunk)
+            convert_entry["busy"] += time.perf_counter() - start
+            convert_entry["rows"] += len(chunk)
+            total_rows += len(chunk)
+            _put(write_queue, item, convert_entry, abort)
+            if on_chunk is not None:
+                on_chunk(len(chunk))
+        _put(write_queue, _DONE, convert_entry, abort)
+    except _Aborted:
+        pass
+    except BaseException:
+        abort.set()
+        raise
+    finally:
+        for thread in threads:
+            thread.join()
+        pipeline_stats.wall_seconds += time.perf_counter() - wall_start
+    if errors:
+        raise errors[0]
+    return total_rows
@@ -0,0 +1,292 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from elements import ATOMIC_MASS_TABLE_VERSION
+from table_io import split_compression
+
+# --- 磁盘结果缓存 ---
+# 多文件批量转换时，以输入文件内容的哈希为键把转换结果保存在磁盘上，
+# 内容没有变化的文件直接复用上一次的结果，不再重新转换。
+# 键由以下各项共同决定，任何一项不同都视为不同的结果：
+#   输入文件内容 (SHA-256)、转换方向与单位、成分列的选择 (列名 / 列号范围，
+#   与文件内容一起唯一确定实际转换的列)、校验 / 牌号 / 化合物等选项、输出格式与编码、
+#   原子量表版本 (elements.ATOMIC_MASS_TABLE_VERSION) 与缓存格式版本。
+# 每个条目是一个目录：result (输出文件) 、quarantine (隔离文件，可能没有) 与 meta.json；
+# 复用前核对结果文件的大小与修改时间 (与 meta.json 中记录的不同时再核对哈希)，
+# 损坏的条目当作未命中并删除。输出路径上的文件同样先比较大小与修改时间，
+# 与上一次写出时相同就不再复制，因此命中时通常不必再读一遍结果。
+# 条目按最近一次使用的时间淘汰：超过最长保留时间的先删除，总大小超过上限时再删除最久未用的。
+
+# 缓存目录的默认位置
+DEFAULT_RESULT_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "convert_at_wt"
+)
+
+# 缓存总大小上限 (字节) 与条目最长保留时间 (秒)
+DEFAULT_RESULT_CACHE_MAX_BYTES = 2 * 2**30
+DEFAULT_RESULT_CACHE_MAX_AGE = 30 * 24 * 3600
+
+# 缓存格式版本；条目的目录结构或键的组成改变时更新
+RESULT_CACHE_FORMAT_VERSION = "1"
+
+# 计算文件哈希时每次读取的字节数
+HASH_READ_BYTES = 16 * 2**20
+
+_META = "meta.json"
+_RESULT = "result"
+_QUARANTINE = "quarantine"
+
+
+def file_digest(path):
+    """文件内容的 SHA-256 (十六进制)，分块读取，内存占用与文件大小无关"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_READ_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _output_kind(output_path):
+    """输出文件的扩展名 (含压缩扩展名，例如 '.csv.gz')，决定结果的字节内容"""
+    base = split_compression(output_path)[0]
+    return (os.path.splitext(base)[1] + output_path[len(base) :]).lower()
+
+
+class ResultCache:
+    """
+    按输入文件内容缓存转换结果的磁盘缓存
+    只保存可以 JSON 序列化的参数，因此可以在多进程批量转换的工作进程中各自创建。
+    """
+
+    def __init__(
+        self,
+        directory=DEFAULT_RESULT_CACHE_DIR,
+        max_bytes=DEFAULT_RESULT_CACHE_MAX_BYTES,
+        max_age=DEFAULT_RESULT_CACHE_MAX_AGE,
+    ):
+        """
+        :param directory: 缓存目录，不存在时自动创建
+        :param max_bytes: 缓存总大小上限 (字节)；为 None 时不限
+        :param max_age: 条目自最近一次使用起的最长保留时间 (秒)；为 None 时不限
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    def options(self):
+        """创建同样缓存所需的参数字典 (用于传给工作进程)"""
+        return dict(
+            directory=self.directory, max_bytes=self.max_bytes, max_age=self.max_age
+        )
+
+    def key(self, input_path, output_path, options):
+        """
+        计算缓存键
+        :param input_path: 输入文件路径 (读取其内容计算哈希)
+        :param output_path: 输出文件路径 (只用到扩展名)
+        :param options: 影响结果的转换参数字典，值须可以 JSON 序列化
+        :return: 十六进制字符串
+        """
+        payload = json.dumps(
+            {
+                "content": file_digest(input_path),
+                "output": _output_kind(output_path),
+                "options": options,
+                "atomic_mass_table": ATOMIC_MASS_TABLE_VERSION,
+                "format": RESULT_CACHE_FORMAT_VERSION,
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def lookup(self, key, output_path, quarantine_path=None):
+        """
+        命中时把缓存的结果写到输出路径 (输出文件已与缓存相同时不再复制)
+        :param quarantine_path: 隔离文件路径 (启用校验时)；缓存中有隔离文件时一并恢复
+        :return: 命中时为 meta 字典 (含 rows、quarantined)，否则为 None
+        """
+        entry = self._entry_dir(key)
+        try:
+            with open(os.path.join(entry, _META), encoding="utf-8") as f:
+                meta = json.load(f)
+            result = os.path.join(entry, _RESULT)
+            if not _matches(result, meta, meta.get("result_mtime_ns")):
+                raise ValueError("结果文件与记录不符")
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError):
+            # 条目损坏 (例如写入时被中断)：删除后按未命中处理
+            shutil.rmtree(entry, ignore_errors=True)
+            return None
+
+        output_stamp = meta.get("outputs", {}).get(os.path.abspath(output_path))
+        if not _matches(output_path, meta, output_stamp):
+            _copy_atomic(result, output_path)
+        quarantine = os.path.join(entry, _QUARANTINE)
+        if quarantine_path is not None:
+            if os.path.exists(quarantine):
+                _copy_atomic(quarantine, quarantine_path)
+            elif os.path.exists(quarantine_path):
+                # 与 RowValidator.start 一致：不留下上一次运行的隔离文件
+                os.remove(quarantine_path)
+        # 记下输出文件现在的修改时间，下次命中时不必再核对哈希；
+        # 重写 meta.json 同时更新其修改时间，即最近一次使用的时间，供淘汰使用
+        try:
+            _record_output(meta, output_path)
+            _write_meta(os.path.join(entry, _META), meta)
+        except OSError:
+            # 条目刚被另一个进程淘汰等：结果已经写出，只是下次需要重新核对
+            pass
+        return meta
+
+    def store(self, key, output_path, rows, quarantine_path=None, quarantined=0):
+        """
+        保存一个转换结果；同一个键已有条目 (例如另一个进程刚刚写入) 时保留已有的
+        :param output_path: 刚写出的输出文件
+        :param rows: 处理的行数
+        :param quarantine_path: 隔离文件路径；文件存在时一并保存
+        :param quarantined: 被隔离的行数
+        """
+        entry = self._entry_dir(key)
+        if os.path.exists(entry):
+            return
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=os.path.dirname(entry))
+        try:
+            result = os.path.join(staging, _RESULT)
+            shutil.copyfile(output_path, result)
+            if quarantine_path is not None and os.path.exists(quarantine_path):
+                shutil.copyfile(quarantine_path, os.path.join(staging, _QUARANTINE))
+            meta = {
+                "rows": rows,
+                "quarantined": quarantined,
+                "size": os.path.getsize(output_path),
+                "sha256": file_digest(output_path),
+                "created": time.time(),
+                # 改名不改变修改时间，复用时据此跳过哈希
+                "result_mtime_ns": os.stat(result).st_mtime_ns,
+            }
+            _record_output(meta, output_path)
+            with open(os.path.join(staging, _META), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.rename(staging, entry)
+        except OSError:
+            # 缓存写入失败不影响转换本身
+            pass
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def _entries(self):
+        """所有条目：(最近使用时间, 大小, 目录) 的列表"""
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.is_dir() or entry.name.startswith("."):
+                    continue
+                try:
+                    used = os.path.getmtime(os.path.join(entry.path, _META))
+                    size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                except OSError:
+                    used, size = 0.0, 0
+                entries.append((used, size, entry.path))
+        return entries
+
+    def evict(self, now=None):
+        """
+        淘汰过期条目，再按最久未用的顺序删除，直到总大小不超过上限
+        :return: (删除的条目数, 释放的字节数)
+        """
+        now = time.time() if now is None else now
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = freed = 0
+        for used, size, path in entries:
+            expired = self.max_age is not None and now - used > self.max_age
+            oversize = self.max_bytes is not None and total > self.max_bytes
+            if not (expired or oversize):
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed += 1
+            freed += size
+        return removed, freed
+
+    def summary(self):
+        """返回条目数与总大小"""
+        entries = self._entries()
+        return {
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+        }
+
+
+# 每个条目最多记录的输出路径数 (同一结果被写到不同位置时)
+_MAX_OUTPUT_STAMPS = 16
+
+
+def _matches(path, meta, mtime_ns):
+    """
+    文件内容与缓存记录的结果相同
+    大小不同时直接判为不同；大小与记录的修改时间都相同时不再计算哈希。
+    :param mtime_ns: 记录的修改时间 (纳秒)；为 None 时总是核对哈希
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    if stat.st_size != meta["size"]:
+        return False
+    if mtime_ns is not None and stat.st_mtime_ns == mtime_ns:
+        return True
+    return file_digest(path) == meta["sha256"]
+
+
+def _record_output(meta, output_path):
+    """在 meta 中记录输出文件当前的修改时间 (该文件此时与缓存的结果相同)"""
+    outputs = meta.setdefault("outputs", {})
+    outputs.pop(os.path.abspath(output_path), None)
+    outputs[os.path.abspath(output_path)] = os.stat(output_path).st_mtime_ns
+    while len(outputs) > _MAX_OUTPUT_STAMPS:
+        outputs.pop(next(iter(outputs)))
+
+
+def _write_meta(path, meta):
+    """
+    先写临时文件再改名，中断时不会留下损坏的 meta.json
+    临时文件名各不相同，多个工作进程同时命中同一条目时互不干扰。
+    """
+    fd, temp = tempfile.mkstemp(prefix=".meta-", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(temp, path)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+
+
+def _copy_atomic(source, target):
+    """先复制到同目录的临时文件再改名，中途出错不会留下不完整的输出"""
+    directory = os.path.dirname(os.path.abspath(target))
+    fd, temp = tempfile.mkstemp(prefix=".cached-", dir=directory)
+    os.close(fd)
+    try:
+        shutil.copyfile(source, temp)
+        os.replace(temp, target)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
@@ -0,0 +1,357 @@
+import csv
+import itertools
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from table_io import (
+    CSV,
+    PARQUET,
+    detect_compression,
+    detect_format,
+    open_parquet_file,
+    open_text,
+    read_arrow_table,
+)
+
+# --- 结果预览 ---
+# 为图形界面的结果预览表提供按需读取的数据源，百万行的输出文件也不必整个读入内存：
+#   - CSV：扫描一遍文件，每隔 PREVIEW_BLOCK_ROWS 行记录一次字节偏移 (稀疏行索引)，
+#     显示某一行时只读取并解析它所在的小块；
+#   - Parquet：按行组读取，只缓存最近用到的几个行组；
+#   - Feather：内存映射后按行号取出 (本工具写出的 Feather 不压缩，不复制数据)；
+#   - 压缩的CSV无法按字节偏移随机读取，只解压并预览前 PREVIEW_COMPRESSED_ROWS 行
+#     (数据源的 truncated 为 True，界面上注明)。
+# 排序与筛选只读取用到的那一列，视图本身只保存行号数组。
+# 注意：与分区并行模式一样，CSV 索引要求字段内部不含换行符。
+
+# 稀疏行索引的间隔行数
+PREVIEW_BLOCK_ROWS = 64
+
+# 最多缓存的 CSV 行块数
+PREVIEW_CACHE_BLOCKS = 512
+
+# 视图每次取出的行数 (一页) 与最多缓存的页数
+PREVIEW_PAGE_ROWS = 128
+PREVIEW_CACHE_PAGES = 64
+
+# 排序、筛选时最多缓存的整列数
+PREVIEW_CACHE_COLUMNS = 2
+
+# 建立索引时每次读取的字节数
+INDEX_READ_BYTES = 16 * 2**20
+
+# 压缩CSV最多预览的行数
+PREVIEW_COMPRESSED_ROWS = 100_000
+
+# Parquet 最多缓存的行组数
+PREVIEW_CACHE_ROW_GROUPS = 2
+
+
+class CsvPreviewSource:
+    """按行号随机读取CSV文件的数据源，只在内存中保存稀疏行索引"""
+
+    # 为 True 时只预览了文件的前 row_count 行
+    truncated = False
+
+    def __init__(self, path, encoding="utf-8-sig"):
+        """
+        :param path: CSV文件路径
+        :param encoding: 文件编码；默认的 utf-8-sig 同时兼容带 BOM 与不带 BOM 的 UTF-8 文件
+        """
+        self.path = path
+        self.encoding = encoding
+        with open(path, "rb") as f:
+            header = f.readline()
+            self._data_start = f.tell()
+        self.columns = next(csv.reader([header.decode(encoding).rstrip("\r\n")]), [])
+        self._size = os.path.getsize(path)
+        self._block_offsets, self.row_count = self._index_rows()
+        self._blocks = OrderedDict()
+        self._line_encoding = "utf-8" if encoding.lower() == "utf-8-sig" else encoding
+
+    def _index_rows(self):
+        """
+        扫描文件，记录第 0、B、2B ... 行的起始字节偏移 (B = PREVIEW_BLOCK_ROWS)
+        :return: (偏移数组, 数据行数)
+        """
+        step = PREVIEW_BLOCK_ROWS
+        offsets = [np.array([self._data_start], dtype=np.int64)]
+        newlines = 0
+        position = self._data_start
+        last_byte = b"\n"
+        with open(self.path, "rb") as f:
+            f.seek(self._data_start)
+            while True:
+                buf = f.read(INDEX_READ_BYTES)
+                if not buf:
+                    break
+                # 每个换行符之后是下一行的起始位置，即第 newlines + j + 1 行
+                starts = np.flatnonzero(np.frombuffer(buf, dtype=np.uint8) == 10)
+                first = (step - (newlines + 1) % step) % step
+                offsets.append(starts[first::step].astype(np.int64) + position + 1)
+                newlines += len(starts)
+                position += len(buf)
+                last_byte = buf[-1:]
+        rows = newlines + (1 if last_byte != b"\n" else 0)
+        offsets = np.concatenate(offsets)
+        return offsets[offsets < self._size], rows
+
+    def _block(self, index):
+        """读取第 index 块的原始行 (字节串列表)，带 LRU 缓存"""
+        lines = self._blocks.get(index)
+        if lines is not None:
+            self._blocks.move_to_end(index)
+            return lines
+        start = self._block_offsets[index]
+        if index + 1 < len(self._block_offsets):
+            end = self._block_offsets[index + 1]
+        else:
+            end = self._size
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            lines = f.read(end - start).splitlines()
+        self._blocks[index] = lines
+        if len(self._blocks) > PREVIEW_CACHE_BLOCKS:
+            self._blocks.popitem(last=False)
+        return lines
+
+    def rows(self, row_ids):
+        """
+        取出指定行，单元格为文件中的原始文本
+        :param row_ids: 行号序列 (从0开始)
+        :return: 每行一个字符串列表
+        """
+        lines = []
+        for row_id in row_ids:
+            block, offset = divmod(int(row_id), PREVIEW_BLOCK_ROWS)
+            lines.append(self._block(block)[offset].decode(self._line_encoding))
+        return list(csv.reader(lines))
+
+    def column_values(self, name):
+        """
+        读取一整列 (只解析这一列)，用于排序与筛选
+        :return: 一维数组
+        """
+        return pd.read_csv(self.path, usecols=[name], encoding=self.encoding)[
+            name
+        ].to_numpy()
+
+
+class CompressedCsvPreviewSource(CsvPreviewSource):
+    """压缩CSV文件的数据源：只解压前 max_rows 行，其单元格文本保存在内存中"""
+
+    def __init__(self, path, encoding="utf-8-sig", max_rows=PREVIEW_COMPRESSED_ROWS):
+        self.path = path
+        self.encoding = encoding
+        with open_text(path, "r", encoding) as f:
+            reader = csv.reader(f)
+            self.columns = next(reader, [])
+            self._lines = list(itertools.islice(reader, max_rows))
+            self.truncated = next(reader, None) is not None
+        self.row_count = len(self._lines)
+
+    def rows(self, row_ids):
+        return [self._lines[int(row_id)] for row_id in row_ids]
+
+    def column_values(self, name):
+        return pd.read_csv(
+            self.path, usecols=[name], nrows=self.row_count, encoding=self.encoding
+        )[name].to_numpy()
+
+
+def _table_rows(table):
+    """把 Arrow 表的各行转换为单元格文本列表"""
+    columns = [
+        ["" if value is None else str(value) for value in column.to_pylist()]
+        for column in table.columns
+    ]
+    return [list(row) for row in zip(*columns)]
+
+
+class ParquetPreviewSource:
+    """Parquet 文件的数据源：按行组读取，只缓存最近用到的 PREVIEW_CACHE_ROW_GROUPS 个行组"""
+
+    truncated = False
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open_parquet_file(path)
+        metadata = self.file.metadata
+        self.columns = self.file.schema_arrow.names
+        sizes = [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+        # 第 i 个行组从第 _group_starts[i] 行开始
+        self._group_starts = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+        self.row_count = int(self._group_starts[-1])
+        self._groups = OrderedDict()
+
+    def _group(self, index):
+        """读取第 index 个行组，带 LRU 缓存"""
+        table = self._groups.get(index)
+        if table is not None:
+            self._groups.move_to_end(index)
+            return table
+        table = self.file.read_row_group(index)
+        self._groups[index] = table
+        if len(self._groups) > PREVIEW_CACHE_ROW_GROUPS:
+            self._groups.popitem(last=False)
+        return table
+
+    def rows(self, row_ids):
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        groups = np.searchsorted(self._group_starts, row_ids, side="right") - 1
+        rows = [None] * len(row_ids)
+        # 同一行组的行一次取出，再按请求的顺序放回
+        for group in np.unique(groups):
+            positions = np.flatnonzero(groups == group)
+            local = row_ids[positions] - self._group_starts[group]
+            part = self._group(int(group)).take(local)
+            for position, row in zip(positions, _table_rows(part)):
+                rows[position] = row
+        return rows
+
+    def column_values(self, name):
+        return self.file.read(columns=[name]).column(name).to_numpy()
+
+
+class ArrowPreviewSource:
+    """Feather 文件的数据源：内存映射后按行号从 Arrow 表中取出"""
+
+    truncated = False
+
+    def __init__(self, path):
+        self.path = path
+        self.table = read_arrow_table(path)
+        self.columns = self.table.column_names
+        self.row_count = self.table.num_rows
+
+    def rows(self, row_ids):
+        return _table_rows(self.table.take(np.asarray(row_ids, dtype=np.int64)))
+
+    def column_values(self, name):
+        return self.table.column(name).to_numpy()
+
+
+def open_preview_source(path):
+    """
+    按扩展名为结果文件创建预览数据源
+    :param path: CSV (可以是压缩的) / Parquet / Feather 文件路径
+    """
+    if detect_format(path) == CSV:
+        if detect_compression(path) is not None:
+            return CompressedCsvPreviewSource(path)
+        return CsvPreviewSource(path)
+    if detect_format(path) == PARQUET:
+        return ParquetPreviewSource(path)
+    return ArrowPreviewSource(path)
+
+
+class PreviewView:
+    """
+    数据源之上经过排序、筛选的行视图，按页读取并缓存
+    视图只保存行号数组 (未排序、未筛选时连行号数组都没有)。
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self._order = None  # 排序后的行号；None 表示原始顺序
+        self._mask = None  # 筛选结果 (布尔数组)；None 表示不筛选
+        self._rows = None  # 当前视图的行号；None 表示 0..row_count-1
+        self._pages = OrderedDict()
+        self._values = OrderedDict()
+
+    @property
+    def row_count(self):
+        return self.source.row_count if self._rows is None else len(self._rows)
+
+    @property
+    def columns(self):
+        return self.source.columns
+
+    def row(self, index):
+        """
+        视图中第 index 行的各单元格文本
+        """
+        page, offset = divmod(index, PREVIEW_PAGE_ROWS)
+        rows = self._pages.get(page)
+        if rows is None:
+            start = page * PREVIEW_PAGE_ROWS
+            stop = min(start + PREVIEW_PAGE_ROWS, self.row_count)
+            if self._rows is None:
+                row_ids = range(start, stop)
+            else:
+                row_ids = self._rows[start:stop]
+            rows = self.source.rows(row_ids)
+            self._pages[page] = rows
+            if len(self._pages) > PREVIEW_CACHE_PAGES:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(page)
+        return rows[offset]
+
+    def source_row(self, index):
+        """视图第 index 行在文件中的行号"""
+        return index if self._rows is None else int(self._rows[index])
+
+    def _column(self, name):
+        """读取并缓存一列的值"""
+        values = self._values.get(name)
+        if values is None:
+            values = self.source.column_values(name)
+            self._values[name] = values
+            # 只保留最近用到的几列 (例如一列排序、一列筛选)，限制内存
+            if len(self._values) > PREVIEW_CACHE_COLUMNS:
+                self._values.popitem(last=False)
+        else:
+            self._values.move_to_end(name)
+        return values
+
+    def sort(self, name, descending=False):
+        """
+        按一列排序 (稳定排序，空值始终排在最后)
+        :param name: 列名；为 None 时恢复原始顺序
+        """
+        if name is None:
+            self._order = None
+        else:
+            series = pd.Series(self._column(name))
+            self._order = (
+                series.sort_values(
+                    ascending=not descending, kind="stable", na_position="last"
+                )
+                .index.to_numpy()
+                .astype(np.int64)
+            )
+        self._update_rows()
+
+    def filter(self, name, low=None, high=None):
+        """
+        只保留某一列的数值落在 [low, high] 内的行，非数值与空值的行被排除
+        :param name: 列名；为 None 时取消筛选
+        :param low: 下限，None 表示不限
+        :param high: 上限，None 表示不限
+        """
+        if name is None:
+            self._mask = None
+        else:
+            values = pd.to_numeric(
+                pd.Series(self._column(name)), errors="coerce"
+            ).to_numpy(dtype=np.float64)
+            mask = ~np.isnan(values)
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+            self._mask = mask
+        self._update_rows()
+
+    def _update_rows(self):
+        if self._mask is None:
+            self._rows = self._order
+        elif self._order is None:
+            self._rows = np.flatnonzero(self._mask)
+        else:
+            self._rows = self._order[self._mask[self._order]]
+        self._pages.clear()
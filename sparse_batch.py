@@ -0,0 +1,288 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from batch_engine import DEFAULT_CHUNK_ROWS, resolve_columns
+from instrumentation import stage
+from table_io import (
+    CSV,
+    arrow_block,
+    detect_format,
+    open_text,
+    read_arrow_table,
+    read_column_names,
+    write_frame,
+)
+
+# --- 稀疏成分 ---
+# 多合金数据库中每行通常只用到 30 多个元素列中的 3~6 个，其余为 0。
+# 这里把成分保存为 CSR (压缩稀疏行) 形式：data 为各非零含量，indices 为其列号，
+# indptr[i]:indptr[i+1] 为第 i 行的非零项，只对非零项做转换。
+# 结果可以写为长格式 (样品, 元素, 含量) 的 CSV / Parquet / Feather，或 CSR 形式的 .npz 文件。
+# 与稠密路径一致，含量 <= 0 或为空的元素视为不存在；所有元素都为 0 的行在长格式中没有记录。
+# 每行总和按列号顺序累加，结果与 BATCH_KERNELS 逐位相同。
+
+# CSR 输出文件的扩展名
+SPARSE_EXTENSION = ".npz"
+
+# 默认的稀疏输出文件名模板
+SPARSE_OUTPUT_TEMPLATE = "{stem}-{to}-long{out_ext}"
+
+# 长格式的列名：未指定样品编号列时使用行号 (从1开始)
+SAMPLE_ROW_COLUMN = "row"
+ELEMENT_COLUMN = "element"
+
+
+class CompositionCSR:
+    """CSR 形式的成分块"""
+
+    def __init__(self, data, indices, indptr, columns):
+        """
+        :param data: 非零含量 (float64)
+        :param indices: 各非零含量的列号，每行内递增
+        :param indptr: 长度为 行数+1 的行起止位置
+        :param columns: 列名 (元素) 列表
+        """
+        self.data = data
+        self.indices = indices
+        self.indptr = indptr
+        self.columns = list(columns)
+
+    @classmethod
+    def from_dense(cls, values, columns):
+        """
+        由稠密块构造，只保留含量 > 0 的项
+        :param values: 二维数组 (行数 x 元素数)
+        """
+        values = np.asarray(values, dtype=np.float64)
+        present = values > 0
+        rows, cols = np.nonzero(present)
+        indptr = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum(np.count_nonzero(present, axis=1), out=indptr[1:])
+        return cls(values[rows, cols], cols.astype(np.int32), indptr, columns)
+
+    @classmethod
+    def concatenate(cls, blocks, columns):
+        """按行拼接多个 CSR 块"""
+        if not blocks:
+            return cls(
+                np.empty(0), np.empty(0, np.int32), np.zeros(1, np.int64), columns
+            )
+        offsets = np.cumsum([0] + [b.nnz for b in blocks[:-1]])
+        indptr = np.concatenate(
+            [[0]] + [b.indptr[1:] + offset for b, offset in zip(blocks, offsets)]
+        )
+        return cls(
+            np.concatenate([b.data for b in blocks]),
+            np.concatenate([b.indices for b in blocks]),
+            indptr.astype(np.int64),
+            columns,
+        )
+
+    @property
+    def n_rows(self):
+        return len(self.indptr) - 1
+
+    @property
+    def nnz(self):
+        return len(self.data)
+
+    def row_ids(self):
+        """每个非零项所在的行号"""
+        return np.repeat(np.arange(self.n_rows), np.diff(self.indptr))
+
+    def with_data(self, data):
+        """结构相同、数值不同的新块"""
+        return CompositionCSR(data, self.indices, self.indptr, self.columns)
+
+    def to_dense(self, fill=np.nan):
+        """
+        还原为稠密数组
+        :param fill: 不存在的项的值；转换结果中为 NaN，与稠密路径一致
+        """
+        dense = np.full((self.n_rows, len(self.columns)), fill)
+        dense[self.row_ids(), self.indices] = self.data
+        return dense
+
+
+def convert_csr(csr, masses, to_unit):
+    """
+    只对非零项进行转换
+    :param csr: CompositionCSR
+    :param masses: 与 csr.columns 对应的原子量数组
+    :param to_unit: 目标单位，'at' 或 'wt'
+    :return: 结构相同的 CompositionCSR，数值为百分比
+    """
+    element_masses = np.asarray(masses, dtype=np.float64)[csr.indices]
+    if to_unit == "at":
+        parts = csr.data / element_masses
+    else:
+        parts = csr.data * element_masses
+    rows = csr.row_ids()
+    # bincount 按非零项的顺序 (即每行内按列号) 累加，与稠密路径逐列累加的结果相同
+    totals = np.bincount(rows, weights=parts, minlength=csr.n_rows)
+    result = parts / totals[rows]
+    result *= 100
+    return csr.with_data(result)
+
+
+def long_frame(csr, samples, sample_name, value_name):
+    """
+    把 CSR 块展开为长格式
+    :param samples: 每行的样品编号
+    :return: 列为 (样品, 元素, 含量) 的 DataFrame，元素列为分类类型
+    """
+    return pd.DataFrame(
+        {
+            sample_name: np.asarray(samples)[csr.row_ids()],
+            ELEMENT_COLUMN: pd.Categorical.from_codes(csr.indices, csr.columns),
+            value_name: csr.data,
+        }
+    )
+
+
+def save_npz(path, csr, samples, sample_name):
+    """把 CSR 结果保存为 .npz 文件 (数组 data / indices / indptr / columns / samples)"""
+    samples = np.asarray(samples)
+    if samples.dtype == object:
+        samples = samples.astype(str)
+    np.savez_compressed(
+        path,
+        data=csr.data,
+        indices=csr.indices,
+        indptr=csr.indptr,
+        columns=np.array(csr.columns),
+        samples=samples,
+        sample_name=np.array(sample_name),
+    )
+
+
+def load_npz(path):
+    """
+    读取 save_npz 写出的文件
+    :return: (CompositionCSR, 样品编号数组, 样品编号列名)
+    """
+    with np.load(path) as f:
+        csr = CompositionCSR(
+            f["data"], f["indices"], f["indptr"], f["columns"].tolist()
+        )
+        return csr, f["samples"], str(f["sample_name"])
+
+
+def _read_blocks(path, element_cols, id_column, chunksize):
+    """
+    分块读取成分列 (以及样品编号列)
+    :return: 生成 (稠密成分块, 样品编号数组) 的迭代器；未指定编号列时编号为行号 (从1开始)
+    """
+    start = 0
+    if detect_format(path) == CSV:
+        usecols = element_cols + ([id_column] if id_column else [])
+        for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunksize):
+            yield _block_with_ids(chunk, element_cols, id_column, start)
+            start += len(chunk)
+        return
+    table = read_arrow_table(
+        path, columns=element_cols + ([id_column] if id_column else [])
+    )
+    for offset in range(0, table.num_rows, chunksize):
+        part = table.slice(offset, chunksize)
+        values = arrow_block(part, element_cols)
+        if id_column:
+            ids = part.column(id_column).to_numpy(zero_copy_only=False)
+        else:
+            ids = np.arange(offset + 1, offset + part.num_rows + 1)
+        yield values, ids
+
+
+def _block_with_ids(chunk, element_cols, id_column, start):
+    values = chunk[element_cols].to_numpy(dtype=np.float64)
+    if id_column:
+        return values, chunk[id_column].to_numpy()
+    return values, np.arange(start + 1, start + len(chunk) + 1)
+
+
+def convert_file_sparse(
+    input_path,
+    output_path,
+    to_unit,
+    atomic_masses,
+    names=None,
+    col_range=None,
+    id_column=None,
+    chunksize=DEFAULT_CHUNK_ROWS,
+    encoding="utf-8",
+    stats=None,
+):
+    """
+    以稀疏形式转换一个文件：分块读入成分列，压缩为 CSR，只转换非零项
+    输出为长格式 (输出扩展名为 .csv / .parquet / .feather) 或 CSR (.npz)；
+    CSV 长格式逐块追加写出，其余格式在最后一次写出 (只保存非零项)。
+    :param id_column: 作为样品编号写入输出的列；为 None 时使用行号 (从1开始)
+    :param chunksize: 每块行数
+    其余参数见 batch_engine.convert_file
+    :return: (处理的行数, 成分列名列表, 非零项个数)
+    """
+    with stage(stats, "validate"):
+        element_cols, masses = resolve_columns(
+            input_path, atomic_masses, names, col_range
+        )
+        if id_column is not None and id_column not in read_column_names(input_path):
+            raise ValueError(f"错误：文件中找不到样品编号列: {id_column}")
+        if id_column in element_cols:
+            raise ValueError(f"错误：样品编号列 '{id_column}' 不能同时是成分列。")
+    sample_name = id_column or SAMPLE_ROW_COLUMN
+    value_name = f"{to_unit}%"
+    to_npz = os.path.splitext(output_path)[1].lower() == SPARSE_EXTENSION
+    stream_csv = not to_npz and detect_format(output_path) == CSV
+
+    rows = nnz = 0
+    results, sample_blocks = [], []
+    out = open_text(output_path, "w", encoding) if stream_csv else None
+    try:
+        blocks = _read_blocks(input_path, element_cols, id_column, chunksize)
+        while True:
+            with stage(stats, "read") as record:
+                block = next(blocks, None)
+                record["rows"] = 0 if block is None else len(block[0])
+            if block is None:
+                break
+            values, samples = block
+            with stage(stats, "compress", len(values)):
+                csr = CompositionCSR.from_dense(values, element_cols)
+            with stage(stats, "convert", len(values)):
+                result = convert_csr(csr, masses, to_unit)
+            if stream_csv:
+                with stage(stats, "write", len(values)):
+                    long_frame(result, samples, sample_name, value_name).to_csv(
+                        out, header=rows == 0, index=False
+                    )
+            else:
+                results.append(result)
+                sample_blocks.append(samples)
+            rows += len(values)
+            nnz += result.nnz
+        if stream_csv and rows == 0:
+            long_frame(
+                CompositionCSR.concatenate([], element_cols),
+                [],
+                sample_name,
+                value_name,
+            ).to_csv(out, index=False)
+    finally:
+        if out is not None:
+            out.close()
+
+    if not stream_csv:
+        with stage(stats, "write", rows):
+            result = CompositionCSR.concatenate(results, element_cols)
+            samples = np.concatenate(sample_blocks) if sample_blocks else np.empty(0)
+            if to_npz:
+                save_npz(output_path, result, samples, sample_name)
+            else:
+                write_frame(
+                    long_frame(result, samples, sample_name, value_name),
+                    output_path,
+                    encoding,
+                )
+    return rows, element_cols, nnz
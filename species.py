@@ -0,0 +1,197 @@
+import functools
+import re
+
+import numpy as np
+
+from elements import ATOMIC_MASSES, mass_vector
+
+# --- 化合物 (氧化物等) 成分 ---
+# 炉渣、氧化物涂层等数据通常以化合物的质量百分比给出 (例如 Al2O3、MgO、ZrO2、Li2O)。
+# 每种化合物由化学式解析为 元素 -> 原子数，所有化合物组成化学计量矩阵 S (化合物数 x 元素数)，
+# 整批数据的 化合物 wt% -> 元素 at% / 元素 wt% 转换只需一次矩阵乘法：
+#   元素摩尔数 = (化合物 wt% / 化合物摩尔质量) @ S
+#   元素质量   = 元素摩尔数 * 元素原子量
+# 再按行归一化为百分比。
+
+# 预置的常见化合物；其他化学式在用到时解析，结果同样缓存
+COMMON_SPECIES = (
+    "Al2O3", "MgO", "ZrO2", "Li2O", "SiO2", "CaO", "Na2O", "K2O",
+    "FeO", "Fe2O3", "Fe3O4", "MnO", "MnO2", "TiO2", "Cr2O3", "NiO",
+    "CuO", "Cu2O", "ZnO", "BaO", "SrO", "B2O3", "P2O5", "V2O5",
+    "Y2O3", "La2O3", "CeO2", "HfO2", "Nb2O5", "MoO3", "WO3", "CaF2",
+    "SO3", "CO2", "H2O",
+)  # fmt: skip
+
+_FORMULA_TOKEN = re.compile(r"([A-Z][a-z]?|\(|\))(\d+(?:\.\d*)?|\.\d+)?")
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_formula_cached(formula):
+    """解析化学式 (括号可以嵌套)，结果按化学式缓存；返回 ((元素, 原子数), ...) 元组"""
+    stack = [{}]
+    position = 0
+    for match in _FORMULA_TOKEN.finditer(formula):
+        token, count = match.group(1), float(match.group(2) or 1)
+        if (
+            match.start() != position
+            or (token == "(" and match.group(2))
+            or (token == ")" and len(stack) == 1)
+        ):
+            break
+        position = match.end()
+        if token == "(":
+            stack.append({})
+        elif token == ")":
+            group = stack.pop()
+            for el, n in group.items():
+                stack[-1][el] = stack[-1].get(el, 0.0) + n * count
+        else:
+            stack[-1][token] = stack[-1].get(token, 0.0) + count
+    if position != len(formula) or len(stack) != 1 or not stack[0]:
+        raise ValueError(
+            f"错误：无法解析化学式 '{formula}'，应形如 Al2O3 或 Ca3(PO4)2。"
+        )
+    return tuple(stack[0].items())
+
+
+def parse_formula(formula, atomic_masses=ATOMIC_MASSES):
+    """
+    解析化学式
+    :param formula: 例如 'Al2O3'、'Ca3(PO4)2'；下标可以是小数 (非化学计量化合物)
+    :param atomic_masses: 用于检查元素符号的原子量表
+    :return: 元素 -> 原子数 的字典，按化学式中首次出现的顺序排列
+    """
+    if not isinstance(formula, str):
+        raise ValueError(f"错误：化学式 '{formula}' 不是字符串。")
+    composition = dict(_parse_formula_cached(formula.strip()))
+    unknown = [el for el in composition if el not in atomic_masses]
+    if unknown:
+        raise ValueError(
+            f"错误：化学式 '{formula}' 中有未知的元素符号: {', '.join(unknown)}"
+        )
+    return composition
+
+
+def molar_mass(formula, atomic_masses=ATOMIC_MASSES):
+    """化合物的摩尔质量 (g/mol)"""
+    return sum(
+        n * atomic_masses[el] for el, n in parse_formula(formula, atomic_masses).items()
+    )
+
+
+# 预置化合物的组成与摩尔质量 (导入时计算一次)
+SPECIES_COMPOSITIONS = {name: parse_formula(name) for name in COMMON_SPECIES}
+SPECIES_MOLAR_MASSES = {name: molar_mass(name) for name in COMMON_SPECIES}
+
+
+def is_species(name, atomic_masses=ATOMIC_MASSES):
+    """列名是否为可以解析的化学式"""
+    try:
+        parse_formula(name, atomic_masses)
+    except ValueError:
+        return False
+    return True
+
+
+def select_species_columns(columns, atomic_masses, names=None, col_range=None):
+    """
+    确定化合物成分列，规则与 batch_engine.select_element_columns 相同
+    :return: 化合物列名列表；未指定时选出所有列名为化学式的列
+    """
+    columns = list(columns)
+    if names:
+        missing = [name for name in names if name not in columns]
+        if missing:
+            raise ValueError(f"错误：文件中找不到以下列: {', '.join(missing)}")
+        species = list(names)
+    elif col_range is not None:
+        start, end = col_range
+        if not 1 <= start <= end <= len(columns):
+            raise ValueError(
+                f"错误：列号范围 {start}-{end} 无效，文件共有 {len(columns)} 列。"
+            )
+        species = columns[start - 1 : end]
+    else:
+        species = [col for col in columns if is_species(col, atomic_masses)]
+        if not species:
+            raise ValueError("错误：文件中没有列名为化学式的列，请指定成分列。")
+
+    invalid = [name for name in species if not is_species(name, atomic_masses)]
+    if invalid:
+        raise ValueError(
+            f"错误：以下列名不是有效的化学式: {', '.join(invalid)}。"
+            "请检查列名是否为正确的化学式 (例如 Al2O3)。"
+        )
+    return species
+
+
+def stoichiometry_matrix(species, atomic_masses=ATOMIC_MASSES):
+    """
+    构造化学计量矩阵
+    :param species: 化学式列表
+    :return: (矩阵 (化合物数 x 元素数), 元素列表 (按首次出现的顺序), 化合物摩尔质量数组)
+    """
+    compositions = [parse_formula(name, atomic_masses) for name in species]
+    elements = list(dict.fromkeys(el for c in compositions for el in c))
+    index = {el: j for j, el in enumerate(elements)}
+    matrix = np.zeros((len(species), len(elements)))
+    for i, composition in enumerate(compositions):
+        for el, n in composition.items():
+            matrix[i, index[el]] = n
+    molar_masses = matrix @ mass_vector(elements, atomic_masses)
+    return matrix, elements, molar_masses
+
+
+class SpeciesConverter:
+    """
+    化合物 wt% -> 元素 at% / 元素 wt% 的批量转换
+    转换矩阵在构造时一次算好，每一块数据只需一次矩阵乘法。
+    """
+
+    def __init__(self, species, atomic_masses=ATOMIC_MASSES):
+        """
+        :param species: 化合物列 (化学式) 列表
+        :param atomic_masses: 原子量表
+        """
+        self.species = list(species)
+        self.matrix, self.elements, self.molar_masses = stoichiometry_matrix(
+            self.species, atomic_masses
+        )
+        element_masses = mass_vector(self.elements, atomic_masses)
+        # 每单位质量的化合物含有的各元素摩尔数 / 质量
+        self._matrices = {
+            "at": self.matrix / self.molar_masses[:, None],
+            "wt": self.matrix * element_masses / self.molar_masses[:, None],
+        }
+
+    def convert(self, values, to_unit):
+        """
+        :param values: 化合物质量百分比，二维数组 (行数 x 化合物数)；<= 0 与空值视为不存在
+        :param to_unit: 'at' 得到元素原子百分比，'wt' 得到元素质量百分比
+        :return: 二维数组 (行数 x 元素数)，列顺序与 self.elements 相同；
+            不存在的元素为 NaN，所有化合物含量都为 0 的行全部为 0 (与元素转换一致)
+        """
+        values = np.asarray(values, dtype=np.float64)
+        parts = np.where(values > 0, values, 0.0) @ self._matrices[to_unit]
+        totals = parts.sum(axis=1)
+        nonzero = totals != 0
+        result = np.full(parts.shape, np.nan)
+        np.divide(
+            parts,
+            totals[:, None],
+            out=result,
+            where=(parts > 0) & nonzero[:, None],
+        )
+        result *= 100
+        result[~nonzero] = 0.0
+        return result
+
+    def convert_percents(self, percents, to_unit):
+        """
+        单个成分的转换
+        :param percents: 化合物 -> 质量百分比 的字典，键须为 self.species 中的化合物
+        :return: 元素 -> 百分比 的字典，不含不存在的元素
+        """
+        row = np.array([[percents.get(name, 0.0) for name in self.species]])
+        result = self.convert(row, to_unit)[0]
+        return {el: float(v) for el, v in zip(self.elements, result) if not np.isnan(v)}
@@ -0,0 +1,299 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+
+import numpy as np
+import pandas as pd
+
+# --- 表格文件读写 ---
+# 根据扩展名自动识别文件格式。除CSV外还支持列式格式 Parquet 与 Feather/Arrow IPC，
+# 列式格式需要安装 pyarrow。Arrow 文件通过内存映射读取：未参与计算的列直接从映射中
+# 写回输出，只有选中的成分列会被真正读入内存。
+# 写出的 Feather 文件不压缩 (pyarrow 默认使用 lz4)：压缩的列读取时必须解压，
+# 无法零拷贝地内存映射，而转换结果常常被再次读入 (预览、下一步处理)。
+
+CSV = "csv"
+PARQUET = "parquet"
+FEATHER = "feather"
+
+# 扩展名 -> 文件格式；未列出的扩展名按CSV处理
+FORMAT_EXTENSIONS = {
+    ".csv": CSV,
+    ".parquet": PARQUET,
+    ".pq": PARQUET,
+    ".feather": FEATHER,
+    ".arrow": FEATHER,
+    ".ipc": FEATHER,
+}
+
+# --- 压缩流 ---
+# CSV文件可以整体压缩 (例如 alloys.csv.gz、alloys.csv.zst)，压缩方式由最后一个扩展名决定。
+# 读写都是流式的：分块读取时边解压边解析，分块写出时边格式化边压缩，不产生解压后的临时文件。
+# gzip / bz2 / xz 使用标准库；zstd 需要安装 zstandard。
+# Parquet / Feather 自带列内压缩，不支持再整体压缩。
+
+# 压缩方式 -> 扩展名
+COMPRESSIONS = {
+    "gzip": ".gz",
+    "bz2": ".bz2",
+    "xz": ".xz",
+    "zstd": ".zst",
+}
+
+# 扩展名 -> 压缩方式；与 pandas 按扩展名推断压缩方式的规则一致，
+# 因此 pd.read_csv / to_csv 直接传入路径即可
+COMPRESSION_EXTENSIONS = {ext: name for name, ext in COMPRESSIONS.items()}
+
+# 表示输出不压缩的名称
+NO_COMPRESSION = "none"
+
+# 输入、输出支持的全部扩展名 (压缩的只有CSV)
+DATA_EXTENSIONS = tuple(FORMAT_EXTENSIONS) + tuple(
+    f".csv{ext}" for ext in COMPRESSION_EXTENSIONS
+)
+
+# 文件对话框使用的扩展名过滤
+DATA_FILE_PATTERNS = " ".join(f"*{ext}" for ext in DATA_EXTENSIONS)
+
+# 写出 Parquet 文件时每个行组的行数；行组是按块读取 (例如结果预览) 的最小单位
+PARQUET_ROW_GROUP_ROWS = 128 * 1024
+
+
+def split_compression(path):
+    """
+    拆出压缩扩展名
+    :param path: 文件路径，例如 'alloys.csv.gz'
+    :return: (去掉压缩扩展名的路径, 压缩方式)，例如 ('alloys.csv', 'gzip')；未压缩时压缩方式为 None
+    """
+    base, ext = os.path.splitext(path)
+    compression = COMPRESSION_EXTENSIONS.get(ext.lower())
+    return (base, compression) if compression else (path, None)
+
+
+def detect_compression(path):
+    """根据扩展名识别压缩方式：'gzip'、'bz2'、'xz'、'zstd' 或 None"""
+    return split_compression(path)[1]
+
+
+def parse_compression(name):
+    """
+    把压缩方式的名称规范化
+    :param name: 'gzip'、'gz'、'.zst'、'none' 等
+    :return: COMPRESSIONS 中的键；'none' 返回 None
+    """
+    key = str(name).strip().lower()
+    if key == NO_COMPRESSION:
+        return None
+    if key in COMPRESSIONS:
+        return key
+    compression = COMPRESSION_EXTENSIONS.get(key if key.startswith(".") else f".{key}")
+    if compression is None:
+        raise ValueError(
+            f"错误：无法识别的压缩方式 '{name}'，可用的压缩方式: "
+            f"{', '.join(COMPRESSIONS)}, {NO_COMPRESSION}"
+        )
+    return compression
+
+
+def _zstandard():
+    """按需导入 zstandard，未安装时给出明确的提示"""
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("读写 .zst 压缩文件需要安装 zstandard: pip install zstandard")
+    return zstandard
+
+
+def open_binary(path, mode="rb"):
+    """
+    以二进制方式打开文件，按扩展名透明地解压 / 压缩
+    :param path: 文件路径
+    :param mode: 'rb' 或 'wb'
+    :return: 文件对象；读取时支持 readline 与逐行迭代
+    """
+    compression = detect_compression(path)
+    if compression is None:
+        return open(path, mode)
+    if compression == "gzip":
+        return gzip.open(path, mode)
+    if compression == "bz2":
+        return bz2.open(path, mode)
+    if compression == "xz":
+        return lzma.open(path, mode)
+    zstd = _zstandard()
+    raw = open(path, mode)
+    if mode == "rb":
+        return io.BufferedReader(
+            zstd.ZstdDecompressor().stream_reader(raw, closefd=True)
+        )
+    return zstd.ZstdCompressor().stream_writer(raw, closefd=True)
+
+
+def open_text(path, mode="r", encoding="utf-8"):
+    """
+    以文本方式打开文件 (newline="")，按扩展名透明地解压 / 压缩
+    :param mode: 'r' 或 'w'
+    :param encoding: 文本编码
+    """
+    if detect_compression(path) is None:
+        return open(path, mode, encoding=encoding, newline="")
+    return io.TextIOWrapper(
+        open_binary(path, mode + "b"), encoding=encoding, newline=""
+    )
+
+
+def with_compression(path, compression):
+    """
+    把文件路径的压缩扩展名换成指定的压缩方式
+    :param compression: 压缩方式名称 (见 parse_compression)；'none' 表示不压缩
+    """
+    base = split_compression(path)[0]
+    compression = parse_compression(compression)
+    if compression is not None and detect_format(base) != CSV:
+        raise ValueError("错误：只有CSV输出可以压缩，Parquet/Feather 文件自带压缩。")
+    return base + COMPRESSIONS[compression] if compression else base
+
+
+def detect_format(path):
+    """
+    根据扩展名识别文件格式，忽略压缩扩展名 (alloys.csv.gz 为CSV)
+    :param path: 文件路径
+    :return: 'csv'、'parquet' 或 'feather'
+    """
+    base, compression = split_compression(path)
+    fmt = FORMAT_EXTENSIONS.get(os.path.splitext(base)[1].lower(), CSV)
+    if compression is not None and fmt != CSV:
+        raise ValueError(
+            f"错误：{os.path.basename(path)}: Parquet/Feather 文件自带压缩，不支持再整体压缩。"
+        )
+    return fmt
+
+
+def output_extension(path):
+    """
+    输出文件默认使用的扩展名：列式格式保持原扩展名，其余一律输出为 .csv；
+    压缩的输入默认输出为同样压缩的文件 (alloys.csv.gz -> .csv.gz)
+    :param path: 输入文件路径
+    """
+    base, compression = split_compression(path)
+    ext = os.path.splitext(base)[1] if detect_format(path) != CSV else ".csv"
+    return ext + COMPRESSIONS[compression] if compression else ext
+
+
+def _pyarrow():
+    """按需导入 pyarrow，未安装时给出明确的提示"""
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError(
+            "读写 Parquet/Feather 文件需要安装 pyarrow: pip install pyarrow"
+        )
+    return pyarrow
+
+
+def read_column_names(path):
+    """
+    只读取文件的列名，不读入数据
+    :param path: 文件路径
+    :return: 列名列表
+    """
+    fmt = detect_format(path)
+    if fmt == CSV:
+        return pd.read_csv(path, nrows=0).columns.tolist()
+    pa = _pyarrow()
+    if fmt == PARQUET:
+        return pa.parquet.read_schema(path).names
+    # 只读取文件尾部的 schema，不解压任何列
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).schema.names
+
+
+def read_frame(path):
+    """
+    把整个文件读入为 DataFrame
+    :param path: 文件路径
+    :return: pandas.DataFrame
+    """
+    fmt = detect_format(path)
+    if fmt == CSV:
+        return pd.read_csv(path)
+    return read_arrow_table(path).to_pandas()
+
+
+def open_parquet_file(path):
+    """
+    打开 Parquet 文件以便按行组读取，此时只读取文件尾部的元数据
+    :return: pyarrow.parquet.ParquetFile
+    """
+    pa = _pyarrow()
+    return pa.parquet.ParquetFile(path, memory_map=True)
+
+
+def read_arrow_table(path, columns=None):
+    """
+    以 Arrow 表的形式读取列式文件；Feather/Arrow 文件使用内存映射，未压缩的列不复制数据
+    :param path: Parquet 或 Feather 文件路径
+    :param columns: 只读取这些列；为 None 时读取全部列
+    :return: pyarrow.Table
+    """
+    pa = _pyarrow()
+    if detect_format(path) == PARQUET:
+        return pa.parquet.read_table(path, columns=columns, memory_map=True)
+    return pa.feather.read_table(path, columns=columns, memory_map=True)
+
+
+def arrow_block(table, columns):
+    """
+    只把指定的列转换为二维浮点数组，空值变为 NaN
+    :param table: pyarrow.Table
+    :param columns: 列名列表
+    :return: 二维 float64 数组 (行数 x 列数)
+    """
+    pa = _pyarrow()
+    if not columns:
+        return np.empty((table.num_rows, 0))
+    return np.column_stack(
+        [
+            table.column(col).cast(pa.float64()).to_numpy(zero_copy_only=False)
+            for col in columns
+        ]
+    )
+
+
+def write_arrow_table(table, path, encoding="utf-8"):
+    """
+    按输出路径的扩展名写出 Arrow 表；写CSV时经 pandas 格式化，与CSV路径的输出一致
+    :param table: pyarrow.Table
+    :param path: 输出文件路径
+    :param encoding: 输出CSV时使用的编码
+    """
+    pa = _pyarrow()
+    fmt = detect_format(path)
+    if fmt == PARQUET:
+        pa.parquet.write_table(table, path, row_group_size=PARQUET_ROW_GROUP_ROWS)
+    elif fmt == FEATHER:
+        pa.feather.write_feather(table, path, compression="uncompressed")
+    else:
+        table.to_pandas().to_csv(path, index=False, encoding=encoding)
+
+
+def write_frame(df, path, encoding="utf-8"):
+    """
+    按输出路径的扩展名写出 DataFrame
+    :param df: 待写出的数据
+    :param path: 输出文件路径
+    :param encoding: 输出CSV时使用的编码
+    """
+    fmt = detect_format(path)
+    if fmt == CSV:
+        df.to_csv(path, index=False, encoding=encoding)
+        return
+    _pyarrow()
+    if fmt == PARQUET:
+        df.to_parquet(path, index=False, row_group_size=PARQUET_ROW_GROUP_ROWS)
+    else:
+        df.reset_index(drop=True).to_feather(path, compression="uncompressed")
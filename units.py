@@ -0,0 +1,240 @@
+import numpy as np
+
+from batch_engine import at_to_wt_array, wt_to_at_array
+from elements import ATOMIC_MASSES, mass_vector
+
+# --- 成分单位 ---
+# 在原有的 wt% <-> at% 批量核心之上的通用单位换算层。每种单位由 "基准" (质量或摩尔) 与
+# "满量程" (所有元素之和对应的数值) 描述：
+#   wt   质量百分比 (wt%)      质量基准, 100
+#   at   原子百分比 (at%)      摩尔基准, 100
+#   ppmw 质量 ppm (mg/kg)      质量基准, 1e6
+#   ppma 原子 ppm              摩尔基准, 1e6
+#   w    质量分数 (0~1)        质量基准, 1
+#   x    摩尔分数 (0~1)        摩尔基准, 1
+# 基准相同时只需按比例缩放；基准不同时调用 wt_to_at_array / at_to_wt_array 并在各行内归一化，
+# 因此所给的列应构成完整的成分。只有微量元素列时 (例如 ppm 数据) 可以指定余量元素，
+# 各行未给出的部分 (满量程减去各列之和) 计为该元素，换算后再去掉。
+# 与 wt_to_at_array 等一致：含量 <= 0 (或为空) 的元素结果为 NaN，所有元素都为 0 的行结果全部为 0。
+
+# 单位 -> (基准, 满量程)
+UNITS = {
+    "wt": ("mass", 100.0),
+    "at": ("mole", 100.0),
+    "ppmw": ("mass", 1e6),
+    "ppma": ("mole", 1e6),
+    "w": ("mass", 1.0),
+    "x": ("mole", 1.0),
+}
+
+# 结果列名中使用的单位标记，例如 'Cu(at%)'、'Cu(ppmw)'
+UNIT_LABELS = {
+    "wt": "wt%",
+    "at": "at%",
+    "ppmw": "ppmw",
+    "ppma": "ppma",
+    "w": "w",
+    "x": "x",
+}
+
+# 单位的其他写法 (不区分大小写，忽略空格)；单独的 'ppm' 按惯例视为质量 ppm
+UNIT_ALIASES = {
+    "wt%": "wt",
+    "wt.%": "wt",
+    "mass%": "wt",
+    "at%": "at",
+    "at.%": "at",
+    "mol%": "at",
+    "ppm": "ppmw",
+    "wppm": "ppmw",
+    "ppmwt": "ppmw",
+    "ppm(wt)": "ppmw",
+    "mg/kg": "ppmw",
+    "appm": "ppma",
+    "ppmat": "ppma",
+    "ppm(at)": "ppma",
+    "mass_fraction": "w",
+    "massfraction": "w",
+    "mole_fraction": "x",
+    "molefraction": "x",
+    "mol_fraction": "x",
+}
+
+# 换算核心：源单位的基准 -> 转换为另一基准的函数 (结果为百分比)
+_BASIS_KERNELS = {"mass": wt_to_at_array, "mole": at_to_wt_array}
+
+
+def parse_unit(text):
+    """
+    把单位名称规范化为 UNITS 中的键
+    :param text: 例如 'wt%'、'ppm'、'mole_fraction'
+    :return: 'wt'、'at'、'ppmw'、'ppma'、'w' 或 'x'
+    """
+    key = str(text).strip().lower().replace(" ", "")
+    unit = key if key in UNITS else UNIT_ALIASES.get(key)
+    if unit is None:
+        raise ValueError(
+            f"错误：无法识别的单位 '{text}'，可用的单位: {', '.join(UNITS)}"
+        )
+    return unit
+
+
+def unit_scale(unit):
+    """单位的满量程，例如 wt -> 100, ppmw -> 1e6"""
+    return UNITS[parse_unit(unit)][1]
+
+
+def convert_values(values, masses, from_unit, to_unit, balance_mass=None):
+    """
+    把成分块从一种单位换算为另一种单位
+    :param values: 二维数组 (行数 x 元素数)
+    :param masses: 与列对应的原子量数组
+    :param from_unit: 源单位 (见 parse_unit)
+    :param to_unit: 目标单位
+    :param balance_mass: 余量元素的原子量；给出时各行的余量计为该元素参与换算
+    :return: 换算结果数组，形状与输入相同；wt <-> at 时与 BATCH_KERNELS 的结果逐位相同
+    """
+    from_basis, from_scale = UNITS[parse_unit(from_unit)]
+    to_basis, to_scale = UNITS[parse_unit(to_unit)]
+    values = np.asarray(values, dtype=np.float64)
+    present = values > 0
+
+    if from_basis == to_basis:
+        result = np.where(present, values * (to_scale / from_scale), np.nan)
+        result[~present.any(axis=1)] = 0.0
+        return result
+
+    masses = np.asarray(masses, dtype=np.float64)
+    if balance_mass is not None:
+        given = np.where(present, values, 0.0).sum(axis=1)
+        balance = np.maximum(from_scale - given, 0.0)
+        values = np.column_stack([values, balance])
+        masses = np.append(masses, balance_mass)
+    result = _BASIS_KERNELS[from_basis](values, masses)
+    if balance_mass is not None:
+        result = result[:, :-1]
+    if to_scale != 100.0:
+        result *= to_scale / 100.0
+    return result
+
+
+def convert_composition(
+    percents, from_unit, to_unit, atomic_masses=ATOMIC_MASSES, balance=None
+):
+    """
+    单个成分的换算
+    :param percents: 元素 -> 含量 的字典
+    :param balance: 余量元素符号，见 convert_values
+    :return: 元素 -> 含量 的字典，不含含量 <= 0 的元素
+    """
+    elements = list(percents)
+    values = np.array([[percents[el] for el in elements]], dtype=np.float64)
+    balance_mass = None if balance is None else atomic_masses[balance]
+    result = convert_values(
+        values,
+        mass_vector(elements, atomic_masses),
+        from_unit,
+        to_unit,
+        balance_mass,
+    )[0]
+    return {el: float(v) for el, v in zip(elements, result) if not np.isnan(v)}
+
+
+class UnitConverter:
+    """
+    批量单位换算，可以每行单独声明源单位
+    每行单位来自某一列时，各块按单位分组，每组整体调用一次 convert_values，
+    而不是逐行分派。与 ConversionCache 一样在整个文件上累计各单位的行数。
+    """
+
+    def __init__(
+        self,
+        to_unit,
+        from_unit=None,
+        unit_column=None,
+        balance=None,
+        atomic_masses=ATOMIC_MASSES,
+    ):
+        """
+        :param to_unit: 目标单位
+        :param from_unit: 所有行共同的源单位；与 unit_column 二选一
+        :param unit_column: 保存每行源单位的列名
+        :param balance: 余量元素符号 (例如 'Fe')，见 convert_values；不能同时是成分列
+        :param atomic_masses: 原子量表
+        """
+        if (from_unit is None) == (unit_column is None):
+            raise ValueError("错误：必须指定源单位或单位列 (只能二选一)。")
+        self.to_unit = parse_unit(to_unit)
+        self.from_unit = None if from_unit is None else parse_unit(from_unit)
+        self.unit_column = unit_column
+        self.balance = balance
+        self._balance_mass = None
+        if balance is not None:
+            if balance not in atomic_masses:
+                raise ValueError(f"错误：余量元素 '{balance}' 不是已知的元素符号。")
+            self._balance_mass = atomic_masses[balance]
+        self.unit_counts = {}
+
+    def result_column_names(self, element_cols):
+        """结果列名，例如 'Cu(ppmw)'"""
+        label = UNIT_LABELS[self.to_unit]
+        return [f"{el}({label})" for el in element_cols]
+
+    def check_columns(self, element_cols):
+        """检查余量元素没有同时作为成分列"""
+        if self.balance is not None and self.balance in element_cols:
+            raise ValueError(
+                f"错误：余量元素 '{self.balance}' 不能同时是成分列，它的含量由其余各列算出。"
+            )
+
+    def convert(self, values, masses, units=None):
+        """
+        :param values: 二维成分数组
+        :param masses: 与列对应的原子量数组
+        :param units: 每行的源单位 (与 unit_column 对应的一列值)；使用固定源单位时忽略
+        :return: 换算结果数组
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if self.unit_column is None:
+            self._count(self.from_unit, len(values))
+            return convert_values(
+                values, masses, self.from_unit, self.to_unit, self._balance_mass
+            )
+
+        labels, codes = np.unique(
+            np.asarray(units, dtype=object).astype(str), return_inverse=True
+        )
+        canonical = {}
+        unknown = []
+        for label in labels:
+            try:
+                canonical[label] = parse_unit(label)
+            except ValueError:
+                unknown.append(label)
+        if unknown:
+            raise ValueError(
+                f"错误：单位列 '{self.unit_column}' 中有无法识别的单位: "
+                f"{', '.join(unknown)}；可用的单位: {', '.join(UNITS)}"
+            )
+        # 同一单位的不同写法 (例如 'wt%' 与 'wt') 合为一组
+        groups = list(dict.fromkeys(canonical.values()))
+        group_of_label = np.array([groups.index(canonical[l]) for l in labels])
+        row_groups = group_of_label[codes.ravel()]
+
+        result = np.empty(values.shape)
+        for k, unit in enumerate(groups):
+            rows = np.flatnonzero(row_groups == k)
+            self._count(unit, len(rows))
+            result[rows] = convert_values(
+                values[rows], masses, unit, self.to_unit, self._balance_mass
+            )
+        return result
+
+    def _count(self, unit, rows):
+        self.unit_counts[unit] = self.unit_counts.get(unit, 0) + rows
+
+    def summary(self):
+        """返回各源单位的行数，按 UNITS 中的顺序排列"""
+        return {
+            unit: self.unit_counts[unit] for unit in UNITS if unit in self.unit_counts
+        }
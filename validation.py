@@ -0,0 +1,217 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from table_io import split_compression
+
+# --- 成分校验与隔离 ---
+# 在转换之前对整个成分块做一次向量化检查，有问题的行写入单独的隔离文件 (附原因代码)，
+# 其余的行照常转换，个别坏行不再导致整个任务中止。
+
+# 原因代码 (位掩码)；一行可以同时有多个原因
+NON_NUMERIC = 1  # 含量不是数字
+NEGATIVE = 2  # 含量为负
+MISSING = 4  # 含量为空 (NaN)
+SUM_OUT_OF_TOLERANCE = 8  # 各元素含量之和偏离目标值超过容差
+UNPARSEABLE = 16  # 牌号 / 化学式字符串无法解析 (见 batch_engine.DesignationColumn)
+
+REASON_CODES = {
+    NON_NUMERIC: "non_numeric",
+    NEGATIVE: "negative",
+    MISSING: "missing",
+    SUM_OUT_OF_TOLERANCE: "sum_out_of_tolerance",
+    UNPARSEABLE: "unparseable",
+}
+
+# 默认的总和目标值与容差，与单点计算中 99.9 ~ 100.1 的检查一致
+DEFAULT_SUM_TARGET = 100.0
+DEFAULT_SUM_TOLERANCE = 0.1
+
+# 隔离文件名模板与附加的列名
+QUARANTINE_TEMPLATE = "{stem}-quarantine.csv"
+QUARANTINE_ROW_COLUMN = "source_row"
+QUARANTINE_REASON_COLUMN = "reason"
+
+
+def quarantine_path_for(output_path):
+    """
+    隔离文件的默认路径：与输出文件同目录，例如 alloys-at.csv -> alloys-at-quarantine.csv；
+    压缩的输出 (alloys-at.csv.gz) 对应的隔离文件不压缩
+    :param output_path: 转换结果文件路径
+    """
+    directory, name = os.path.split(output_path)
+    stem = os.path.splitext(split_compression(name)[0])[0]
+    return os.path.join(directory, QUARANTINE_TEMPLATE.format(stem=stem))
+
+
+def check_block(frame, element_cols, tolerance, target, allow_missing):
+    """
+    一次性检查成分块中的每一行
+    :param frame: DataFrame
+    :param element_cols: 成分列名列表
+    :param tolerance: 总和容差；为 None 时不检查总和
+    :param target: 总和目标值
+    :param allow_missing: 为 True 时空值视为 0 (该元素不存在)，不算错误
+    :return: (二维 float64 含量数组，非数字单元格为 NaN, 每行的原因位掩码数组)
+    """
+    rows = len(frame)
+    values = np.empty((rows, len(element_cols)))
+    non_numeric = np.zeros((rows, len(element_cols)), dtype=bool)
+    for j, col in enumerate(element_cols):
+        column = frame[col]
+        if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(
+            column
+        ):
+            values[:, j] = column.to_numpy(dtype=np.float64)
+        else:
+            values[:, j] = pd.to_numeric(column, errors="coerce").to_numpy(
+                dtype=np.float64
+            )
+            non_numeric[:, j] = np.isnan(values[:, j]) & column.notna().to_numpy()
+
+    reasons = np.zeros(rows, dtype=np.int64)
+    reasons[non_numeric.any(axis=1)] |= NON_NUMERIC
+    reasons[(values < 0).any(axis=1)] |= NEGATIVE
+    if not allow_missing:
+        reasons[(np.isnan(values) & ~non_numeric).any(axis=1)] |= MISSING
+    if tolerance is not None:
+        sums = np.nansum(values, axis=1)
+        outside = (sums < target - tolerance) | (sums > target + tolerance)
+        reasons[outside] |= SUM_OUT_OF_TOLERANCE
+    return values, reasons
+
+
+def reason_labels(reasons):
+    """
+    把原因位掩码转换为文本，多个原因用分号分隔，例如 'negative;sum_out_of_tolerance'
+    :param reasons: 位掩码数组
+    :return: 字符串列表
+    """
+    return [
+        ";".join(name for bit, name in REASON_CODES.items() if code & bit)
+        for code in reasons
+    ]
+
+
+def renormalise(values, target=DEFAULT_SUM_TARGET):
+    """
+    把每一行按比例缩放到总和为 target；空值保持为空，总和为 0 的行保持不变
+    :param values: 二维含量数组
+    :return: 新数组
+    """
+    sums = np.nansum(values, axis=1)
+    scale = np.divide(
+        target, sums, out=np.ones_like(sums), where=(sums != 0) & np.isfinite(sums)
+    )
+    return values * scale[:, None]
+
+
+class RowValidator:
+    """
+    逐块校验成分行：坏行写入隔离文件，返回可以正常转换的行
+    与 ConversionCache 一样在整个文件 (所有分块) 上累计统计。
+    """
+
+    def __init__(
+        self,
+        tolerance=DEFAULT_SUM_TOLERANCE,
+        target=DEFAULT_SUM_TARGET,
+        allow_missing=False,
+        renormalise=False,
+        quarantine_path=None,
+    ):
+        """
+        :param tolerance: 总和容差；为 None 时不检查总和
+        :param target: 总和目标值
+        :param allow_missing: 空值视为 0，不算错误
+        :param renormalise: 把通过校验的行缩放到总和为 target 后再转换 (输出中的成分列也随之更新)
+        :param quarantine_path: 固定的隔离文件路径；为 None 时每个文件由 start() 指定
+        """
+        self.tolerance = tolerance
+        self.target = target
+        self.allow_missing = allow_missing
+        self.renormalise = renormalise
+        self.quarantine_path = quarantine_path
+        self._fixed_path = quarantine_path
+        self._file_rows = 0
+        self.rows = 0
+        self.quarantined = 0
+        self.reason_counts = {name: 0 for name in REASON_CODES.values()}
+        self._quarantine_started = False
+
+    def start(self, quarantine_path=None):
+        """
+        开始校验一个新文件：行号从 1 重新计数，删除上一次运行留下的隔离文件
+        统计数字在多个文件之间累计。
+        :param quarantine_path: 该文件的隔离文件路径；构造时给出了固定路径则忽略
+        """
+        self.quarantine_path = self._fixed_path or quarantine_path
+        self._file_rows = 0
+        self._quarantine_started = False
+        if self.quarantine_path and os.path.exists(self.quarantine_path):
+            os.remove(self.quarantine_path)
+
+    def split(self, frame, element_cols, flags=None):
+        """
+        校验一块数据，坏行追加到隔离文件
+        :param frame: DataFrame 分块
+        :param element_cols: 成分列名列表
+        :param flags: 上游已经确定的每行原因位掩码 (例如 UNPARSEABLE)；非 0 的行只记这些原因，
+            因为其成分列只是占位的空值，检查结果没有意义
+        :return: 通过校验的行 (成分列已转换为数值；开启 renormalise 时已归一化)
+        """
+        values, reasons = check_block(
+            frame, element_cols, self.tolerance, self.target, self.allow_missing
+        )
+        if flags is not None:
+            reasons = np.where(flags != 0, flags, reasons)
+        bad = reasons != 0
+        if bad.any():
+            self._write_quarantine(frame, bad, reasons[bad])
+        self._file_rows += len(frame)
+        self.rows += len(frame)
+        for bit, name in REASON_CODES.items():
+            self.reason_counts[name] += int(np.count_nonzero(reasons & bit))
+
+        good = ~bad
+        clean = frame[good] if bad.any() else frame
+        values = values[good]
+        if self.renormalise:
+            values = renormalise(values, self.target)
+        if self.renormalise or any(
+            not pd.api.types.is_numeric_dtype(frame[col]) for col in element_cols
+        ):
+            # 只在必要时替换成分列，未改动的数值列保持原有格式
+            clean = clean.copy()
+            for j, col in enumerate(element_cols):
+                if self.renormalise or not pd.api.types.is_numeric_dtype(frame[col]):
+                    clean[col] = values[:, j]
+        return clean
+
+    def _write_quarantine(self, frame, bad, reasons):
+        if self.quarantine_path is None:
+            raise ValueError("错误：发现不合格的行，但没有指定隔离文件。")
+        rejected = frame[bad].copy()
+        rejected.insert(
+            0, QUARANTINE_ROW_COLUMN, self._file_rows + np.flatnonzero(bad) + 1
+        )
+        rejected[QUARANTINE_REASON_COLUMN] = reason_labels(reasons)
+        rejected.to_csv(
+            self.quarantine_path,
+            mode="a" if self._quarantine_started else "w",
+            header=not self._quarantine_started,
+            index=False,
+            encoding="utf-8",
+        )
+        self._quarantine_started = True
+        self.quarantined += len(rejected)
+
+    def summary(self):
+        """返回总行数、隔离行数与各原因的行数"""
+        return {
+            "rows": self.rows,
+            "quarantined": self.quarantined,
+            "valid": self.rows - self.quarantined,
+            "reasons": dict(self.reason_counts),
+        }
@@ -0,0 +1,265 @@
+import hashlib
+import io
+import json
+import os
+import time
+
+import pandas as pd
+
+from batch_engine import (
+    DEFAULT_OUTPUT_TEMPLATE,
+    convert_frame,
+    output_path_for,
+    resolve_composition,
+)
+from parallel_batch import continuation_encoding, expand_input_paths
+from table_io import CSV, detect_compression, detect_format
+
+# --- 监视文件夹 ---
+# 仪器在一天中不断向CSV文件末尾追加数据行。监视模式定期扫描一个目录：
+# 新出现的文件整体转换，已有文件只读取上次处理位置之后新追加的完整行，
+# 转换后追加到对应的输出文件末尾，每一行新数据的开销是恒定的。
+# 每个文件的进度 (输入的字节偏移、输出文件的大小、表头的哈希) 保存在状态文件中，
+# 重新启动后从上次的位置继续。追加到一半中断时，输出按状态文件记录的大小截断后再追加，
+# 因此不会重复也不会遗漏。
+# 注意：
+#   - 只处理以换行符结束的行，仪器正在写入的最后一行留到下一次扫描；
+#   - 输入文件变短或表头改变时视为被替换，整个文件重新转换；
+#   - 每批新行各自推断列类型；之前出现过小数的列在状态中记录，之后的整数按浮点数输出，
+#     但先整数后小数的列，先写出的行无法再改 (见 batch_engine.scan_csv_dtypes)；
+#   - 只监视未压缩的CSV文件 (压缩文件无法按行追加)。
+
+# 默认扫描间隔 (秒)
+DEFAULT_WATCH_INTERVAL = 2.0
+
+# 状态文件的默认文件名，保存在输出目录中
+DEFAULT_WATCH_STATE_NAME = ".convert-watch-state.json"
+
+# 每次最多读入的新数据字节数 (大文件首次转换时分段进行)
+WATCH_READ_BYTES = 16 * 2**20
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class FolderWatcher:
+    """
+    增量转换一个目录中不断追加的CSV文件
+    用法:
+        watcher = FolderWatcher("exports", "at", "wt", ATOMIC_MASSES)
+        watcher.run(interval=2.0)        # 一直运行，Ctrl+C 停止
+        updates = watcher.poll()         # 或只扫描一次
+    """
+
+    def __init__(
+        self,
+        directory,
+        to_unit,
+        from_unit,
+        atomic_masses,
+        names=None,
+        col_range=None,
+        encoding="utf-8",
+        template=DEFAULT_OUTPUT_TEMPLATE,
+        output_dir=None,
+        state_path=None,
+        species=False,
+        unit_converter=None,
+    ):
+        """
+        :param directory: 被监视的目录
+        :param to_unit: 目标单位
+        :param from_unit: 源单位 (只用于输出文件命名)
+        :param atomic_masses: 原子量表
+        :param encoding: 输出文件编码；追加的部分不再写 BOM
+        :param template: 输出文件名模板，见 batch_engine.output_path_for
+        :param output_dir: 输出目录，默认与被监视的目录相同
+        :param state_path: 状态文件路径，默认为输出目录中的 DEFAULT_WATCH_STATE_NAME
+        :param species: 成分列为化合物，见 batch_engine.convert_file
+        :param unit_converter: units.UnitConverter，见 batch_engine.convert_file
+        其余参数见 batch_engine.select_element_columns
+        """
+        self.directory = directory
+        self.to_unit = to_unit
+        self.from_unit = from_unit
+        self.atomic_masses = atomic_masses
+        self.names = names
+        self.col_range = col_range
+        self.encoding = encoding
+        self.template = template
+        self.output_dir = output_dir
+        self.species = species
+        self.unit_converter = unit_converter
+        self.state_path = state_path or os.path.join(
+            output_dir or directory, DEFAULT_WATCH_STATE_NAME
+        )
+        self.state = self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _save_state(self):
+        """先写临时文件再改名，中断时不会留下损坏的状态文件"""
+        temp = self.state_path + ".tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(temp, self.state_path)
+
+    def input_paths(self):
+        """当前需要监视的CSV文件 (不含本模式自己写出的输出文件)"""
+        return [
+            path
+            for path in expand_input_paths(
+                [self.directory], self.from_unit, self.to_unit, self.template
+            )
+            if detect_format(path) == CSV and detect_compression(path) is None
+        ]
+
+    def poll(self):
+        """
+        扫描一次目录，转换所有新文件与新追加的行
+        单个文件出错不影响其他文件，错误记录在返回值中，下一次扫描时重试。
+        :return: 有变化的文件列表，每项为 (输入路径, 输出路径, 新转换的行数, 错误信息或 None)
+        """
+        updates = []
+        for path in self.input_paths():
+            output_path = output_path_for(
+                path, self.from_unit, self.to_unit, self.template, self.output_dir
+            )
+            try:
+                rows = self._update_file(path, output_path)
+                error = None
+            except Exception as e:
+                rows, error = 0, f"{type(e).__name__}: {e}"
+            if rows or error:
+                updates.append((path, output_path, rows, error))
+        return updates
+
+    def run(self, interval=DEFAULT_WATCH_INTERVAL, on_update=None, max_polls=None):
+        """
+        定期扫描，直到被中断 (KeyboardInterrupt 向上抛出) 或达到 max_polls 次
+        :param interval: 两次扫描之间的间隔 (秒)
+        :param on_update: 每个有变化的文件调用一次 on_update(输入路径, 输出路径, 新行数, 错误信息)
+        :param max_polls: 最多扫描的次数；为 None 时一直运行
+        """
+        polls = 0
+        while max_polls is None or polls < max_polls:
+            for update in self.poll():
+                if on_update is not None:
+                    on_update(*update)
+            polls += 1
+            if max_polls is None or polls < max_polls:
+                time.sleep(interval)
+
+    def _update_file(self, path, output_path):
+        """把一个文件中尚未处理的完整行转换并追加到输出；返回新转换的行数"""
+        key = os.path.abspath(path)
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            header = f.readline()
+            if not header.endswith(b"\n"):
+                return 0  # 表头还没有写完
+            entry = self.state.get(key)
+            if (
+                entry is None
+                or entry["header"] != _digest(header)
+                or entry["output"] != os.path.abspath(output_path)
+                or size < entry["offset"]
+                or not os.path.exists(output_path)
+                or os.path.getsize(output_path) < entry["output_size"]
+            ):
+                # 新文件、被替换的文件或输出被删除 / 截断：从头转换
+                entry = {
+                    "header": _digest(header),
+                    "output": os.path.abspath(output_path),
+                    "offset": f.tell(),
+                    "output_size": 0,
+                    "rows": 0,
+                }
+            if entry["offset"] >= size and entry["output_size"] > 0:
+                return 0
+            element_cols, masses, species_converter = resolve_composition(
+                path, self.atomic_masses, self.names, self.col_range, self.species
+            )
+            if self.unit_converter is not None:
+                self.unit_converter.check_columns(element_cols)
+
+            new_rows = 0
+            f.seek(entry["offset"])
+            while True:
+                # 一行长于 WATCH_READ_BYTES 时继续往后读，直到读到换行或文件末尾，
+                # 否则偏移永远不会前进，每次扫描都重读同一段
+                blocks = [f.read(WATCH_READ_BYTES)]
+                while blocks[-1] and b"\n" not in blocks[-1]:
+                    blocks.append(f.read(WATCH_READ_BYTES))
+                data = b"".join(blocks)
+                end = data.rfind(b"\n") + 1
+                if end == 0:
+                    break
+                data = data[:end]
+                f.seek(entry["offset"] + end)
+                rows = self._append(
+                    header + data,
+                    output_path,
+                    entry,
+                    element_cols,
+                    masses,
+                    species_converter,
+                )
+                entry["offset"] += end
+                entry["rows"] += rows
+                new_rows += rows
+                self.state[key] = entry
+                self._save_state()
+        if entry["output_size"] == 0:
+            # 只有表头的新文件：也写出带表头的空结果，之后照常追加
+            self._append(
+                header, output_path, entry, element_cols, masses, species_converter
+            )
+            self.state[key] = entry
+            self._save_state()
+        return new_rows
+
+    def _append(
+        self, csv_bytes, output_path, entry, element_cols, masses, species_converter
+    ):
+        """
+        解析并转换一段CSV (表头 + 若干完整行)，追加到输出文件
+        输出先截断到状态中记录的大小，丢弃上一次中断时写了一半的内容。
+        :return: 转换的行数
+        """
+        df = pd.read_csv(io.BytesIO(csv_bytes))
+        if len(df) == 0 and entry["output_size"] > 0:
+            return 0
+        # 之前的行里是浮点数的列，新行恰好都是整数时仍按浮点数输出 (2 -> 2.0)
+        float_cols = set(entry.get("float_columns", ()))
+        for col in df.columns:
+            if col in float_cols and pd.api.types.is_integer_dtype(df[col]):
+                df[col] = df[col].astype("float64")
+        float_cols.update(
+            col for col in df.columns if pd.api.types.is_float_dtype(df[col])
+        )
+        entry["float_columns"] = sorted(float_cols)
+        result_df = convert_frame(
+            df,
+            element_cols,
+            masses,
+            self.to_unit,
+            species_converter=species_converter,
+            unit_converter=self.unit_converter,
+        )
+        first = entry["output_size"] == 0
+        text = pd.concat([df, result_df], axis=1).to_csv(header=first, index=False)
+        encoding = self.encoding if first else continuation_encoding(self.encoding)
+        mode = "r+b" if os.path.exists(output_path) else "wb"
+        with open(output_path, mode) as out:
+            out.truncate(entry["output_size"])
+            out.seek(entry["output_size"])
+            out.write(text.encode(encoding))
+            entry["output_size"] = out.tell()
+        return len(df)